@@ -3,7 +3,15 @@ import pandas as pd
 import os
 import json
 import datetime
-from saju_engine import process_saju_input, process_love_compatibility # 만능 엔진 불러오기
+import uuid
+from saju_engine import (stream_saju_input, process_love_compatibility, calculate_sibseong,
+                         dominant_sibseong, stage_hashes, invalidate_stages) # 만능 엔진 불러오기
+from db_bundle import load_bundle, DBWatcher, DB_DIR
+from report_cache import ReportCache
+from knowledge_index import load_index, build_index, chart_profile, INDEXED_SECTIONS
+from lunar_calendar import lunar_to_solar
+from persistence import open_writer
+from birth_window import uncertainty_report
 from typing import Dict, Any, Optional
 
 # --------------------------------------------------------------------------
@@ -15,43 +23,57 @@ st.set_page_config(
     layout="wide"
 )
 
-# 데이터 캐싱 (속도 향상)
-@st.cache_data
+REPORT_CACHE_PATH = os.path.join(DB_DIR, "report_cache.sqlite")
+
+# 데이터 캐싱 (속도 향상) - 번들은 mmap 되므로 복사 없이 프로세스 전체가 공유한다
+@st.cache_resource
 def load_db():
-    """JSON 데이터베이스를 로드하여 딕셔너리로 반환"""
-    db = {}
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    
-    # 🚨🚨🚨 모든 10개 DB 파일을 명시 🚨🚨🚨
-    files = {
-        "career": "career_db.json",
-        "health": "health_db.json",
-        "shinsal": "shinsal_db.json",
-        "timeline": "timeline_db.json",
-        "love": "love_db.json", 
-        "five_elements": "five_elements_matrix.json",
-        "symptom": "symptom_mapping.json",
-        "lifecycle": "lifecycle_pillar_db.json",
-        "identity": "identity_db.json",           
-        "compatibility": "compatibility_db.json" 
-    }
-    
-    for key, filename in files.items():
-        try:
-            path = os.path.join(base_path, filename) 
-            with open(path, "r", encoding="utf-8") as f:
-                db[key] = json.load(f)
-        except FileNotFoundError:
-            st.error(f"경고: {filename} 데이터베이스 파일을 찾을 수 없네! 파일을 'app.py'와 같은 위치에 두게나.")
-            db[key] = {} 
-        except json.JSONDecodeError:
-            st.error(f"경고: {filename} 파일이 JSON 형식이 아니네. 다시 확인하게!")
-            db[key] = {}
-            
+    """saju_db 번들을 열어 섹션을 처음 접근할 때만 파싱하는 읽기 전용 DB를 반환"""
+    db = load_bundle()
+    for filename in db.missing:
+        st.error(f"경고: {filename} 데이터베이스 파일을 찾을 수 없네! 파일을 'saju_db' 폴더에 두게나.")
+    for filename in db.invalid:
+        st.error(f"경고: {filename} 파일이 JSON 형식이 아니네. 다시 확인하게!")
     return db
 
+@st.cache_resource
+def load_report_cache():
+    """같은 사주(8글자/성별/연도)의 분석 결과를 사용자 간에 공유하는 보고서 캐시"""
+    return ReportCache(maxsize=4096 * 6, disk_path=REPORT_CACHE_PATH)  # 분석 단계(6개)마다 한 항목
+
+@st.cache_resource
+def load_persistence():
+    """보고서·세션을 백그라운드에서 묶어 저장하는 write-behind 저장소 (SHINRYEONG_PERSIST, 기본은 로컬 SQLite)"""
+    return open_writer()
+
+@st.cache_resource
+def load_knowledge_index():
+    """총서/프롬프트/용어집/DB 구절의 BM25 색인 (원본이 바뀌었으면 다시 빌드)"""
+    return load_index()
+
 # 데이터베이스 로드
 db = load_db()
+knowledge = load_knowledge_index()
+report_cache = load_report_cache()
+persistence = load_persistence()
+
+def on_db_change(changes):
+    """바뀐 섹션을 읽는 분석 단계의 캐시를 지우고, 색인된 섹션이면 지식 색인도 다시 빌드해 대화창이 새 구절을 인용하게 한다"""
+    invalidate_stages(report_cache, db, changes)
+    if any(change.name in INDEXED_SECTIONS for change in changes):
+        build_index()
+        load_knowledge_index.clear()  # 다음 실행부터 새 색인을 연다
+
+@st.cache_resource
+def start_db_watcher():
+    """saju_db 원본이 바뀌면 재시작 없이 그 섹션만 다시 읽고, 그 섹션을 읽는 분석 단계의 캐시만 지운다"""
+    # 지난 실행 이후 바뀐 DB 로 만든 디스크 캐시 항목은 먼저 정리한다
+    report_cache.retain(stage_hashes(db).values())
+    return DBWatcher(db, on_change=on_db_change).start()
+
+db_watcher = start_db_watcher()
+for section, message in db.reload_errors.items():
+    st.warning(f"DB 갱신 보류 ({section}): {message} — 예전 내용을 그대로 쓰고 있네.")
 
 # 세션 상태 초기화 (생략 - 이전 버전과 동일)
 if "messages" not in st.session_state: st.session_state.messages = []
@@ -59,11 +81,34 @@ if 'analysis_report' not in st.session_state: st.session_state.analysis_report =
 if 'user_a_input' not in st.session_state: st.session_state.user_a_input = None
 if 'user_b_input' not in st.session_state: st.session_state.user_b_input = None
 if 'analysis_mode' not in st.session_state: st.session_state.analysis_mode = 'none'
+if 'pending_saju' not in st.session_state: st.session_state.pending_saju = False
+
+# 세션 ID 는 주소(?sid=...)에 남겨, Streamlit 이 다시 시작돼도 같은 주소로 들어오면 마지막 상태를 되살린다
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = st.query_params.get("sid") or uuid.uuid4().hex
+    st.query_params["sid"] = st.session_state.session_id
+    restored = persistence.load_session(st.session_state.session_id) if persistence else None
+    if restored:
+        for key in ('messages', 'analysis_report', 'user_a_input', 'user_b_input', 'analysis_mode'):
+            st.session_state[key] = restored.get(key, st.session_state[key])
+
+def save_session():
+    """현재 세션 상태를 저장 큐에 넣는다 (기다리지 않음)"""
+    if persistence:
+        persistence.save_session(st.session_state.session_id, {
+            "analysis_mode": st.session_state.analysis_mode,
+            "user_a_input": st.session_state.user_a_input,
+            "user_b_input": st.session_state.user_b_input,
+            "analysis_report": st.session_state.analysis_report,
+            "messages": list(st.session_state.messages),
+        })
 
 # --------------------------------------------------------------------------
 # 2. [입력창] 사주/궁합 정보 입력 사이드바 (생략 - 이전 버전과 동일)
 # --------------------------------------------------------------------------
 
+TIME_UNCERTAINTY = {"정확하네": 0, "±15분": 15, "±30분": 30, "±1시간": 60, "±2시간": 120}
+
 def saju_input_form(key_prefix: str) -> Optional[Dict[str, Any]]:
     # 이전 버전과 동일한 함수 내용 (Streamlit 위젯 입력)
     with st.container():
@@ -71,16 +116,31 @@ def saju_input_form(key_prefix: str) -> Optional[Dict[str, Any]]:
         col1, col2 = st.columns(2)
         
         with col1:
-            date_col, time_col = st.columns(2)
-            with date_col:
-                date = st.date_input("생년월일", value=datetime.date(1990, 1, 1), key=f"{key_prefix}_date")
-            with time_col:
-                time = st.time_input("태어난 시 (24시)", value=datetime.time(9, 30), key=f"{key_prefix}_time", step=900)
-            
             is_lunar = st.radio("달력 종류", ('양력(陽)', '음력(陰)'), horizontal=True, key=f"{key_prefix}_lunar") == '음력(陰)'
             is_leap_month = False
+            lunar_date = None
             if is_lunar:
+                # 음력은 2월 30일처럼 양력 달력에 없는 날짜가 있으므로 숫자로 받는다
+                year_col, month_col, day_col = st.columns(3)
+                with year_col:
+                    lunar_year = st.number_input("음력 연", 1900, 2100, 1990, key=f"{key_prefix}_lyear")
+                with month_col:
+                    lunar_month = st.number_input("월", 1, 12, 1, key=f"{key_prefix}_lmonth")
+                with day_col:
+                    lunar_day = st.number_input("일", 1, 30, 1, key=f"{key_prefix}_lday")
                 is_leap_month = st.checkbox("윤달인가?", key=f"{key_prefix}_leap")
+                lunar_date = (int(lunar_year), int(lunar_month), int(lunar_day))
+                try:
+                    date = lunar_to_solar(*lunar_date, is_leap_month)
+                    st.caption(f"양력으로는 {date} 이네.")
+                except ValueError as e:
+                    st.error(str(e))
+                    return None
+            else:
+                date = st.date_input("생년월일", value=datetime.date(1990, 1, 1), key=f"{key_prefix}_date")
+            time = st.time_input("태어난 시 (24시)", value=datetime.time(9, 30), key=f"{key_prefix}_time", step=900)
+            # 어림잡은 시각이면 앞뒤로 그만큼 안에서 달라질 수 있는 사주도 함께 본다
+            uncertainty = st.selectbox("시각이 얼마나 정확한가?", list(TIME_UNCERTAINTY), key=f"{key_prefix}_uncertainty")
             
         with col2:
             gender = st.radio("성별", ('남', '여'), horizontal=True, key=f"{key_prefix}_gender")
@@ -88,10 +148,16 @@ def saju_input_form(key_prefix: str) -> Optional[Dict[str, Any]]:
             
         if name and city:
             birth_dt = datetime.datetime.combine(date, time)
-            return {
+            user = {
                 "name": name, "birth_dt": birth_dt, "is_lunar": is_lunar, 
                 "is_leap_month": is_leap_month, "gender": gender, "city": city
             }
+            if is_lunar:
+                # 엔진은 음력 날짜를 lunar_date 로 다시 바꾼다 (birth_dt 의 날짜는 화면 표시용 양력)
+                user["lunar_date"] = lunar_date
+            if TIME_UNCERTAINTY[uncertainty]:
+                user["time_uncertainty"] = TIME_UNCERTAINTY[uncertainty]
+            return user
         return None
 
 with st.sidebar:
@@ -112,12 +178,12 @@ with st.sidebar:
             if user_a_data:
                 st.session_state.user_a_input = user_a_data
                 st.session_state.user_b_input = None
-                with st.spinner('천기(天機)를 열어 데이터를 추출 중이네...'):
-                    report = process_saju_input(user_a_data, db)
-                    st.session_state.analysis_report = report
-                    st.session_state.analysis_mode = 'saju'
+                # 계산은 본문에서 항목별로 흘려 그리며 한다 (첫 항목이 곧바로 보이도록)
+                st.session_state.analysis_report = None
+                st.session_state.analysis_mode = 'saju'
+                st.session_state.pending_saju = True
                 st.session_state.messages = [] 
-                st.session_state.messages.append({"role": "assistant", "content": "분석을 마쳤네. 이제 보고서를 꼼꼼히 읽어보게!"})
+                st.session_state.messages.append({"role": "assistant", "content": "천기(天機)를 열어 보고서를 한 장씩 펼치겠네. 꼼꼼히 읽어보게!"})
                 st.rerun()
             else: st.error("이름과 태어난 지역까지 입력해야 분석할 수 있네!")
 
@@ -131,12 +197,17 @@ with st.sidebar:
             if user_a_data and user_b_data:
                 st.session_state.user_a_input = user_a_data
                 st.session_state.user_b_input = user_b_data
+                st.session_state.pending_saju = False
                 with st.spinner('두 사람의 인연줄(緣)을 엮어 분석 중이네...'):
                     report = process_love_compatibility(user_a_data, user_b_data, db)
                     st.session_state.analysis_report = report
                     st.session_state.analysis_mode = 'love'
                 st.session_state.messages = [] 
                 st.session_state.messages.append({"role": "assistant", "content": "두 사람의 궁합 분석을 마쳤네. 인연의 매듭을 풀어보게."})
+                if persistence:
+                    persistence.save_report(st.session_state.session_id, "compatibility",
+                                            {"user_a": user_a_data, "user_b": user_b_data}, report)
+                save_session()
                 st.rerun()
             else: st.error("두 사람의 정보(이름, 지역 포함)를 모두 입력해야 궁합을 볼 수 있네!")
 
@@ -158,29 +229,77 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-if st.session_state.analysis_report:
+def render_saju_header(name: str, saju_data: Dict[str, str], true_solar_dt: Any):
+    st.subheader(f"## {name}의 사주 분석 보고서 📜")
+    st.markdown(f"> **생년월일시 (진태양시 기준):** {true_solar_dt}")
+    st.markdown(f"> **사주 여덟 글자:** {saju_data['year_gan']}{saju_data['year_ji']} {saju_data['month_gan']}{saju_data['month_ji']} **{saju_data['day_gan']}{saju_data['day_ji']}** {saju_data['time_gan']}{saju_data['time_ji']}")
+    st.markdown("---")
+
+def render_analysis(analysis: Dict[str, Any]):
+    st.markdown(f"### {analysis['type']} - {analysis['title']}")
+    st.markdown(analysis['content'])
+    st.markdown("---")
+
+def _hhmm(value: Any) -> str:
+    # 저장소에서 되살린 세션이면 시각이 ISO 문자열로 들어 있다
+    return value.strftime("%H:%M") if isinstance(value, datetime.datetime) else str(value)[11:16]
+
+def render_uncertainty(uncertainty: Dict[str, Any]):
+    """출생 시각 ±창 안의 다른 후보 사주와, 입력 시각의 보고서와 달라지는 항목만 보여준다."""
+    others = [v for v in uncertainty['variants'] if not v['is_input']]
+    st.markdown(f"### ⏳ 출생 시각 ±{uncertainty['window_minutes']:.0f}분 안의 다른 사주")
+    if not others:
+        st.markdown("그 안에서는 사주도 분석도 바뀌지 않네. 시각이 조금 틀려도 걱정 말게.")
+        st.markdown("---")
+        return
+    for variant in others:
+        saju = variant['saju']
+        pillars = " ".join(saju[f'{c}_gan'] + saju[f'{c}_ji'] for c in ('year', 'month', 'day', 'time'))
+        with st.expander(f"{_hhmm(variant['start'])} ~ {_hhmm(variant['end'])} 에 났다면: {pillars} "
+                         f"({variant['share'] * 100:.0f}%, {variant['strength']})"):
+            if not variant['diff']:
+                st.markdown("여덟 글자는 달라도 분석 내용은 같네.")
+            for diff in variant['diff'].values():
+                for analysis in diff['added']:
+                    render_analysis(analysis)
+    st.markdown("---")
+
+# 방금 요청한 개인 분석: 항목이 계산되는 대로 바로 그린다
+if st.session_state.pending_saju:
+    user_a = st.session_state.user_a_input
+    stream = stream_saju_input(user_a, db, cache=report_cache)
+    with st.spinner('천기(天機)를 열어 데이터를 추출 중이네...'):
+        render_saju_header(user_a['name'], stream.saju, stream.true_solar_dt)
+    for analysis in stream:
+        render_analysis(analysis)
+    st.session_state.analysis_report = stream.report()
+    if user_a.get('time_uncertainty'):
+        st.session_state.analysis_report['uncertainty'] = uncertainty_report(stream, user_a['time_uncertainty'])
+        render_uncertainty(st.session_state.analysis_report['uncertainty'])
+    st.session_state.pending_saju = False
+    if persistence:
+        persistence.save_report(st.session_state.session_id, "report", user_a, st.session_state.analysis_report)
+    save_session()
+
+elif st.session_state.analysis_report:
     report = st.session_state.analysis_report
     
     if st.session_state.analysis_mode == 'saju':
         user_a = st.session_state.user_a_input
-        st.subheader(f"## {user_a['name']}의 사주 분석 보고서 📜")
-        
-        saju_data = report['saju']
-        st.markdown(f"> **생년월일시 (진태양시 기준):** {report['user']['true_solar_dt']}")
-        st.markdown(f"> **사주 여덟 글자:** {saju_data['year_gan']}{saju_data['year_ji']} {saju_data['month_gan']}{saju_data['month_ji']} **{saju_data['day_gan']}{saju_data['day_ji']}** {saju_data['time_gan']}{saju_data['time_ji']}")
+        render_saju_header(user_a['name'], report['saju'], report['true_solar_dt'])
         
     elif st.session_state.analysis_mode == 'love':
         user_a = st.session_state.user_a_input
         user_b = st.session_state.user_b_input
         st.subheader(f"## {user_a['name']} ❤️ {user_b['name']} 궁합 분석 보고서 💘")
-        
-    st.markdown("---")
+        st.markdown("---")
     
     for analysis in report['analytics']:
-        st.markdown(f"### {analysis['type']} - {analysis['title']}")
-        st.markdown(analysis['content'])
-        st.markdown("---")
+        render_analysis(analysis)
+    if report.get('uncertainty'):
+        render_uncertainty(report['uncertainty'])
 
+if st.session_state.analysis_report:
     # Disclaimer 추가
     st.markdown("""
 > **[법적 면책 조항]**
@@ -188,28 +307,33 @@ if st.session_state.analysis_report:
 """)
 
 # --------------------------------------------------------------------------
-# 4. [대화창] 신령의 역할 수행 (룰 기반 응답 강화)
+# 4. [대화창] 신령의 역할 수행 (지식 색인 검색 + 구절 인용)
 # --------------------------------------------------------------------------
 if prompt := st.chat_input("신령님께 궁금한 것을 물어보게..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    response_text = "지금은 내가 기도 중이라(API 미연동) 긴 대화는 어렵네. 위 분석 결과나 다시 꼼꼼히 읽어보게!"
-    
-    if st.session_state.analysis_report:
-        
-        if "언제" in prompt or "시기" in prompt or "좋아질까요" in prompt:
-             response_text = "운명의 흐름은 끊임없이 변하는 법! **'세운 분석'** 항목을 보게. 자네에게 **가장 위험한 시기**와 **결실을 맺는 시기**가 명시되어 있네."
-        elif "직업" in prompt or "진로" in prompt or "적성" in prompt:
-             response_text = "보고서의 **'직업 및 적성 분석'**과 **'일주 기질 분석'** 항목을 집중해서 보게. 자네의 **타고난 천직**은 이미 정해져 있네. 그 기운을 따라야 평생 편안하네."
-        elif "궁합" in prompt or "사랑" in prompt or "결혼" in prompt:
-             response_text = "**'일간 기운 궁합 분석'**의 점수는 봤는가? 그리고 **'갈등 원인'** 항목을 보게. 상대의 단점만 보지 말고, 그 원인을 이해하고 **어떻게 보완할지** 고민해야 하네."
-        elif "건강" in prompt or "아파요" in prompt:
-             response_text = "**'오행 불균형 & 개운법'**과 **'습한/조열한 사주 진단'** 부분을 다시 읽어보게. 자네 몸의 근본적인 **에너지 문제**와 **환경적 요인**이 자세히 나와 있네. 처방전을 따르도록 하게."
-        else:
-             response_text = f"자네의 질문('{prompt}')은 이미 보고서에 답이 들어있거나, 아직 때가 되지 않아 천기누설에 해당하네. 보고서를 다시 보게나!"
-    
+    # 보고서가 있으면 그 사람의 일주·주된 십성에 맞는 구절만 골라 인용한다
+    profile = None
+    report = st.session_state.analysis_report
+    if report:
+        saju = report.get('saju') or report.get('user_a_saju')
+        profile = chart_profile(saju, dominant_sibseong(calculate_sibseong(saju['day_gan'], saju)))
+    passages = knowledge.search(prompt, chart=profile, k=3)
+
+    if passages:
+        response_text = "자네 물음에 닿는 구절을 총서와 비전(祕傳)에서 찾아왔네. 찬찬히 읽어보게.\n"
+        for passage in passages:
+            response_text += f"\n> {passage.snippet}\n>\n> — *{passage.citation}*\n"
+        if not report:
+            response_text += "\n자네 사주를 먼저 보여주면 자네 팔자에 맞는 구절만 골라 주겠네."
+    elif report:
+        response_text = f"자네의 질문('{prompt}')은 이미 보고서에 답이 들어있거나, 아직 때가 되지 않아 천기누설에 해당하네. 보고서를 다시 보게나!"
+    else:
+        response_text = "지금은 내가 기도 중이라(API 미연동) 긴 대화는 어렵네. 위 분석 결과나 다시 꼼꼼히 읽어보게!"
+
     with st.chat_message("assistant"):
         st.markdown(response_text)
         st.session_state.messages.append({"role": "assistant", "content": response_text})
+    save_session()
@@ -0,0 +1,269 @@
+import numpy as np
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from compat_rank import YUKHAP_PAIRS, build_stem_score_matrix, _top_k
+from luck_timeline import iter_day_codes
+from manse_calendar import get_calendar, sexagenary_name
+from saju_chart import JIJI, SajuChart
+
+# ==========================================
+# 1. 점수 프로필 (Scoring Profiles)
+# ==========================================
+# 택일(擇日): 한두 사람의 원국과 날짜(일진)·시진의 관계로 좋은 날을 고릅니다.
+# 일진의 점수는 일진 육십갑자 코드(60가지)에만 달려 있으므로, 사람마다 60칸짜리 점수표와
+# 60×12 시진 점수표를 한 번 만들고 날짜 배열에는 gather 만 한다.
+#
+# 항목 (가중치가 0 이면 쓰지 않는다):
+#   day_chung           일진 지지가 본인 일지와 충          year_chung   일진 지지가 본인 띠(년지)와 충
+#   day_yukhap          일진 지지가 본인 일지와 육합        stem_hap     일진 천간이 본인 일간과 천간합
+#   cheonchung_jichung  일진이 본인 일주와 천충지충 (shinsal_db special_risks)
+#   month_chung / month_yukhap   그 날의 월건(절기 기준 월지)이 본인 일지와 충 / 육합
+#   guimun              일진 지지와 본인 일지가 귀문 짝 (shinsal_db 귀문관살 규칙의 pairs)
+#   yeokma / dohwa      일진 지지가 본인 (년지 삼합 기준) 역마 / 도화 자리
+#   pair_score          compatibility_db 의 (본인 일간, 일진 천간) 점수, (점수-50)/50 에 가중치를 곱한다
+#   hour_chung / hour_yukhap / hour_stem_hap   시진과 본인 일주의 관계 (by_hour 검색에서만)
+# forbid 에 든 항목이 하나라도 걸리는 날은 점수를 매기기 전에 뺀다.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "wedding": {
+        "label": "결혼", "day_chung": -40, "year_chung": -15, "day_yukhap": 15, "stem_hap": 10,
+        "cheonchung_jichung": -60, "guimun": -10, "yeokma": 0, "dohwa": 10, "pair_score": 20,
+        "month_chung": -12, "month_yukhap": 6,
+        "hour_chung": -10, "hour_yukhap": 6, "hour_stem_hap": 3, "forbid": ["cheonchung_jichung"],
+    },
+    "moving": {
+        "label": "이사", "day_chung": -30, "year_chung": -20, "day_yukhap": 10, "stem_hap": 5,
+        "cheonchung_jichung": -60, "guimun": -5, "yeokma": 12, "dohwa": 0, "pair_score": 10,
+        "month_chung": -10, "month_yukhap": 5,
+        "hour_chung": -8, "hour_yukhap": 4, "hour_stem_hap": 2, "forbid": ["cheonchung_jichung", "day_chung"],
+    },
+    "contract": {
+        "label": "계약", "day_chung": -35, "year_chung": -10, "day_yukhap": 12, "stem_hap": 12,
+        "cheonchung_jichung": -60, "guimun": -15, "yeokma": -5, "dohwa": 0, "pair_score": 15,
+        "month_chung": -8, "month_yukhap": 4,
+        "hour_chung": -10, "hour_yukhap": 5, "hour_stem_hap": 5, "forbid": ["cheonchung_jichung"],
+    },
+}
+DAY_FEATURES = ["day_chung", "year_chung", "day_yukhap", "stem_hap", "cheonchung_jichung", "guimun",
+                "yeokma", "dohwa"]
+MONTH_FEATURES = ["month_chung", "month_yukhap"]
+HOUR_FEATURES = ["hour_chung", "hour_yukhap", "hour_stem_hap"]
+FEATURE_LABELS = {
+    "day_chung": "일지 충", "year_chung": "띠(년지) 충", "day_yukhap": "일지 육합", "stem_hap": "천간합",
+    "cheonchung_jichung": "천충지충", "guimun": "귀문", "yeokma": "역마 자리", "dohwa": "도화 자리",
+    "month_chung": "월건 충", "month_yukhap": "월건 육합",
+    "hour_chung": "시진 충", "hour_yukhap": "시진 육합", "hour_stem_hap": "시진 천간합",
+}
+
+# 년지 삼합 → 역마/도화 지지 (신자진: 인/유, 인오술: 신/묘, 사유축: 해/오, 해묘미: 사/자)
+_SAMHAP_GROUP = {b: g for g, members in enumerate(("신자진", "인오술", "사유축", "해묘미")) for b in members}
+_YEOKMA = "인신해사"
+_DOHWA = "유묘오자"
+# 귀문관살 규칙이 DB 에 없을 때 쓰는 기본 짝
+DEFAULT_GUIMUN_PAIRS = [("진", "해"), ("자", "유"), ("사", "술"), ("인", "미"), ("묘", "신"), ("축", "오")]
+
+_CODES = np.arange(60)
+_CODE_STEMS, _CODE_BRANCHES = _CODES % 10, _CODES % 12
+# HOUR_CODES[일진 코드, 시지] → 시주 코드 (일간에 따라 자시의 천간이 정해진다)
+_HOUR_BRANCHES = np.arange(12)
+_HOUR_STEMS = ((_CODE_STEMS[:, None] % 5) * 2 + _HOUR_BRANCHES[None, :]) % 10
+HOUR_CODES = (6 * _HOUR_STEMS - 5 * _HOUR_BRANCHES[None, :]) % 60
+
+
+def _pair_lut(pairs: Sequence[Sequence[str]]) -> np.ndarray:
+    lut = np.zeros((12, 12), dtype=bool)
+    for x, y in pairs:
+        lut[JIJI.index(x), JIJI.index(y)] = lut[JIJI.index(y), JIJI.index(x)] = True
+    return lut
+
+
+_YUKHAP = _pair_lut(YUKHAP_PAIRS)
+
+
+def _guimun_pairs(db: Optional[Dict]) -> List[Sequence[str]]:
+    for rule in ((db or {}).get('shinsal') or {}).get('rules', []):
+        if rule.get('id') == '귀문관살':
+            for cond in rule.get('any', []):
+                if cond.get('pairs'):
+                    return cond['pairs']
+    return DEFAULT_GUIMUN_PAIRS
+
+
+def resolve_profile(profile: Any) -> Dict[str, Any]:
+    """이름('wedding' 등) 또는 dict. dict 는 'base' 프로필 위에 덮어쓴다."""
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"모르는 택일 목적이네: {profile} (가능: {', '.join(PROFILES)})")
+        return PROFILES[profile]
+    base = dict(PROFILES[profile.get("base", "wedding")])
+    base.update(profile)
+    return base
+
+
+# ==========================================
+# 2. 코드별 점수표 (Per-code Score Tables)
+# ==========================================
+
+def day_feature_flags(chart: Any, guimun_pairs: Sequence[Sequence[str]] = DEFAULT_GUIMUN_PAIRS) -> Dict[str, np.ndarray]:
+    """원국 하나에 대해 일진 코드 60개 각각의 항목 해당 여부 {항목: (60,) bool}."""
+    chart = SajuChart.from_ganji(chart)
+    stem, branch, year_branch = chart.stem(2), chart.branch(2), chart.branch(0)
+    group = _SAMHAP_GROUP[JIJI[year_branch]]
+    day_chung = (_CODE_BRANCHES - branch) % 12 == 6
+    stem_chung = np.abs(_CODE_STEMS - stem) == 6  # 갑경·을신·병임·정계
+    return {
+        "day_chung": day_chung,
+        "year_chung": (_CODE_BRANCHES - year_branch) % 12 == 6,
+        "day_yukhap": _YUKHAP[branch, _CODE_BRANCHES],
+        "stem_hap": (_CODE_STEMS - stem) % 10 == 5,
+        "cheonchung_jichung": day_chung & stem_chung,
+        "guimun": _pair_lut(guimun_pairs)[branch, _CODE_BRANCHES],
+        "yeokma": _CODE_BRANCHES == JIJI.index(_YEOKMA[group]),
+        "dohwa": _CODE_BRANCHES == JIJI.index(_DOHWA[group]),
+    }
+
+
+def month_feature_flags(chart: Any) -> Dict[str, np.ndarray]:
+    """원국 하나에 대해 월건 지지 12개 각각의 항목 해당 여부 {항목: (12,) bool}."""
+    branch = SajuChart.from_ganji(chart).branch(2)
+    return {"month_chung": (_HOUR_BRANCHES - branch) % 12 == 6, "month_yukhap": _YUKHAP[branch]}
+
+
+def hour_feature_flags(chart: Any) -> Dict[str, np.ndarray]:
+    """원국 하나에 대해 (일진 코드 60 × 시지 12) 시진 항목 해당 여부."""
+    chart = SajuChart.from_ganji(chart)
+    stem, branch = chart.stem(2), chart.branch(2)
+    hour_stems = HOUR_CODES % 10
+    hours = np.broadcast_to(_HOUR_BRANCHES, HOUR_CODES.shape)
+    return {
+        "hour_chung": (hours - branch) % 12 == 6,
+        "hour_yukhap": _YUKHAP[branch, hours],
+        "hour_stem_hap": (hour_stems - stem) % 10 == 5,
+    }
+
+
+class ScoreTables:
+    """한두 사람 × 프로필의 일진 점수표 (60,), 금지 표시 (60,), 월건 점수표 (12,), 시진 점수표 (60, 12)."""
+
+    def __init__(self, charts: Sequence[Any], profile: Any = "wedding", db: Optional[Dict] = None):
+        self.profile = resolve_profile(profile)
+        self.charts = [SajuChart.from_ganji(c) for c in charts]
+        if not 1 <= len(self.charts) <= 2:
+            raise ValueError("택일은 한 사람 또는 두 사람 사주로만 보네.")
+        stem_scores = build_stem_score_matrix((db or {}).get('compatibility', {}))
+        guimun = _guimun_pairs(db)
+        forbid = set(self.profile.get("forbid", []))
+
+        self.day = np.zeros(60, dtype=np.float32)
+        self.forbidden = np.zeros(60, dtype=bool)
+        self.month = np.zeros(12, dtype=np.float32)
+        self.hour = np.zeros((60, 12), dtype=np.float32)
+        self.pair_points: List[np.ndarray] = []
+        self.flags: List[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, np.ndarray]]] = []
+        for chart in self.charts:
+            flags = day_feature_flags(chart, guimun)
+            for name in DAY_FEATURES:
+                self.day += self.profile.get(name, 0) * flags[name]
+                if name in forbid:
+                    self.forbidden |= flags[name]
+            pair = self.profile.get("pair_score", 0) * (stem_scores[chart.stem(2), _CODE_STEMS] - 50.0) / 50.0
+            self.day += pair
+            self.pair_points.append(pair)
+            month_flags = month_feature_flags(chart)
+            for name in MONTH_FEATURES:
+                self.month += self.profile.get(name, 0) * month_flags[name]
+            hour_flags = hour_feature_flags(chart)
+            for name in HOUR_FEATURES:
+                self.hour += self.profile.get(name, 0) * hour_flags[name]
+            self.flags.append((flags, month_flags, hour_flags))
+        # 가지치기용: 일진마다 시진이 보탤 수 있는 최대 점수
+        self.hour_max = self.hour.max(axis=1)
+
+    def reasons(self, code: int, month_branch: int, hour: Optional[int] = None) -> List[str]:
+        """점수에 반영된 항목 설명 (두 사람이면 'A:'/'B:' 접두)."""
+        out = []
+        for i, (flags, month_flags, hour_flags) in enumerate(self.flags):
+            prefix = f"{'AB'[i]}: " if len(self.charts) > 1 else ""
+            hits = [name for name in DAY_FEATURES if flags[name][code]]
+            hits += [name for name in MONTH_FEATURES if month_flags[name][month_branch]]
+            if hour is not None:
+                hits += [name for name in HOUR_FEATURES if hour_flags[name][code, hour]]
+            out += [f"{prefix}{FEATURE_LABELS[name]} ({self.profile[name]:+g})"
+                    for name in hits if self.profile.get(name, 0)]
+            if abs(self.pair_points[i][code]) >= 0.5:
+                out.append(f"{prefix}일간·일진 천간 궁합 ({self.pair_points[i][code]:+.1f})")
+        return out
+
+
+# ==========================================
+# 3. 검색 (Vectorized Scan with Pruning)
+# ==========================================
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    """월요일=0 (1970-01-01 은 목요일)."""
+    return (days.astype(np.int64) + 3) % 7
+
+
+def month_branches(days: np.ndarray) -> np.ndarray:
+    """날짜 배열 각각의 월건 지지 (그 날 정오 기준 절기 월)."""
+    noon = days.astype("datetime64[s]") + np.timedelta64(12, "h")
+    return get_calendar().pillars_bulk(noon)[:, 1].astype(np.int64) % 12
+
+
+def hour_start(day: date, hour_branch: int) -> datetime:
+    """시진의 시작 시각. 자시(0)는 전날 23시부터다 (일주도 23시에 바뀐다)."""
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=2 * hour_branch - 1)
+
+
+def search_auspicious(charts: Sequence[Any], start: date, end: date, profile: Any = "wedding",
+                      k: int = 10, by_hour: bool = False, db: Optional[Dict] = None,
+                      weekdays: Optional[Sequence[int]] = None, hours: Optional[Sequence[int]] = None,
+                      chunk_days: int = 366) -> List[Dict[str, Any]]:
+    """
+    start 이상 end 미만의 날(by_hour 면 날×시진) 중 점수 상위 k 개를 돌려줍니다.
+    weekdays(월=0)·hours(시지 인덱스, 자=0)로 후보를 좁힐 수 있다.
+    시진 검색은 '일진 점수 + 그 일진의 최대 시진 점수'가 지금까지의 k 번째 점수보다 낮은 날을 펼치지 않는다.
+    """
+    tables = ScoreTables(charts, profile, db)
+    hour_scores = tables.hour.astype(np.float64)
+    if hours is not None:
+        allowed = np.zeros(12, dtype=bool)
+        allowed[list(hours)] = True
+        hour_scores = np.where(allowed[None, :], hour_scores, -np.inf)
+    hour_best = hour_scores.max(axis=1)
+
+    # 지금까지의 상위 k: (점수, 날짜, 일진 코드, 월건 지지, 시지 또는 -1)
+    best = (np.empty(0), np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    for days, codes in iter_day_codes(start, end, chunk_days):
+        keep = ~tables.forbidden[codes]
+        if weekdays is not None:
+            keep &= np.isin(_weekday(days), list(weekdays))
+        days, codes = days[keep], codes[keep]
+        months = month_branches(days)
+        scores = tables.day[codes].astype(np.float64) + tables.month[months]
+        if by_hour:
+            threshold = best[0][-1] if len(best[0]) >= k else -np.inf
+            promising = scores + hour_best[codes] >= threshold
+            days, codes, months, scores = days[promising], codes[promising], months[promising], scores[promising]
+            scores = (scores[:, None] + hour_scores[codes]).reshape(-1)
+            chunk = (scores, np.repeat(days, 12), np.repeat(codes, 12), np.repeat(months, 12),
+                     np.tile(np.arange(12), len(days)))
+        else:
+            chunk = (scores, days, codes, months, np.full(len(days), -1))
+        # 이전 상위 k 와 합쳐 다시 상위 k 만 남긴다 (동점은 이른 날짜·시진 우선)
+        merged = [np.concatenate(pair) for pair in zip(best, chunk)]
+        finite = np.isfinite(merged[0])
+        merged = [column[finite] for column in merged]
+        top = _top_k(merged[0] - 1e-9 * np.arange(len(merged[0])), k)
+        best = tuple(column[top] for column in merged)
+
+    results = []
+    for score, day, code, month, hour in zip(*best):
+        day, code, month, hour = day.astype(date), int(code), int(month), int(hour)
+        item = {"date": day, "day_pillar": sexagenary_name(code), "month_branch": JIJI[month],
+                "score": round(float(score), 2), "reasons": tables.reasons(code, month, hour if hour >= 0 else None)}
+        if hour >= 0:
+            item.update(hour=JIJI[hour] + "시", start=hour_start(day, hour),
+                        hour_pillar=sexagenary_name(int(HOUR_CODES[code, hour])))
+        results.append(item)
+    return results
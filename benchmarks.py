@@ -0,0 +1,322 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import platform
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+# process_saju_input / process_love_compatibility 의 단계별 성능 측정입니다. 네트워크 없이 돈다.
+#   python benchmarks.py                     측정 후 기준선과 비교 (회귀 시 종료 코드 1)
+#   python benchmarks.py --save-baseline     현재 결과를 기준선으로 저장
+# 기준선은 기계마다 다르므로 저장소에는 넣지 않는다(.gitignore).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmark_baseline.json")
+DEFAULT_RECORDS = 300
+DEFAULT_SEED = 20240601
+DEFAULT_THRESHOLD = 0.30      # p50 이 기준선보다 30% 넘게 느려지면 회귀
+NOISE_FLOOR_US = 5.0          # 몇 µs 짜리 단계의 흔들림은 회귀로 보지 않는다
+DEFAULT_REPEAT = 3            # 단계마다 여러 바퀴 돌려 p50 이 가장 낮은 바퀴를 쓴다 (다른 프로세스 간섭 제거)
+WARMUP = 20
+AUSPICIOUS_SAMPLES = 40       # 택일 검색은 한 번이 수 ms 라 일부 쌍만 잰다
+AUSPICIOUS_BUDGET_US = 100_000  # 두 사람 × 5년 × 12시진 택일이 대화형으로 느껴지려면 p95 가 이 안에 들어야 한다
+
+# 엔진 코어(saju_engine)는 표준 라이브러리만으로 떠야 한다. 워커·CLI 가 뜰 때마다 내는 비용의 상한.
+IMPORT_BUDGET_US = 150_000     # 새 프로세스에서 import saju_engine 에 걸리는 시간
+IMPORT_RSS_BUDGET_KB = 15_360  # 그 import 로 늘어나는 최대 RSS
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "ephem", "pytz", "geopy", "timezonefinder")
+
+# 지명 사전에 없는 이름: 대역 지오코더(StubGeocoder)를 타는 경로를 측정하려고 섞는다
+UNKNOWN_CITIES = ["Benchville", "Stubtown", "오프라인시", "Nowhere Springs"]
+
+
+# ==========================================
+# 2. 합성 데이터 & 대역 지오코더 (Synthetic Data & Stub Geocoder)
+# ==========================================
+
+def synthetic_records(n: int, seed: int = DEFAULT_SEED, unknown_ratio: float = 0.05) -> List[Dict[str, Any]]:
+    """시드 고정 출생 기록: 1905~2095년, 지명 사전의 도시 + 소수의 미등록 도시, 남/여, 양력/음력."""
+    from gazetteer import get_gazetteer
+
+    rng = random.Random(seed)
+    cities = [city["name"] for city in get_gazetteer().cities]
+    start = datetime(1905, 1, 1)
+    span_minutes = int((datetime(2095, 12, 31) - start).total_seconds() // 60)
+    records = []
+    for i in range(n):
+        city = rng.choice(UNKNOWN_CITIES) if rng.random() < unknown_ratio else rng.choice(cities)
+        records.append({
+            "name": f"bench{i}",
+            "birth_dt": start + timedelta(minutes=rng.randrange(span_minutes)),
+            "city": city,
+            "gender": rng.choice(("남", "여")),
+            "is_lunar": False,
+            "is_leap_month": False,
+        })
+    return records
+
+
+class StubGeocoder:
+    """Nominatim 대신 쓰는 로컬 대역. 이름 해시로 결정적인 좌표를 만들고, 사용자 사전 파일은 건드리지 않는다."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def geocode(self, city_name: str) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        h = sum(ord(ch) * (i + 1) for i, ch in enumerate(city_name))
+        return {"name": city_name, "aliases": [], "latitude": 33.0 + h % 10,
+                "longitude": 124.0 + h % 8, "timezone_str": "Asia/Seoul"}
+
+    @contextmanager
+    def installed(self) -> Iterator["StubGeocoder"]:
+        import gazetteer
+
+        saved = (gazetteer._geocode_remote, gazetteer._write_back, gazetteer.ENABLE_NOMINATIM_FALLBACK)
+        gazetteer._geocode_remote = self.geocode
+        gazetteer._write_back = lambda city: gazetteer.get_gazetteer().add(city)
+        gazetteer.ENABLE_NOMINATIM_FALLBACK = True
+        try:
+            yield self
+        finally:
+            gazetteer._geocode_remote, gazetteer._write_back, gazetteer.ENABLE_NOMINATIM_FALLBACK = saved
+
+
+# ==========================================
+# 3. 측정 (Measurement)
+# ==========================================
+
+def summarize(samples_ns: Sequence[int], peak_bytes: int = 0) -> Dict[str, float]:
+    import numpy as np
+
+    us = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    p50, p95, p99 = np.percentile(us, [50, 95, 99])
+    return {"n": int(len(us)), "mean_us": round(float(us.mean()), 2), "p50_us": round(float(p50), 2),
+            "p95_us": round(float(p95), 2), "p99_us": round(float(p99), 2), "peak_kb": round(peak_bytes / 1024, 1)}
+
+
+def measure_import(module: str = "saju_engine", repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """새 파이썬 프로세스에서 module 을 가져오는 시간과 RSS 증가량, 함께 딸려 온 무거운 모듈을 잽니다. (가장 빠른 바퀴)"""
+    script = ("import json, resource, sys, time\n"
+              "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+              "began = time.perf_counter_ns()\n"
+              f"import {module}\n"
+              "elapsed = time.perf_counter_ns() - began\n"
+              "after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+              f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+              "print(json.dumps({'ns': elapsed, 'rss_kb': after - before, 'heavy': heavy}))\n")
+    env = {**os.environ, "PYTHONPATH": BASE_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    runs = []
+    for _ in range(max(1, repeat)):
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, cwd=BASE_DIR,
+                             check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run["ns"])
+    return {**summarize([best["ns"]]), "rss_kb": best["rss_kb"], "heavy_modules": best["heavy"]}
+
+
+def time_stage(func: Callable[[Any], Any], inputs: Sequence[Any], repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """입력마다 한 번씩 호출해 지연 분포를 재고(repeat 바퀴 중 p50 이 가장 낮은 바퀴),
+    따로 한 바퀴 더 돌려 tracemalloc 으로 메모리 최고치를 잰다."""
+    for item in inputs[:WARMUP]:
+        func(item)
+    best: Optional[Dict[str, float]] = None
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        samples = []
+        for item in inputs:
+            began = clock()
+            func(item)
+            samples.append(clock() - began)
+        summary = summarize(samples)
+        if best is None or summary["p50_us"] < best["p50_us"]:
+            best = summary
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best["peak_kb"] = round(peak / 1024, 1)
+    return best
+
+
+def run_benchmarks(n: int = DEFAULT_RECORDS, seed: int = DEFAULT_SEED,
+                   only: Optional[Sequence[str]] = None, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """모든 단계를 측정해 {"meta", "stages"} 결과를 돌려줍니다."""
+    import saju_engine as se
+    from auspicious_days import search_auspicious
+    from saju_batch import process_saju_batch
+    from db_bundle import load_bundle
+    from saju_chart import SajuChart
+    from shinsal_rules import get_ruleset
+    from population_stats import PopulationStats
+
+    db = load_bundle()
+    records = synthetic_records(n, seed)
+    stub = StubGeocoder()
+    stages: Dict[str, Dict[str, float]] = {}
+
+    def want(name: str) -> bool:
+        return not only or name in only
+
+    if want("import_core"):
+        stages["import_core"] = measure_import("saju_engine", repeat)
+
+    with stub.installed():
+        # 단계별 입력을 미리 만들어 두고, 각 단계는 자기 몫만 잰다
+        locations = [se.get_location_info(r["city"]) for r in records]
+        solar = [se.get_true_solar_time(r["birth_dt"], loc["longitude"], loc["timezone_str"])
+                 for r, loc in zip(records, locations)]
+        offsets = [loc["longitude"] / 15.0 for loc in locations]
+        ganji = [se.get_ganji(dt, utc_offset=off) for dt, off in zip(solar, offsets)]
+        charts = [SajuChart.from_ganji(g) for g in ganji]
+        sibseong = [se.calculate_sibseong(g["day_gan"], c) for g, c in zip(ganji, charts)]
+        elements = [se.calculate_five_elements_count(c) for c in charts]
+        strengths = [se.calculate_strength(g, dt) for g, dt in zip(ganji, solar)]
+        strength_dicts = [s.as_dict() for s in strengths]
+        shinsal_rules = get_ruleset(db.get("shinsal", {}).get("rules", []), "shinsal")
+        population = PopulationStats()
+        idx = list(range(n))
+        pairs = [(records[i], records[(i * 7 + 3) % n]) for i in idx]
+
+        plan = [
+            ("location", lambda i: se.get_location_info(records[i]["city"])),
+            ("true_solar_time", lambda i: se.get_true_solar_time(records[i]["birth_dt"], locations[i]["longitude"],
+                                                                 locations[i]["timezone_str"])),
+            ("ganji", lambda i: se.get_ganji(solar[i], utc_offset=offsets[i])),
+            ("sibseong", lambda i: se.calculate_sibseong(ganji[i]["day_gan"], charts[i])),
+            ("five_elements", lambda i: se.calculate_five_elements_count(charts[i])),
+            ("strength", lambda i: se.calculate_strength(ganji[i], solar[i])),
+            ("identity", lambda i: se.get_day_pillar_identity(ganji[i]["day_gan"] + ganji[i]["day_ji"], db)),
+            ("ohang_imbalance", lambda i: se.analyze_ohang_imbalance(elements[i], ganji[i]["day_gan"], db,
+                                                                      strengths[i])),
+            ("career", lambda i: se.analyze_career(sibseong[i], db, strengths[i])),
+            ("shinsal", lambda i: se.analyze_shinsal(ganji[i], db)),
+            ("cold_reading", lambda i: se.perform_cold_reading(ganji[i], db, elements[i])),
+            ("timeline", lambda i: se.analyze_timeline(solar[i], ganji[i], db, records[i]["gender"])),
+            ("compatibility", lambda i: se.process_love_compatibility(pairs[i][0], pairs[i][1], db)),
+            ("e2e_single", lambda i: se.process_saju_input(records[i], db)),
+            ("uncertainty", lambda i: se.process_saju_input(records[i], db, uncertainty_minutes=60)),
+            # 보고서마다 붙는 분포 집계 비용 (population_stats.observe_report 와 같은 일)
+            ("popstats", lambda i: population.observe_chart(ganji[i], strength_dicts[i],
+                                                            [r["id"] for r in shinsal_rules.evaluate(ganji[i])])),
+        ]
+        for name, func in plan:
+            if want(name):
+                stages[name] = time_stage(func, idx, repeat)
+
+        if want("auspicious"):
+            stages["auspicious"] = time_stage(
+                lambda i: search_auspicious([ganji[i], ganji[(i * 7 + 3) % n]], date(2026, 1, 1), date(2031, 1, 1),
+                                            "wedding", k=10, by_hour=True, db=db),
+                idx[:AUSPICIOUS_SAMPLES], repeat)
+
+        if want("e2e_batch"):
+            # 배치는 건당 지연 대신 전체 처리량을 본다 (p50 칸에는 건당 평균 µs 를 적는다)
+            batch = records * max(1, 2000 // n)
+            best_ns = None
+            for _ in range(repeat):
+                began = time.perf_counter_ns()
+                count = sum(1 for _ in process_saju_batch(batch, db=db, chunk_size=1000))
+                elapsed = time.perf_counter_ns() - began
+                best_ns = elapsed if best_ns is None else min(best_ns, elapsed)
+            tracemalloc.start()
+            sum(1 for _ in process_saju_batch(batch, db=db, chunk_size=1000))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            stages["e2e_batch"] = {**summarize([best_ns / count], peak),
+                                   "records_per_s": round(count / (best_ns / 1e9), 1)}
+
+    meta = {"records": n, "seed": seed, "python": platform.python_version(), "machine": platform.machine(),
+            "created_at": datetime.now().isoformat(timespec="seconds"), "geocoder_calls": stub.calls}
+    return {"meta": meta, "stages": stages}
+
+
+# ==========================================
+# 4. 기준선 비교 (Baseline Comparison)
+# ==========================================
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """기준선 대비 p50 이 threshold 이상 느려진 단계(와 코어 import·택일 응답 예산 초과)의 설명 목록. (비어 있으면 통과)"""
+    regressions = []
+    core = current["stages"].get("import_core")
+    if core:
+        if core["heavy_modules"]:
+            regressions.append(f"import_core: saju_engine 이 {', '.join(core['heavy_modules'])} 를 바로 불러옴")
+        if core["p50_us"] > IMPORT_BUDGET_US:
+            regressions.append(f"import_core: {core['p50_us']}µs (예산 {IMPORT_BUDGET_US}µs 초과)")
+        if core["rss_kb"] > IMPORT_RSS_BUDGET_KB:
+            regressions.append(f"import_core: RSS +{core['rss_kb']}KB (예산 {IMPORT_RSS_BUDGET_KB}KB 초과)")
+    auspicious = current["stages"].get("auspicious")
+    if auspicious and auspicious["p95_us"] > AUSPICIOUS_BUDGET_US:
+        regressions.append(f"auspicious: p95 {auspicious['p95_us']}µs (예산 {AUSPICIOUS_BUDGET_US}µs 초과)")
+    for name, now in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            continue
+        limit = before["p50_us"] * (1 + threshold) + NOISE_FLOOR_US
+        if now["p50_us"] > limit:
+            regressions.append(f"{name}: p50 {before['p50_us']}µs → {now['p50_us']}µs "
+                               f"(+{(now['p50_us'] / before['p50_us'] - 1) * 100:.0f}%, 허용 {threshold * 100:.0f}%)")
+    return regressions
+
+
+def format_table(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    lines = [f"{'stage':<16}{'p50 µs':>10}{'p95 µs':>10}{'p99 µs':>10}{'peak KB':>10}{'vs base':>10}"]
+    for name, s in result["stages"].items():
+        base = (baseline or {}).get("stages", {}).get(name)
+        delta = f"{(s['p50_us'] / base['p50_us'] - 1) * 100:+.0f}%" if base and base["p50_us"] else "-"
+        lines.append(f"{name:<16}{s['p50_us']:>10.1f}{s['p95_us']:>10.1f}{s['p99_us']:>10.1f}{s['peak_kb']:>10.1f}{delta:>10}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="사주 엔진 단계별 벤치마크")
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--stages", nargs="*", help="일부 단계만 측정")
+    parser.add_argument("--json", help="결과를 이 경로에 JSON 으로도 저장")
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks(args.records, args.seed, args.stages, args.repeat)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_table(result, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"기준선 저장: {args.baseline}")
+        return 0
+    if baseline is None:
+        print("기준선이 없네. --save-baseline 으로 먼저 만들어 두게.")
+    regressions = compare(result, baseline or {}, args.threshold)
+    for line in regressions:
+        print(f"회귀: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
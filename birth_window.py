@@ -0,0 +1,273 @@
+import sys
+import random
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from manse_calendar import get_calendar, _to_epoch_seconds, _EPOCH, DEFAULT_UTC_OFFSET
+from luck_timeline import daewoon_start, daewoon_number, month_elapsed_days, DAYS_PER_LUCK_YEAR, DAEWOON_SPAN
+from day_strength import month_phase, PHASE_ENDS
+from saju_chart import PILLAR_COLUMNS, PILLAR_KEYS, SajuChart
+from saju_engine import (ANALYTICS_STAGES, STAGE_INPUTS, SajuReportStream, solar_at, solar_birth_dt, get_ganji,
+                         get_location_info, calculate_sibseong, calculate_five_elements_count, calculate_strength)
+from gazetteer import lookup_city
+from metrics import span
+
+# ==========================================
+# 1. 후보 차트 (Chart Variants)
+# ==========================================
+# 출생 시각이 '9시 반쯤'처럼 어림일 때, 입력 시각 ±N분 안에서 나올 수 있는 서로 다른 분석 입력을 모두 찾습니다.
+# 분 단위로 파이프라인을 다시 돌리지 않고, 입력이 바뀔 수 있는 경계 시각만 모아 구간을 나눈다.
+#   시주      홀수 정시(23시는 일주도 바뀐다)
+#   년·월주   절입 시각 (진태양시 경도 오프셋 기준)
+#   사령 단계 절입 후 PHASE_ENDS 일 (강약·용신)
+#   대운수    앞뒤 절까지 3×(k+0.5) 일 (반올림이 바뀌는 곳)
+#   나이      1월 1일 0시
+# 경계는 남아도 괜찮다 (이웃 구간의 입력이 같으면 합친다). 모자라면 validate_windows 가 잡는다.
+MAX_WINDOW_MINUTES = 12 * 60
+# 반나절 동안 균시차가 움직이는 폭(수십 초)보다 크게 벌어지면 서머타임 전환으로 본다
+SOLAR_DRIFT_SECONDS = 90
+
+
+class ChartVariant(NamedTuple):
+    """입력 시각 구간 [start, end) 에서 분석 입력이 모두 같은 후보 하나. (시각은 입력과 같은 벽시계 기준)"""
+    start: datetime
+    end: datetime
+    solar_start: datetime
+    solar_end: datetime
+    saju: Dict[str, str]
+    phase: int          # 월지 사령 단계
+    luck_start: int     # 대운수
+
+    @property
+    def solar_mid(self) -> datetime:
+        return self.solar_start + (self.solar_end - self.solar_start) / 2
+
+    def inputs(self) -> Dict[str, Any]:
+        """STAGE_INPUTS 의 입력 이름 → 값."""
+        return stage_inputs(self.saju, self.phase, self.luck_start, self.solar_mid.year)
+
+
+def stage_inputs(saju: Dict[str, str], phase: int, luck_start: int, birth_year: int) -> Dict[str, Any]:
+    return {
+        "day": saju['day_gan'] + saju['day_ji'],
+        "chart": "".join(saju[key] for key in PILLAR_KEYS),
+        "phase": phase,
+        "luck": (luck_start, birth_year),
+    }
+
+
+def _to_local(seconds: float, utc_offset: float) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds + utc_offset * 3600)
+
+
+def _cut_points(solar_start: datetime, solar_end: datetime, utc_offset: float) -> List[datetime]:
+    """(solar_start, solar_end) 안에서 분석 입력이 바뀔 수 있는 진태양시 시각들. (정렬, 중복 없음)"""
+    cuts = set()
+    hour = solar_start.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    while hour < solar_end:
+        if hour.hour % 2 == 1:
+            cuts.add(hour)
+        hour += timedelta(hours=1)
+    new_year = datetime(solar_end.year, 1, 1)
+    if solar_start < new_year < solar_end:
+        cuts.add(new_year)
+
+    calendar = get_calendar()
+    i = calendar.term_index(_to_epoch_seconds(solar_start, utc_offset))
+    phase_days = sorted({end for ends in PHASE_ENDS for end in ends})
+    luck_days = [DAYS_PER_LUCK_YEAR * (k + 0.5) for k in range(DAEWOON_SPAN + 1)]
+    # 창은 길어야 반나절이지만, 사령·대운수는 한 달 넘게 떨어진 절에서 재므로 앞뒤 두 달의 절을 본다
+    for jeol in range(i - i % 2 - 4, i - i % 2 + 6, 2):
+        term = calendar.terms[jeol]
+        candidates = [_to_local(term, utc_offset)]
+        candidates += [_to_local(term + days * 86400, DEFAULT_UTC_OFFSET) for days in phase_days]
+        candidates += [_to_local(term + sign * days * 86400, DEFAULT_UTC_OFFSET)
+                       for days in luck_days for sign in (1, -1)]
+        cuts.update(t for t in candidates if solar_start < t < solar_end)
+    return sorted(cuts)
+
+
+def _segment_key(solar_dt: datetime, utc_offset: float, gender: Optional[str]) -> Tuple[Dict[str, str], int, int]:
+    saju = get_ganji(solar_dt, utc_offset=utc_offset)
+    chart = SajuChart.from_ganji(saju)
+    phase = month_phase(chart.branch(1), month_elapsed_days(chart, solar_dt))
+    return saju, phase, daewoon_number(daewoon_start(chart, solar_dt, gender)[1])
+
+
+def _solar_pieces(location_info: Optional[Dict[str, Any]], wall_start: datetime,
+                  wall_end: datetime) -> List[Tuple[datetime, datetime, datetime, datetime, float]]:
+    """
+    벽시계 창을 진태양시가 벽시계와 나란히 움직이는 조각들로 나눕니다. [(벽 시작, 벽 끝, 태양 시작, 태양 끝, UTC 차)]
+    창 안에 서머타임 전환이 있으면 진태양시가 한 시간 뛰므로, 그 시각을 이분탐색으로 찾아 거기서 자른다.
+    location_info 는 한 번 찾아 둔 지명 정보 (못 찾았으면 None)
+    """
+    solar_start, utc_offset = solar_at(wall_start, location_info)
+    solar_end, _ = solar_at(wall_end, location_info)
+    drift = (solar_end - solar_start) - (wall_end - wall_start)
+    if abs(drift.total_seconds()) <= SOLAR_DRIFT_SECONDS or wall_end - wall_start <= timedelta(seconds=1):
+        return [(wall_start, wall_end, solar_start, solar_end, utc_offset)]
+    lo, hi = wall_start, wall_end
+    while hi - lo > timedelta(seconds=1):
+        mid = lo + (hi - lo) / 2
+        solar_mid, _ = solar_at(mid, location_info)
+        if abs(((solar_mid - solar_start) - (mid - wall_start)).total_seconds()) <= SOLAR_DRIFT_SECONDS:
+            lo = mid
+        else:
+            hi = mid
+    return _solar_pieces(location_info, wall_start, lo) + _solar_pieces(location_info, hi, wall_end)
+
+
+def chart_variants(user_data: Dict[str, Any], minutes: float,
+                   lookup: Callable[[str], Optional[Dict[str, Any]]] = get_location_info) -> List[ChartVariant]:
+    """입력 시각 ±minutes 안의 후보 차트들을 시간 순으로 돌려줍니다. (경계 표만 보고 구간마다 한 번씩 계산)
+    지명은 처음에 lookup 으로 한 번만 찾는다."""
+    minutes = min(abs(minutes), MAX_WINDOW_MINUTES)
+    location_info = lookup(user_data.get('city', 'Seoul'))
+    birth_dt = solar_birth_dt(user_data)
+    gender = user_data.get('gender')
+    variants: List[ChartVariant] = []
+    for wall_start, wall_end, solar_start, solar_end, utc_offset in _solar_pieces(
+            location_info, birth_dt - timedelta(minutes=minutes), birth_dt + timedelta(minutes=minutes)):
+        if wall_end <= wall_start and variants:
+            continue
+        solar_span = (solar_end - solar_start).total_seconds() or 1.0
+        wall_span = (wall_end - wall_start).total_seconds()
+
+        def to_wall(solar_dt: datetime) -> datetime:
+            # 한 조각 안에서 진태양시와 벽시계는 (균시차 변화 몇 초를 빼면) 일정한 차이로 움직인다
+            return wall_start + timedelta(seconds=(solar_dt - solar_start).total_seconds() * wall_span / solar_span)
+
+        edges = [solar_start] + _cut_points(solar_start, solar_end, utc_offset) + [solar_end]
+        for lo, hi in zip(edges, edges[1:]):
+            saju, phase, luck = _segment_key(lo + (hi - lo) / 2, utc_offset, gender)
+            last = variants[-1] if variants else None
+            # 1월 1일 0시는 경계이므로, 같은 해에 시작한 구간끼리만 합친다 (나이가 바뀌지 않게)
+            if last is not None and (last.saju, last.phase, last.luck_start) == (saju, phase, luck) \
+                    and last.solar_start.year == lo.year:
+                variants[-1] = last._replace(end=to_wall(hi), solar_end=hi)
+            else:
+                variants.append(ChartVariant(to_wall(lo), to_wall(hi), lo, hi, saju, phase, luck))
+    return variants
+
+
+# ==========================================
+# 2. 증분 보고서 (Incremental Diff Report)
+# ==========================================
+
+def _changed_pillars(base: Dict[str, str], other: Dict[str, str]) -> List[str]:
+    return [column for column in PILLAR_COLUMNS
+            if (base[f'{column}_gan'], base[f'{column}_ji']) != (other[f'{column}_gan'], other[f'{column}_ji'])]
+
+
+def uncertainty_report(stream: SajuReportStream, minutes: float) -> Dict[str, Any]:
+    """
+    다 돈 보고서 스트림(입력 시각 기준)을 바탕으로, ±minutes 안의 다른 후보 차트마다
+    입력(STAGE_INPUTS)이 바뀐 분석 단계만 다시 계산해 입력 시각의 보고서와 다른 항목만 돌려줍니다.
+    """
+    stream.report()
+    user_data, db, gender = stream.user_data, stream.db, stream.user_data.get('gender')
+    base_saju, base_dt = stream.saju, stream.true_solar_dt
+    base_chart = SajuChart.from_ganji(base_saju)
+    base_inputs = stage_inputs(base_saju, month_phase(base_chart.branch(1), month_elapsed_days(base_chart, base_dt)),
+                               daewoon_number(daewoon_start(base_chart, base_dt, gender)[1]), base_dt.year)
+    base_stages = {name: tuple(base_inputs[part] for part in STAGE_INPUTS[name]) for name, _, _ in ANALYTICS_STAGES}
+
+    with span("uncertainty_variants"):
+        variants = chart_variants(user_data, minutes)
+    birth_dt = solar_birth_dt(user_data)
+    window = (variants[-1].end - variants[0].start).total_seconds() or 1.0
+    # 같은 단계·같은 입력은 후보가 여럿이어도 한 번만 계산한다
+    memo: Dict[Tuple[str, Tuple[Any, ...]], List[Dict[str, Any]]] = {}
+    recomputed = 0
+    rows = []
+    for variant in variants:
+        inputs = variant.inputs()
+        row: Dict[str, Any] = {
+            "start": variant.start, "end": variant.end,
+            "share": round((variant.end - variant.start).total_seconds() / window, 4),
+            "saju": variant.saju,
+            "is_input": variant.start <= birth_dt < variant.end or (birth_dt == variant.end == variants[-1].end),
+            "changed_pillars": _changed_pillars(base_saju, variant.saju),
+            "strength": calculate_strength(variant.saju, variant.solar_mid).label,
+            "changed_sections": [],
+            "diff": {},
+        }
+        args = None
+        for name, _, build in ANALYTICS_STAGES:
+            fingerprint = tuple(inputs[part] for part in STAGE_INPUTS[name])
+            if fingerprint == base_stages[name]:
+                continue
+            items = memo.get((name, fingerprint))
+            if items is None:
+                if args is None:
+                    sibseong_map = calculate_sibseong(variant.saju['day_gan'], variant.saju)
+                    args = (variant.saju, sibseong_map, calculate_five_elements_count(variant.saju),
+                            variant.solar_mid, db, gender)
+                with span(f"uncertainty_{name}"):
+                    items = memo[(name, fingerprint)] = build(*args)
+                recomputed += 1
+            base_items = stream.stage_items.get(name, [])
+            added = [item for item in items if item not in base_items]
+            removed = [item for item in base_items if item not in items]
+            if added or removed:
+                row["changed_sections"].append(name)
+                row["diff"][name] = {"added": added, "removed": removed}
+        rows.append(row)
+    return {
+        "window_minutes": min(abs(minutes), MAX_WINDOW_MINUTES),
+        "variants": rows,
+        "stages_recomputed": recomputed,
+        "stages_total": len(rows) * len(ANALYTICS_STAGES),
+    }
+
+
+# ==========================================
+# 3. 검증 (Validation)
+# ==========================================
+
+def validate_windows(samples: int = 200, minutes: float = 90, seed: int = 0) -> List[str]:
+    """
+    임의의 출생 정보마다 창 안을 1분 간격으로 처음부터 계산한 (사주, 사령 단계, 대운수) 가
+    그 분이 속한 후보 구간의 값과 같은지 확인합니다. 어긋난 항목 설명 목록을 돌려준다.
+    경계에서 몇 초 안쪽의 분은 벽시계↔진태양시 선형 근사 오차로 건너뛴다.
+    지명은 네트워크 없이(로컬 사전만) 출생 정보마다 한 번 찾는다.
+    """
+    rng = random.Random(seed)
+    # 마지막은 지명 사전에 없는 곳 (보정 없이 한국 표준시로 계산되는 경로)
+    cities = ["Seoul", "Busan", "Jeju", "Tokyo", "London", "New York", "Atlantis"]
+    errors = []
+    calendar = get_calendar()
+    for _ in range(samples):
+        # 절입 근처를 자주 보도록 절 시각 주변에서 고른다
+        term = calendar.terms[rng.randrange(200, len(calendar.terms) - 200)]
+        birth_dt = _to_local(term + rng.uniform(-2, 2) * 3600, DEFAULT_UTC_OFFSET).replace(second=0, microsecond=0)
+        if rng.random() < 0.5:
+            birth_dt += timedelta(days=rng.choice(PHASE_ENDS[rng.randrange(12)]) + rng.choice((-1, 0, 1)) / 24)
+        user = {"birth_dt": birth_dt, "city": rng.choice(cities), "gender": rng.choice(("남", "여"))}
+        location_info = lookup_city(user["city"], allow_network=False)
+        variants = chart_variants(user, minutes, lookup=lambda _: location_info)
+        edges = [v.start for v in variants[1:]]
+        for m in range(-int(minutes), int(minutes)):
+            wall = birth_dt + timedelta(minutes=m)
+            if any(abs((wall - edge).total_seconds()) < 5 for edge in edges):
+                continue
+            solar_dt, utc_offset = solar_at(wall, location_info)
+            expected = _segment_key(solar_dt, utc_offset, user["gender"])
+            found = next((v for v in variants if v.start <= wall < v.end), None)
+            if found is None or (found.saju, found.phase, found.luck_start) != expected:
+                errors.append(f"{user['city']} {birth_dt} {m:+d}분: 구간 값이 처음부터 계산한 값과 다름")
+    return errors
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--validate":
+        problems = validate_windows()
+        print("\n".join(problems[:20]) or "출생 시각 창 검증 통과")
+        sys.exit(1 if problems else 0)
+    if len(sys.argv) < 2:
+        sys.exit("사용법: python birth_window.py 'YYYY-MM-DD HH:MM' [도시] [±분]")
+    user = {"birth_dt": datetime.strptime(sys.argv[1], "%Y-%m-%d %H:%M"),
+            "city": sys.argv[2] if len(sys.argv) > 2 else "Seoul"}
+    for variant in chart_variants(user, float(sys.argv[3]) if len(sys.argv) > 3 else 30):
+        print(f"{variant.start:%H:%M:%S} ~ {variant.end:%H:%M:%S}  "
+              + " ".join(variant.saju[f'{c}_gan'] + variant.saju[f'{c}_ji'] for c in PILLAR_COLUMNS)
+              + f"  사령 {variant.phase}  대운수 {variant.luck_start}")
@@ -0,0 +1,241 @@
+import sys
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from manse_calendar import (DAY_ANCHOR_DATE, DEFAULT_UTC_OFFSET, TERMS_PER_YEAR, _EPOCH, ManseCalendar,
+                            get_calendar, sexagenary_name)
+from saju_chart import CHEONGAN, JIJI
+
+# ==========================================
+# 1. 패턴 (Pillar Patterns)
+# ==========================================
+# get_ganji 의 역함수입니다: 네 기둥 중 일부(또는 한 글자씩)를 정해 주면 그 사주가 나오는 시각 구간을 모두 찾는다.
+#   "?? ?? 경진 ?유"                    년/월/일/시 순서, '?' 또는 '*' 는 아무 글자
+#   {"day": "경진", "time": "?유"}       dict 로 일부 기둥만 (빠진 기둥은 '??')
+# 결과 시각은 get_ganji(dt, utc_offset) 가 쓰는 것과 같은 시계(naive 현지 시각)다.
+# 진태양시로 본 차트라면 utc_offset=경도/15 로 찾고, 결과를 표준시로 되돌리는 것은 호출하는 쪽 몫이다.
+PILLAR_NAMES = ["year", "month", "day", "time"]
+WILDCARDS = "?*"
+_CODES = np.arange(60)
+# HOUR_STEMS[일진 코드, 시지] → 시주 천간 (일간에 따라 자시의 천간이 정해진다)
+HOUR_STEMS = ((_CODES[:, None] % 10) % 5 * 2 + np.arange(12)[None, :]) % 10
+
+
+def _pillar_mask(token: Optional[str]) -> Optional[np.ndarray]:
+    """'경진'/'?진'/'경?'/'??' 를 육십갑자 60칸 bool 마스크로. 아무 제약이 없으면 None."""
+    if token is None or all(ch in WILDCARDS for ch in token):
+        return None
+    if len(token) != 2:
+        raise ValueError(f"기둥은 두 글자(천간+지지)로 적게: {token}")
+    stem, branch = token
+    mask = np.ones(60, dtype=bool)
+    if stem not in WILDCARDS:
+        if stem not in CHEONGAN:
+            raise ValueError(f"모르는 천간이네: {stem}")
+        mask &= _CODES % 10 == CHEONGAN.index(stem)
+    if branch not in WILDCARDS:
+        if branch not in JIJI:
+            raise ValueError(f"모르는 지지네: {branch}")
+        mask &= _CODES % 12 == JIJI.index(branch)
+    if not mask.any():
+        raise ValueError(f"음양이 맞지 않아 없는 기둥이네: {token}")
+    return mask
+
+
+def parse_pattern(pattern: Any) -> List[Optional[np.ndarray]]:
+    """문자열/dict 패턴을 기둥별 마스크 4개(제약 없으면 None)로 바꿉니다."""
+    if isinstance(pattern, dict):
+        unknown = set(pattern) - set(PILLAR_NAMES)
+        if unknown:
+            raise ValueError(f"모르는 기둥 이름이네: {', '.join(sorted(unknown))}")
+        tokens = [pattern.get(name) for name in PILLAR_NAMES]
+    else:
+        tokens = str(pattern).split()
+        if len(tokens) != 4:
+            raise ValueError("패턴은 '년 월 일 시' 네 기둥을 띄어 적게. (예: '?? ?? 경진 ?유')")
+    masks = [_pillar_mask(token) for token in tokens]
+    if all(mask is None for mask in masks):
+        raise ValueError("적어도 한 글자는 정해 주게.")
+    return masks
+
+
+# ==========================================
+# 2. 역색인 (Inverted Index: Pillar Code → Month Intervals)
+# ==========================================
+# 년주·월주는 절(節) 사이 구간마다 일정하므로, 만세력 테이블의 절 시각으로 구간 배열을 만들고
+# 육십갑자 코드마다 그 코드가 나오는 구간 번호 목록(CSR: offsets + postings)을 둔다.
+# 일주는 60일 주기, 시주는 일간으로 정해지므로 구간 안에서 산술로 바로 걸러 낸다.
+
+class ChartWindow(NamedTuple):
+    """패턴이 성립하는 [start, end) 구간. pillars 는 구간 안에서 변하지 않는 기둥의 이름."""
+    start: datetime
+    end: datetime
+    pillars: Dict[str, str]
+
+
+class PillarIndex:
+    """절 구간 단위의 년주/월주 역색인입니다. 시각은 UTC epoch 초로 들고 있다."""
+
+    def __init__(self, calendar: Optional[ManseCalendar] = None):
+        calendar = calendar or get_calendar()
+        terms = np.asarray(calendar.terms, dtype=np.int64)
+        boundaries = terms[0::2]  # 짝수 인덱스가 월을 가르는 절
+        self.starts = boundaries[:-1]
+        self.ends = boundaries[1:]
+        jeol = np.arange(len(self.starts))
+        year_idx, jeol_in_year = np.divmod(jeol, TERMS_PER_YEAR // 2)
+        saju_year = calendar.first_year + year_idx - (jeol_in_year == 0)
+        self.year_codes = (saju_year - 4) % 60
+        month_offset = (jeol_in_year - 1) % 12
+        month_stem = ((self.year_codes % 10) % 5 * 2 + 2 + month_offset) % 10
+        self.month_codes = (6 * month_stem - 5 * ((month_offset + 2) % 12)) % 60
+        self.postings = {"year": self._csr(self.year_codes), "month": self._csr(self.month_codes)}
+        self.day_anchor_index = calendar.day_anchor_index
+        self.anchor_seconds = int((DAY_ANCHOR_DATE - _EPOCH).total_seconds())
+
+    @staticmethod
+    def _csr(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(codes, kind="stable")
+        offsets = np.searchsorted(codes[order], np.arange(61))
+        return offsets, order
+
+    def intervals_for(self, pillar: str, mask: np.ndarray) -> np.ndarray:
+        """mask 에 든 코드들이 나오는 구간 번호 (오름차순)."""
+        offsets, order = self.postings[pillar]
+        parts = [order[offsets[code]:offsets[code + 1]] for code in np.flatnonzero(mask)]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def candidate_intervals(self, masks: Sequence[Optional[np.ndarray]]) -> np.ndarray:
+        """년/월 제약을 만족하는 구간 번호. 더 좁은 쪽 목록을 뽑고 다른 쪽은 구간별 코드로 거른다."""
+        year_mask, month_mask = masks[0], masks[1]
+        if year_mask is None and month_mask is None:
+            return np.arange(len(self.starts))
+        lists = []
+        if year_mask is not None:
+            lists.append(("year", year_mask, self.year_codes))
+        if month_mask is not None:
+            lists.append(("month", month_mask, self.month_codes))
+        offsets = {name: self.postings[name][0] for name, _, _ in lists}
+        lists.sort(key=lambda item: int(np.diff(offsets[item[0]])[item[1]].sum()))
+        name, mask, _ = lists[0]
+        found = self.intervals_for(name, mask)
+        for _, mask, codes in lists[1:]:
+            found = found[mask[codes[found]]]
+        return found
+
+    def search(self, pattern: Any, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               utc_offset: float = DEFAULT_UTC_OFFSET) -> Iterator[ChartWindow]:
+        """
+        패턴이 성립하는 시각 구간을 시간 순서로 하나씩 흘려보냅니다. (게으른 반복자)
+        구간의 크기는 정해진 기둥 중 가장 잘게 바뀌는 것을 따른다: 시주가 있으면 시진, 일주가 있으면 하루,
+        년/월만 있으면 절 구간. start/end 를 주면 그 안으로 잘라 낸다.
+        """
+        masks = parse_pattern(pattern)
+        offset = int(round(utc_offset * 3600))
+        lo = self.starts[0] + offset if start is None else int((start - _EPOCH).total_seconds())
+        hi = self.ends[-1] + offset if end is None else int((end - _EPOCH).total_seconds())
+
+        candidates = self.candidate_intervals(masks)
+        # 범위에 걸치는 구간만 (구간 시작은 오름차순)
+        candidates = candidates[(self.ends[candidates] + offset > lo) & (self.starts[candidates] + offset < hi)]
+        for i in candidates:
+            seg_lo = max(int(self.starts[i]) + offset, lo)
+            seg_hi = min(int(self.ends[i]) + offset, hi)
+            fixed = {"year": sexagenary_name(int(self.year_codes[i])), "month": sexagenary_name(int(self.month_codes[i]))}
+            if masks[2] is None and masks[3] is None:
+                yield ChartWindow(_to_datetime(seg_lo), _to_datetime(seg_hi), fixed)
+                continue
+            for window in self._windows_in_segment(seg_lo, seg_hi, masks[2], masks[3]):
+                yield ChartWindow(_to_datetime(window[0]), _to_datetime(window[1]), {**fixed, **window[2]})
+
+    def _windows_in_segment(self, seg_lo: int, seg_hi: int, day_mask: Optional[np.ndarray],
+                            time_mask: Optional[np.ndarray]) -> Iterator[Tuple[int, int, Dict[str, str]]]:
+        """한 절 구간(현지 초) 안에서 일주·시주 조건을 만족하는 구간."""
+        # 일주는 현지 23시에 바뀐다: n 번째 날은 [앵커 + n일 - 1시간, +1일)
+        first = (seg_lo + 3600 - self.anchor_seconds) // 86400
+        last = (seg_hi - 1 + 3600 - self.anchor_seconds) // 86400
+        days = np.arange(first, last + 1)
+        codes = (self.day_anchor_index + days) % 60
+        if day_mask is not None:
+            keep = day_mask[codes]
+            days, codes = days[keep], codes[keep]
+        day_starts = self.anchor_seconds + days * 86400 - 3600
+        if time_mask is None:
+            for day_start, code in zip(day_starts.tolist(), codes.tolist()):
+                window_lo, window_hi = max(day_start, seg_lo), min(day_start + 86400, seg_hi)
+                if window_lo < window_hi:
+                    yield window_lo, window_hi, {"day": sexagenary_name(code)}
+            return
+        hour_codes = (6 * HOUR_STEMS[codes] - 5 * np.arange(12)[None, :]) % 60
+        rows, hours = np.nonzero(time_mask[hour_codes])
+        for row, hour in zip(rows.tolist(), hours.tolist()):
+            window_lo = max(int(day_starts[row]) + hour * 7200, seg_lo)
+            window_hi = min(int(day_starts[row]) + (hour + 1) * 7200, seg_hi)
+            if window_lo < window_hi:
+                yield window_lo, window_hi, {"day": sexagenary_name(int(codes[row])),
+                                             "time": sexagenary_name(int(hour_codes[row, hour]))}
+
+
+def _to_datetime(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=int(seconds))
+
+
+_index: Optional[PillarIndex] = None
+
+
+def get_pillar_index() -> PillarIndex:
+    """프로세스당 한 번만 색인을 만듭니다. (절 구간 약 2,400개라 수 ms)"""
+    global _index
+    if _index is None:
+        _index = PillarIndex()
+    return _index
+
+
+def find_birth_windows(pattern: Any, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       utc_offset: float = DEFAULT_UTC_OFFSET) -> Iterator[ChartWindow]:
+    """패턴(예: '?? ?? 경진 ?유')이 나오는 출생 시각 구간을 시간 순서로 흘려보냅니다."""
+    return get_pillar_index().search(pattern, start, end, utc_offset)
+
+
+# ==========================================
+# 3. 검증 (Validation against the Forward Calendar)
+# ==========================================
+
+def validate_index(samples: int = 2000, seed: int = 0) -> List[str]:
+    """
+    임의의 시각들에서 정방향 pillars_bulk 로 얻은 사주가 역검색 구간에 들어가는지,
+    역검색 구간의 양 끝이 정방향 계산으로도 그 패턴인지 확인합니다. 어긋난 항목 설명 목록을 돌려준다.
+    """
+    calendar = get_calendar()
+    index = get_pillar_index()
+    rng = np.random.default_rng(seed)
+    lo = int(index.starts[0] + DEFAULT_UTC_OFFSET * 3600)
+    hi = int(index.ends[-1] + DEFAULT_UTC_OFFSET * 3600)
+    seconds = rng.integers(lo, hi, samples)
+    pillars = calendar.pillars_bulk(seconds.astype("datetime64[s]"))
+    errors = []
+    for sec, row in zip(seconds.tolist(), pillars.tolist()):
+        pattern = " ".join(sexagenary_name(code) for code in row)
+        dt = _to_datetime(sec)
+        windows = list(index.search(pattern, dt - timedelta(hours=3), dt + timedelta(hours=3)))
+        if not any(w.start <= dt < w.end for w in windows):
+            errors.append(f"{dt}: {pattern} 구간을 못 찾음")
+        for w in windows:
+            for edge in (w.start, w.end - timedelta(seconds=1)):
+                if calendar.pillars(edge) != row:
+                    errors.append(f"{edge}: {pattern} 구간 끝이 다른 사주")
+    return errors
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--validate":
+        problems = validate_index()
+        print("\n".join(problems) or "역검색 색인 검증 통과")
+        sys.exit(1 if problems else 0)
+    if len(sys.argv) < 2:
+        sys.exit("사용법: python chart_search.py '?? ?? 경진 ?유' [시작 YYYY-MM-DD] [끝 YYYY-MM-DD]")
+    begin = datetime.strptime(sys.argv[2], "%Y-%m-%d") if len(sys.argv) > 2 else None
+    finish = datetime.strptime(sys.argv[3], "%Y-%m-%d") if len(sys.argv) > 3 else None
+    for window in find_birth_windows(sys.argv[1], begin, finish):
+        print(f"{window.start:%Y-%m-%d %H:%M} ~ {window.end:%Y-%m-%d %H:%M}  "
+              + " ".join(window.pillars.get(name, "??") for name in PILLAR_NAMES))
@@ -0,0 +1,112 @@
+import numpy as np
+from typing import Any, Dict, Iterator, Optional, Tuple
+from saju_chart import CHEONGAN, JIJI, SajuChart
+
+# ==========================================
+# 1. 점수 행렬 (Score Matrices)
+# ==========================================
+DEFAULT_SCORE = 50.0  # compatibility_db 에 없는 조합
+
+# 일지(日支) 관계 가감점: 육합은 더하고 충은 뺀다
+YUKHAP_PAIRS = [("자", "축"), ("인", "해"), ("묘", "술"), ("진", "유"), ("사", "신"), ("오", "미")]
+BRANCH_BONUS = {"yukhap": 5.0, "chung": -10.0}
+
+
+def build_stem_score_matrix(comp_db: Dict[str, Any]) -> np.ndarray:
+    """compatibility_db 의 '갑_을' 점수를 10×10 행렬로 만듭니다. (한쪽 방향만 있으면 대칭으로 채움)"""
+    matrix = np.full((10, 10), np.nan, dtype=np.float32)
+    for a, gan_a in enumerate(CHEONGAN):
+        for b, gan_b in enumerate(CHEONGAN):
+            data = comp_db.get(f"{gan_a}_{gan_b}") or comp_db.get(f"{gan_b}_{gan_a}") or {}
+            score = data.get("score")
+            if isinstance(score, (int, float)):
+                matrix[a, b] = score
+    return np.where(np.isnan(matrix), DEFAULT_SCORE, matrix).astype(np.float32)
+
+
+def build_branch_adjustment() -> np.ndarray:
+    """12×12 일지 관계 가감점 행렬."""
+    adjust = np.zeros((12, 12), dtype=np.float32)
+    for x, y in YUKHAP_PAIRS:
+        i, j = JIJI.index(x), JIJI.index(y)
+        adjust[i, j] = adjust[j, i] = BRANCH_BONUS["yukhap"]
+    for i in range(12):
+        adjust[i, (i + 6) % 12] = BRANCH_BONUS["chung"]
+    return adjust
+
+
+def build_pillar_score_matrix(comp_db: Dict[str, Any], with_branches: bool = True) -> np.ndarray:
+    """육십갑자 일주끼리의 60×60 궁합 점수. 일간 점수에 일지 관계 가감점을 더합니다."""
+    codes = np.arange(60)
+    stems, branches = codes % 10, codes % 12
+    matrix = build_stem_score_matrix(comp_db)[stems[:, None], stems[None, :]]
+    if with_branches:
+        matrix = matrix + build_branch_adjustment()[branches[:, None], branches[None, :]]
+    return np.clip(matrix, 0, 100).astype(np.float32)
+
+
+def day_pillar_code(ganji_map: Dict[str, str]) -> int:
+    """간지 dict (또는 SajuChart) 의 일주를 육십갑자 인덱스(0=갑자)로 부호화합니다."""
+    return SajuChart.from_ganji(ganji_map).pillar(2)
+
+
+# ==========================================
+# 2. 순위 엔진 (Ranking Engine)
+# ==========================================
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """점수 배열에서 상위 k 개 인덱스를 내림차순으로 (argpartition + 부분 정렬)."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class CompatibilityIndex:
+    """후보 풀의 일주 코드를 int8 배열로 들고, 점수 행렬 gather 로 1:N 순위를 매깁니다."""
+
+    def __init__(self, pool_codes: Any, matrix: np.ndarray):
+        self.pool = np.asarray(pool_codes, dtype=np.int8)
+        self.matrix = matrix
+
+    @classmethod
+    def from_db(cls, pool_codes: Any, db: Dict[str, Any], with_branches: bool = True) -> "CompatibilityIndex":
+        return cls(pool_codes, build_pillar_score_matrix(db.get('compatibility', {}), with_branches))
+
+    def scores_for(self, user_code: int) -> np.ndarray:
+        return self.matrix[user_code, self.pool]
+
+    def top_k(self, user_code: int, k: int = 10, exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """사용자 한 명에 대한 상위 k 후보의 (풀 인덱스, 점수)."""
+        scores = self.scores_for(user_code)
+        if exclude is not None:
+            scores = scores.copy()
+            scores[exclude] = -np.inf
+        idx = _top_k(scores, k)
+        return idx, scores[idx]
+
+    def all_pairs_top_k(self, k: int = 10, chunk_size: int = 4096) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        풀의 모든 구성원에 대해 (자기 자신 제외) 상위 k 후보를 청크 단위로 흘려보냅니다.
+        yield (구성원 인덱스 (m,), 후보 인덱스 (m, k), 점수 (m, k)). N×N 행렬은 만들지 않는다.
+        같은 일주끼리는 점수 행이 같으므로 청크 안에서 고유 일주별로 한 번만 순위를 매긴다.
+        """
+        n = len(self.pool)
+        k = min(k, n - 1)
+        for start in range(0, n, chunk_size):
+            members = np.arange(start, min(start + chunk_size, n))
+            codes = self.pool[members]
+            top_idx = np.empty((len(members), k), dtype=np.int64)
+            top_scores = np.empty((len(members), k), dtype=np.float32)
+            for code in np.unique(codes):
+                rows = np.nonzero(codes == code)[0]
+                scores = self.matrix[code, self.pool]
+                # 자기 자신이 섞일 수 있으니 k+1 개를 뽑고, stable 정렬로 자신만 맨 뒤로 보낸다
+                cand = _top_k(scores, k + 1)
+                is_self = cand[None, :] == members[rows, None]
+                picked = cand[np.argsort(is_self, axis=1, kind="stable")[:, :k]]
+                top_idx[rows] = picked
+                top_scores[rows] = scores[picked]
+            yield members, top_idx, top_scores
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import argparse
+from datetime import date, datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+from compat_rank import YUKHAP_PAIRS
+from luck_timeline import iter_day_codes, ten_gods_bulk
+from saju_chart import JIJI, PILLAR_COLUMNS
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+# 매일 아침 회원별 일진 풀이를 미리 계산해 두는 야간 배치입니다.
+#   python daily_fortune_job.py users.jsonl out_dir --days 7 --workers 8
+# 회원 기록은 shard_size 명씩 샤드로 나뉘어 프로세스 풀에서 계산되고, 샤드마다 out_dir/part-00000.parquet
+# 하나가 쓰인다. 끝난 샤드는 _checkpoint.json 에 기록되므로 중간에 죽어도 다시 실행하면 이어서 한다.
+# (--start 를 빼고 다시 실행하면 자정이 지났더라도 체크포인트의 시작일로 이어 간다. 다 끝난 작업은 이어 가지 않는다)
+DEFAULT_DAYS = 7
+DEFAULT_SHARD_SIZE = 5000
+CHECKPOINT_FILE = "_checkpoint.json"
+REPORT_FILE = "_report.json"
+
+# YUKHAP_LUT[a, b] → 지지 a, b 가 육합이면 True
+YUKHAP_LUT = np.zeros((12, 12), dtype=bool)
+for _x, _y in YUKHAP_PAIRS:
+    YUKHAP_LUT[JIJI.index(_x), JIJI.index(_y)] = YUKHAP_LUT[JIJI.index(_y), JIJI.index(_x)] = True
+
+
+def part_path(out_dir: str, shard: int) -> str:
+    return os.path.join(out_dir, f"part-{shard:05d}.parquet")
+
+
+# ==========================================
+# 2. 일진 × 원국 상호작용 (Day Pillar vs Natal Chart)
+# ==========================================
+
+def daily_interactions(stems: np.ndarray, branches: np.ndarray, start: date, days: int) -> Dict[str, np.ndarray]:
+    """
+    (m, 4) 원국 천간/지지 코드와 start 부터 days 일의 일진으로 (m × days) 행의 컬럼 배열을 만듭니다.
+    행 순서는 회원 우선(회원 0 의 days 일, 회원 1 의 days 일 …).
+    """
+    dates, codes = next(iter_day_codes(start, start + timedelta(days=days), chunk_days=days))
+    m, n = len(stems), len(codes)
+    day_branch = codes % 12
+    gods = ten_gods_bulk(stems[:, 2:3], codes[None, :])
+    # 일진 지지와 원국 네 지지의 충/합 개수, 일지와의 관계는 따로 표시
+    diff = (branches[:, :, None] - day_branch[None, None, :]) % 12
+    chung = (diff == 6).sum(axis=1)
+    yukhap = YUKHAP_LUT[branches[:, :, None], day_branch[None, None, :]].sum(axis=1)
+    natal_day = branches[:, 2:3]
+    return {
+        "member": np.repeat(np.arange(m), n),
+        "date": np.tile(dates, m),
+        "day_code": np.tile(codes, m).astype(np.int8),
+        "sibseong_code": gods["gan"].reshape(-1).astype(np.int8),
+        "ji_sibseong_code": gods["ji"].reshape(-1).astype(np.int8),
+        "chung_count": chung.reshape(-1).astype(np.int8),
+        "yukhap_count": yukhap.reshape(-1).astype(np.int8),
+        "day_branch_chung": ((natal_day - day_branch[None, :]) % 12 == 6).reshape(-1),
+        "day_branch_yukhap": YUKHAP_LUT[natal_day, day_branch[None, :]].reshape(-1),
+    }
+
+
+def compute_shard(shard: int, frame: pd.DataFrame, start: date, days: int, out_dir: str,
+                  id_column: str = "user_id", shard_size: int = DEFAULT_SHARD_SIZE) -> Tuple[int, int, int, float]:
+    """워커에서 실행: 샤드 하나의 원국을 벡터로 계산하고 일진 상호작용을 Parquet 로 씁니다.
+    반환값은 (샤드 번호, 회원 수, 행 수, 소요 초)."""
+    from saju_batch import compute_chart_frame, require_pyarrow
+
+    pa, pq = require_pyarrow()
+
+    began = time.perf_counter()
+    # 워커마다 Nominatim 을 부르면 요청 한도와 지명 사전 쓰기가 겹치므로 로컬 사전만 쓴다 (모르는 도시는 미보정)
+    charts = compute_chart_frame(frame, allow_network=False)
+    stems = np.stack([charts[f"{c}_gan_code"].to_numpy() for c in PILLAR_COLUMNS], axis=1).astype(np.int64)
+    branches = np.stack([charts[f"{c}_ji_code"].to_numpy() for c in PILLAR_COLUMNS], axis=1).astype(np.int64)
+    columns = daily_interactions(stems, branches, start, days)
+
+    # id 컬럼이 없으면 입력 전체에서의 행 번호를 쓴다
+    ids = frame[id_column].to_numpy() if id_column in frame else shard * shard_size + np.arange(len(frame))
+    member = columns.pop("member")
+    table = pa.table({id_column: ids[member], **columns})
+    tmp_path = part_path(out_dir, shard) + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, part_path(out_dir, shard))
+    return shard, len(frame), table.num_rows, time.perf_counter() - began
+
+
+# ==========================================
+# 3. 체크포인트 & 진행 보고 (Checkpoint & Progress)
+# ==========================================
+
+def _checkpoint_start(out_dir: str) -> Optional[date]:
+    """이어서 돌릴 작업의 시작일. 체크포인트가 없거나 이미 끝난 작업이면 None."""
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    start = checkpoint.get("params", {}).get("start")
+    if checkpoint.get("completed") or not start:
+        return None
+    return date.fromisoformat(start)
+
+
+def _load_checkpoint(out_dir: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return {"params": params, "done": [], "completed": False}
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("params") != params:
+        if checkpoint.get("completed"):
+            raise ValueError(f"{out_dir} 에는 이미 끝난 작업({checkpoint.get('params')})이 있네. 새 폴더를 쓰게.")
+        raise ValueError(f"{out_dir} 에는 다른 설정({checkpoint.get('params')})으로 돌던 작업이 있네. 새 폴더를 쓰게.")
+    # 같은 설정으로 다시 돌면 (회원이 늘었을 수 있으니) 끝날 때까지 미완료로 본다
+    checkpoint["completed"] = False
+    # 체크포인트에 있어도 파일이 없으면 다시 계산한다
+    checkpoint["done"] = [s for s in checkpoint["done"] if os.path.exists(part_path(out_dir, s))]
+    return checkpoint
+
+
+def _save_json(path: str, data: Dict[str, Any]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _iter_shards(records: Any, shard_size: int, done: set) -> Iterator[Tuple[int, pd.DataFrame]]:
+    from saju_batch import _iter_record_frames
+
+    for shard, frame in enumerate(_iter_record_frames(records, shard_size)):
+        if shard not in done:
+            yield shard, frame.reset_index(drop=True)
+
+
+def run_daily_fortune_job(records: Any, out_dir: str, start: Optional[date] = None, days: int = DEFAULT_DAYS,
+                          workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE,
+                          id_column: str = "user_id", verbose: bool = True) -> Dict[str, Any]:
+    """
+    회원 기록(DataFrame / JSONL 경로 / dict 이터러블)의 앞으로 days 일 일진 풀이 재료를 계산합니다.
+    이미 끝난 샤드는 건너뛰고, 진행/처리량 보고서(dict)를 돌려주며 out_dir/_report.json 에도 남깁니다.
+    start 가 없으면 끝나지 않은 체크포인트의 시작일(이어 돌리기), 그것도 없으면 내일부터.
+    """
+    from saju_batch import require_pyarrow
+
+    require_pyarrow()  # 워커를 띄우기 전에 빠진 의존성을 알린다
+    start = start or _checkpoint_start(out_dir) or (datetime.now().date() + timedelta(days=1))
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    params = {"start": start.isoformat(), "days": days, "shard_size": shard_size, "id_column": id_column}
+    checkpoint = _load_checkpoint(out_dir, params)
+    done = set(checkpoint["done"])
+    skipped = len(done)
+
+    began = time.perf_counter()
+    members = rows = 0
+    busy = 0.0
+    # 한꺼번에 모든 샤드를 제출하지 않고 워커 수의 2배까지만 띄워 메모리를 묶어 둔다
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        shards = _iter_shards(records, shard_size, done)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                item = next(shards, None)
+                if item is None:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(compute_shard, item[0], item[1], start, days, out_dir,
+                                        id_column, shard_size))
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard, n_members, n_rows, elapsed = future.result()
+                done.add(shard)
+                members += n_members
+                rows += n_rows
+                busy += elapsed
+                checkpoint["done"] = sorted(done)
+                _save_json(os.path.join(out_dir, CHECKPOINT_FILE), checkpoint)
+                if verbose:
+                    wall = time.perf_counter() - began
+                    print(f"[일진 배치] 샤드 {shard:05d} 완료 ({n_members}명, {elapsed:.2f}s) | "
+                          f"누적 {members}명 / {rows}행 | {members / wall:,.0f}명/s")
+
+    checkpoint["completed"] = True
+    _save_json(os.path.join(out_dir, CHECKPOINT_FILE), checkpoint)
+    wall = time.perf_counter() - began
+    report = {
+        "start": params["start"],
+        "days": days,
+        "workers": workers,
+        "shards_done": len(done),
+        "shards_skipped": skipped,
+        "members": members,
+        "rows": rows,
+        "wall_seconds": round(wall, 3),
+        "members_per_second": round(members / wall, 1) if wall else 0.0,
+        # 워커 합산 계산 시간 / (벽시계 × 워커 수): 1 에 가까울수록 코어를 고르게 쓴 것
+        "parallel_efficiency": round(busy / (wall * workers), 3) if wall else 0.0,
+    }
+    _save_json(os.path.join(out_dir, REPORT_FILE), report)
+    if verbose:
+        print(f"[일진 배치] 완료: {json.dumps(report, ensure_ascii=False)}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="회원별 일진 풀이 야간 배치")
+    parser.add_argument("records", help="회원 기록 JSONL (user_id, birth_dt, city, gender …)")
+    parser.add_argument("out_dir", help="Parquet 조각과 체크포인트를 쓸 폴더")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="시작일 (기본: 이어 돌리기면 체크포인트의 시작일, 아니면 내일)")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--id-column", default="user_id")
+    args = parser.parse_args()
+    run_daily_fortune_job(args.records, args.out_dir, args.start, args.days, args.workers,
+                          args.shard_size, args.id_column)
@@ -0,0 +1,276 @@
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from saju_chart import CHEONGAN, JIJI, OHENG, STEM_ELEMENT, SajuChart
+
+# ==========================================
+# 1. 강약 모델 표 (Strength Tables)
+# ==========================================
+# 일간의 강약(신강/신약)은 '달의 기운(득령) + 지지의 뿌리(득지) + 천간의 도움(득세)'으로 본다.
+# 모든 계산은 아래 작은 표들을 (지지, 사령 단계) 로 조회해 더하는 것이므로, 단건은 순수 파이썬으로,
+# 대량은 같은 표를 NumPy 배열로 바꿔 한꺼번에 계산한다 (strength_bulk).
+
+# 지장간 사령(司令) 일수: 절입 후 여기 → 중기 → 정기 순으로 며칠씩 달을 맡는지. (각 지지 합계 30일)
+HIDDEN_STEM_DAYS = {
+    '자': [('임', 10), ('계', 20)],
+    '축': [('계', 9), ('신', 3), ('기', 18)],
+    '인': [('무', 7), ('병', 7), ('갑', 16)],
+    '묘': [('갑', 10), ('을', 20)],
+    '진': [('을', 9), ('계', 3), ('무', 18)],
+    '사': [('무', 7), ('경', 7), ('병', 16)],
+    '오': [('병', 10), ('기', 9), ('정', 11)],
+    '미': [('정', 9), ('을', 3), ('기', 18)],
+    '신': [('무', 7), ('임', 7), ('경', 16)],
+    '유': [('경', 10), ('신', 20)],
+    '술': [('신', 9), ('정', 3), ('무', 18)],
+    '해': [('무', 7), ('갑', 7), ('임', 16)],
+}
+MAX_PHASES = 3
+
+# 자리별 가중치 (년간, 년지, 월간, 월지, 일간, 일지, 시간, 시지). 일간은 평가 대상이므로 0.
+POSITION_WEIGHTS = (0.7, 0.7, 1.0, 2.0, 0.0, 1.3, 0.9, 0.9)
+# 월지에서 지금 달을 맡은(사령) 천간이 차지하는 몫. 나머지는 다른 지장간이 일수 비율로 나눈다.
+COMMAND_SHARE = 0.6
+
+# 왕상휴수사(旺相休囚死): 사령 천간의 오행 기준으로 각 오행이 계절에서 얻는 배율.
+SEASON_FACTORS = {'왕': 1.5, '상': 1.25, '휴': 1.0, '수': 0.85, '사': 0.75}
+# (오행 - 사령 오행) % 5 → 상태: 같음=왕, 사령이 생함=상, 사령이 극함=사, 사령을 극함=수, 사령을 생함=휴
+_SEASON_BY_OFFSET = ('왕', '상', '사', '수', '휴')
+
+# 일간 기준 오행 묶음: (일간 오행 + k) % 5
+GROUPS = ['비겁', '식상', '재성', '관성', '인성']
+
+# 점수(도움 비율) → 강약 등급. 경계는 1905~2095 년 출생 분포의 대략 10/35/65/90 분위.
+STRENGTH_LABELS = ['극신약', '신약', '중화', '신강', '극신강']
+STRENGTH_BOUNDS = (0.14, 0.28, 0.49, 0.70)
+
+# 억부용신(抑扶用神): (강약 쪽, 가장 무거운 묶음) → 용신 묶음
+YONGSIN_RULES = {
+    ('강', '비겁'): '관성',   # 비겁이 넘치면 관으로 누른다
+    ('강', '인성'): '재성',   # 인성이 넘치면 재로 인성을 친다
+    ('약', '식상'): '인성',   # 설기가 심하면 인성으로 식상을 누르고 일간을 돕는다
+    ('약', '재성'): '비겁',   # 재다신약은 비겁으로 버틴다
+    ('약', '관성'): '인성',   # 관살이 무거우면 인성으로 살인상생
+}
+
+
+def _element_vector(stem: int, share: float = 1.0) -> List[float]:
+    row = [0.0] * 5
+    row[STEM_ELEMENT[stem]] += share
+    return row
+
+
+def _build_tables():
+    """천간/지지/월지(사령 단계별) 오행 벡터와 계절 배율 표를 만듭니다."""
+    stem_vec = tuple(tuple(_element_vector(s)) for s in range(10))
+    branch_vec, month_vec, season, phase_ends = [], [], [], []
+    for branch in JIJI:
+        hidden = [(CHEONGAN.index(stem), days) for stem, days in HIDDEN_STEM_DAYS[branch]]
+        total = float(sum(days for _, days in hidden))
+        row = [0.0] * 5
+        for stem, days in hidden:
+            row[STEM_ELEMENT[stem]] += days / total
+        branch_vec.append(tuple(row))
+
+        month_rows, season_rows, ends, elapsed = [], [], [], 0
+        for phase in range(MAX_PHASES):
+            # 지장간이 두 개뿐인 지지는 마지막 단계를 한 번 더 써서 표 모양을 맞춘다
+            command, _ = hidden[min(phase, len(hidden) - 1)]
+            rest = total - dict(hidden)[command]
+            row = [0.0] * 5
+            for stem, days in hidden:
+                share = COMMAND_SHARE if stem == command else (1.0 - COMMAND_SHARE) * days / rest
+                row[STEM_ELEMENT[stem]] += share
+            month_rows.append(tuple(row))
+            season_rows.append(tuple(SEASON_FACTORS[_SEASON_BY_OFFSET[(e - STEM_ELEMENT[command]) % 5]]
+                                     for e in range(5)))
+            if phase < len(hidden):
+                elapsed += hidden[phase][1]
+            ends.append(elapsed)
+        month_vec.append(tuple(month_rows))
+        season.append(tuple(season_rows))
+        phase_ends.append(tuple(ends))
+    return stem_vec, tuple(branch_vec), tuple(month_vec), tuple(season), tuple(phase_ends)
+
+
+# STEM_VECTORS[천간], BRANCH_VECTORS[지지], MONTH_VECTORS[월지][단계], SEASON_TABLE[월지][단계] → 오행 5칸
+# PHASE_ENDS[월지] → 단계별 누적 일수 (경과 일수가 이 값보다 작으면 그 단계)
+STEM_VECTORS, BRANCH_VECTORS, MONTH_VECTORS, SEASON_TABLE, PHASE_ENDS = _build_tables()
+
+
+# ==========================================
+# 2. 단건 계산 (Single Chart)
+# ==========================================
+
+class StrengthProfile(NamedTuple):
+    """일간 강약과 용신. 오행 값은 모두 계절 배율을 곱한 가중치(목화토금수 순)."""
+    day_element: str             # 일간 오행
+    score: float                 # 도움(비겁+인성) / 전체, 0~1
+    label: str                   # STRENGTH_LABELS 중 하나
+    season: str                  # 일간 오행의 왕상휴수사
+    root: float                  # 득지: 지지 속 같은 오행 가중치
+    support: float               # 득세: 다른 천간의 비겁+인성 가중치
+    elements: Tuple[float, ...]  # 오행별 가중치
+    yongsin: str                 # 용신 오행
+    huisin: str                  # 희신 오행 (용신을 생함)
+    gisin: str                   # 기신 오행 (용신을 극함)
+
+    @property
+    def strong(self) -> bool:
+        return self.label in ('신강', '극신강')
+
+    @property
+    def weak(self) -> bool:
+        return self.label in ('신약', '극신약')
+
+    @property
+    def side(self) -> str:
+        """'신강' 또는 '신약'. 중화는 점수가 중화 구간의 어느 쪽에 있는지로 기운다."""
+        if self.label == '중화':
+            return '신강' if self.score >= sum(STRENGTH_BOUNDS[1:3]) / 2 else '신약'
+        return '신강' if self.strong else '신약'
+
+    @property
+    def yongsin_group(self) -> str:
+        return self.group_of(self.yongsin)
+
+    @property
+    def groups(self) -> Dict[str, float]:
+        """비겁/식상/재성/관성/인성 가중치."""
+        day = OHENG.index(self.day_element)
+        return {group: self.elements[(day + k) % 5] for k, group in enumerate(GROUPS)}
+
+    def group_of(self, element: str) -> str:
+        """오행이 이 일간에게 어떤 묶음(비겁/식상/…)인지."""
+        return GROUPS[(OHENG.index(element) - OHENG.index(self.day_element)) % 5]
+
+    def group_share(self, group: str) -> float:
+        return self.groups[group] / (sum(self.elements) or 1.0)
+
+    def weighted_counts(self, total: float) -> Dict[str, float]:
+        """오행 가중치를 원래 오행 카운트 합(total)에 맞춰 늘이거나 줄인 dict. (오행 과다/고립 판정용)"""
+        scale = total / (sum(self.elements) or 1.0)
+        return {elem: value * scale for elem, value in zip(OHENG, self.elements)}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"score": round(self.score, 3), "label": self.label, "season": self.season,
+                "root": round(self.root, 3), "support": round(self.support, 3),
+                "groups": {g: round(v, 3) for g, v in self.groups.items()},
+                "yongsin": self.yongsin, "huisin": self.huisin, "gisin": self.gisin}
+
+
+def month_phase(month_branch: int, elapsed_days: Optional[float]) -> int:
+    """월지와 절입 후 경과 일수로 사령 단계(0=여기, 1=중기, 2=정기)를 고릅니다. (모르면 정기)"""
+    ends = PHASE_ENDS[month_branch]
+    if elapsed_days is None:
+        return MAX_PHASES - 1
+    for phase, end in enumerate(ends):
+        if elapsed_days < end:
+            return phase
+    return MAX_PHASES - 1
+
+
+def strength_label(score: float) -> int:
+    """점수 → STRENGTH_LABELS 인덱스."""
+    return sum(score >= bound for bound in STRENGTH_BOUNDS)
+
+
+def yongsin_group(label: int, groups: List[float]) -> int:
+    """강약 등급과 묶음 가중치(GROUPS 순)로 용신 묶음 인덱스를 고릅니다."""
+    if label == 2:
+        # 중화는 가장 모자란 묶음을 채운다
+        return min(range(5), key=lambda k: groups[k])
+    if label > 2:
+        heavy = max((0, 4), key=lambda k: groups[k])
+    else:
+        heavy = max((1, 2, 3), key=lambda k: groups[k])
+    return GROUPS.index(YONGSIN_RULES[('강' if label > 2 else '약', GROUPS[heavy])])
+
+
+@lru_cache(maxsize=65536)
+def _strength(codes: bytes, phase: int) -> StrengthProfile:
+    month_branch = codes[3]
+    vectors = (STEM_VECTORS[codes[0]], BRANCH_VECTORS[codes[1]], STEM_VECTORS[codes[2]],
+               MONTH_VECTORS[month_branch][phase], None, BRANCH_VECTORS[codes[5]],
+               STEM_VECTORS[codes[6]], BRANCH_VECTORS[codes[7]])
+    season = SEASON_TABLE[month_branch][phase]
+    day = STEM_ELEMENT[codes[4]]
+    resource = (day + 4) % 5
+    elements = [0.0] * 5
+    root = support = 0.0
+    for position, (weight, vector) in enumerate(zip(POSITION_WEIGHTS, vectors)):
+        if vector is None:
+            continue
+        for e in range(5):
+            elements[e] += weight * vector[e] * season[e]
+        if position % 2:
+            root += weight * vector[day] * season[day]
+        else:
+            support += weight * (vector[day] * season[day] + vector[resource] * season[resource])
+    total = sum(elements) or 1.0
+    score = (elements[day] + elements[resource]) / total
+    label = strength_label(score)
+    groups = [elements[(day + k) % 5] for k in range(5)]
+    yong = (day + yongsin_group(label, groups)) % 5
+    return StrengthProfile(
+        day_element=OHENG[day], score=score, label=STRENGTH_LABELS[label],
+        season=_SEASON_BY_OFFSET[(day - OHENG.index(_command_element(month_branch, phase))) % 5],
+        root=root, support=support, elements=tuple(elements),
+        yongsin=OHENG[yong], huisin=OHENG[(yong + 4) % 5], gisin=OHENG[(yong + 3) % 5])
+
+
+def _command_element(month_branch: int, phase: int) -> str:
+    hidden = HIDDEN_STEM_DAYS[JIJI[month_branch]]
+    return OHENG[STEM_ELEMENT[CHEONGAN.index(hidden[min(phase, len(hidden) - 1)][0])]]
+
+
+def chart_strength(chart: Any, elapsed_days: Optional[float] = None) -> StrengthProfile:
+    """사주(간지 dict 또는 SajuChart)와 절입 후 경과 일수로 일간 강약·용신을 계산합니다."""
+    chart = SajuChart.from_ganji(chart)
+    return _strength(chart.codes, month_phase(chart.branch(1), elapsed_days))
+
+
+# ==========================================
+# 3. 대량 계산 (Bulk)
+# ==========================================
+
+def month_phase_bulk(month_branches: Any, elapsed_days: Any):
+    """month_phase 의 벡터 버전."""
+    import numpy as np
+
+    ends = np.array(PHASE_ENDS, dtype=np.float64)[np.asarray(month_branches, dtype=np.int64)]
+    phase = (np.asarray(elapsed_days, dtype=np.float64)[:, None] >= ends).sum(axis=1)
+    return np.minimum(phase, MAX_PHASES - 1)
+
+
+def strength_bulk(stems: Any, branches: Any, phases: Any) -> Dict[str, Any]:
+    """
+    chart_strength 의 벡터 버전. stems/branches 는 (n, 4) 코드 배열, phases 는 (n,) 사령 단계.
+    {"score", "label", "yongsin", "elements"} 를 돌려준다 (label 은 STRENGTH_LABELS, yongsin 은 OHENG 인덱스).
+    """
+    import numpy as np
+
+    stems = np.asarray(stems, dtype=np.int64)
+    branches = np.asarray(branches, dtype=np.int64)
+    phases = np.asarray(phases, dtype=np.int64)
+    stem_vec, branch_vec = np.array(STEM_VECTORS), np.array(BRANCH_VECTORS)
+    month_vec, season_table = np.array(MONTH_VECTORS), np.array(SEASON_TABLE)
+    w = POSITION_WEIGHTS
+
+    elements = (w[0] * stem_vec[stems[:, 0]] + w[1] * branch_vec[branches[:, 0]]
+                + w[2] * stem_vec[stems[:, 1]] + w[3] * month_vec[branches[:, 1], phases]
+                + w[5] * branch_vec[branches[:, 2]] + w[6] * stem_vec[stems[:, 3]]
+                + w[7] * branch_vec[branches[:, 3]]) * season_table[branches[:, 1], phases]
+    day = np.frombuffer(STEM_ELEMENT, dtype=np.uint8)[stems[:, 2]].astype(np.int64)
+    groups = np.take_along_axis(elements, (day[:, None] + np.arange(5)) % 5, axis=1)
+    score = (groups[:, 0] + groups[:, 4]) / np.maximum(elements.sum(axis=1), 1e-9)
+    label = np.searchsorted(np.array(STRENGTH_BOUNDS), score, side="right")
+
+    # 용신 묶음: 표 규칙을 등급별 마스크로 펼친다
+    rule = {k: GROUPS.index(YONGSIN_RULES[key]) for k, key in
+            ((0, ('강', '비겁')), (4, ('강', '인성')), (1, ('약', '식상')), (2, ('약', '재성')), (3, ('약', '관성')))}
+    rule_table = np.array([rule[k] for k in range(5)])
+    strong_heavy = np.where(groups[:, 4] > groups[:, 0], 4, 0)
+    weak_heavy = 1 + np.argmax(groups[:, 1:4], axis=1)
+    yong_group = np.where(label > 2, rule_table[strong_heavy],
+                          np.where(label < 2, rule_table[weak_heavy], np.argmin(groups, axis=1)))
+    return {"score": score, "label": label, "yongsin": (day + yong_group) % 5, "elements": elements}
@@ -0,0 +1,378 @@
+import os
+import csv
+import json
+import mmap
+import struct
+import hashlib
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# ==========================================
+# 1. 설정 및 파일 포맷 (Settings & File Format)
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_DIR = os.path.join(BASE_DIR, "saju_db")
+BUNDLE_PATH = os.path.join(DB_DIR, "saju_db.bundle")
+
+# 섹션 이름 → 원본 파일 (app.load_db 가 쓰던 키와 동일)
+SECTION_FILES = {
+    "career": "career_db.json",
+    "health": "health_db.json",
+    "shinsal": "shinsal_db.json",
+    "timeline": "timeline_db.json",
+    "love": "love_db.json",
+    "five_elements": "five_elements_matrix.json",
+    "symptom": "symptom_mapping.json",
+    "lifecycle": "lifecycle_pillar_db.json",
+    "identity": "identity_db.json",
+    "compatibility": "compatibility_db.json",
+    "glossary": "saju_glossary_v2.csv",
+}
+
+# 헤더: magic, version, 인덱스(JSON) 길이. 인덱스 뒤로 섹션 본문(UTF-8 JSON)이 이어진다.
+_HEADER = struct.Struct("<4sHI")
+_MAGIC = b"SJDB"
+_VERSION = 1
+
+
+def _read_section(path: str) -> Any:
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return list(csv.DictReader(f))
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def section_hash(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _encode_section(data: Any) -> bytes:
+    """번들에 넣는 정규화된 섹션 본문. 핫 리로드도 같은 방식으로 해시해야 디스크 캐시가 재시작 뒤에도 맞는다."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _content_hash(hashes: Dict[str, str]) -> str:
+    content = hashlib.sha256()
+    for name, digest in hashes.items():
+        content.update(name.encode("utf-8") + b"\0" + digest.encode("ascii"))
+    return content.hexdigest()
+
+
+# ==========================================
+# 2. 번들 빌드 (Build Step)
+# ==========================================
+
+def write_atomic(out_path: str, chunks: Iterable[bytes]) -> None:
+    """같은 폴더의 고유한 임시 파일에 쓴 뒤 rename 합니다.
+    서비스 워커들이 동시에 빌드해도 서로의 임시 파일을 건드리지 않고, 결과는 같은 내용이라 마지막 rename 이 남는다."""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(out_path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp_path, 0o644)  # mkstemp 는 0600 으로 만든다
+        try:
+            os.replace(tmp_path, out_path)
+        except OSError:
+            # rename 경쟁에서 졌어도 (Windows 에서 열린 파일 등) 다른 워커가 같은 내용을 써 두었으면 성공으로 본다
+            if not os.path.exists(out_path):
+                raise
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_bundle(src_dir: str = DB_DIR, out_path: str = BUNDLE_PATH) -> Dict[str, Any]:
+    """saju_db 의 JSON/CSV 를 오프셋 표가 달린 단일 번들 파일로 컴파일하고 인덱스를 돌려줍니다."""
+    payloads: Dict[str, bytes] = {}
+    missing: List[str] = []
+    invalid: List[str] = []
+    for name, filename in SECTION_FILES.items():
+        try:
+            data = _read_section(os.path.join(src_dir, filename))
+        except FileNotFoundError:
+            missing.append(filename)
+            data = {}
+        except (json.JSONDecodeError, csv.Error):
+            invalid.append(filename)
+            data = {}
+        payloads[name] = _encode_section(data)
+
+    sections: Dict[str, List[Any]] = {}
+    offset = 0
+    for name, payload in payloads.items():
+        sections[name] = [offset, len(payload), section_hash(payload)]
+        offset += len(payload)
+
+    content_hash = _content_hash({name: entry[2] for name, entry in sections.items()})
+    index = {"content_hash": content_hash, "sections": sections, "missing": missing, "invalid": invalid}
+    index_bytes = json.dumps(index, ensure_ascii=False).encode("utf-8")
+    write_atomic(out_path, [_HEADER.pack(_MAGIC, _VERSION, len(index_bytes)), index_bytes, *payloads.values()])
+    return index
+
+
+def is_stale(src_dir: str = DB_DIR, bundle_path: str = BUNDLE_PATH) -> bool:
+    """원본 파일 중 하나라도 번들보다 새로우면 True."""
+    if not os.path.exists(bundle_path):
+        return True
+    built_at = os.path.getmtime(bundle_path)
+    for filename in SECTION_FILES.values():
+        path = os.path.join(src_dir, filename)
+        if os.path.exists(path) and os.path.getmtime(path) > built_at:
+            return True
+    return False
+
+
+# ==========================================
+# 3. 지연 로더 (Lazy Loader)
+# ==========================================
+
+class SajuDB(Mapping):
+    """mmap 한 번들 위의 읽기 전용 DB. 각 섹션은 처음 접근할 때 한 번만 파싱됩니다.
+
+    dict 와 같은 인터페이스(db.get('identity', {}) 등)를 그대로 제공하므로 엔진 코드는 바뀌지 않습니다.
+    """
+
+    def __init__(self, path: str = BUNDLE_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"DB 번들 형식이 올바르지 않네: {path}")
+        index = json.loads(self._mm[_HEADER.size:_HEADER.size + index_len].decode("utf-8"))
+        self._base = _HEADER.size + index_len
+        self._sections: Dict[str, List[Any]] = index["sections"]
+        self.content_hash: str = index["content_hash"]
+        self.missing: List[str] = index.get("missing", [])
+        self.invalid: List[str] = index.get("invalid", [])
+        self._loaded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # 핫 리로드 상태: 섹션별 현재 해시, 의존 해시 메모, 원본 파일 상태, 마지막 검증 실패
+        self._hashes: Dict[str, str] = {name: entry[2] for name, entry in self._sections.items()}
+        self._dependency_hashes: Dict[Tuple[str, ...], str] = {}
+        self.src_dir: Optional[str] = None
+        self._source_stats: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.reload_errors: Dict[str, str] = {}
+
+    def section_hash(self, name: str) -> str:
+        return self._hashes[name]
+
+    def section_hashes(self) -> Dict[str, str]:
+        return dict(self._hashes)
+
+    def dependency_hash(self, names: Iterable[str], overrides: Optional[Dict[str, str]] = None) -> str:
+        """여러 섹션 해시를 묶은 버전. 이 섹션들만 읽는 캐시 항목의 키로 쓴다. (overrides 로 예전 해시를 대입해 볼 수 있다)"""
+        names = tuple(names)
+        if overrides:
+            hashes = {**self._hashes, **overrides}
+            return _content_hash({name: hashes[name] for name in names})
+        digest = self._dependency_hashes.get(names)
+        if digest is None:
+            digest = self._dependency_hashes[names] = _content_hash({name: self._hashes[name] for name in names})
+        return digest
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+        if name not in self._sections:
+            raise KeyError(name)
+        with self._lock:
+            if name not in self._loaded:
+                offset, length, _ = self._sections[name]
+                start = self._base + offset
+                self._loaded[name] = json.loads(self._mm[start:start + length].decode("utf-8"))
+        return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    @property
+    def loaded_sections(self) -> List[str]:
+        return list(self._loaded)
+
+    # --- 핫 리로드 ---
+    def watch_sources(self, src_dir: str) -> None:
+        """원본 폴더의 현재 파일 상태를 기준점으로 기억합니다. 이후 reload_changed() 가 바뀐 파일만 다시 읽는다."""
+        self.src_dir = src_dir
+        self._source_stats = {name: _stat(os.path.join(src_dir, filename)) for name, filename in SECTION_FILES.items()}
+
+    def replace_section(self, name: str, data: Any) -> "SectionChange":
+        """검증을 마친 섹션을 통째로 바꿔 끼웁니다. 읽는 쪽은 바꾸기 전이나 후의 객체 하나만 본다."""
+        new_hash = section_hash(_encode_section(data))
+        with self._lock:
+            old_hash = self._hashes[name]
+            self._loaded[name] = data
+            hashes = dict(self._hashes)
+            hashes[name] = new_hash
+            self._hashes = hashes
+            self._dependency_hashes = {}
+            self.content_hash = _content_hash(hashes)
+        return SectionChange(name, old_hash, new_hash)
+
+    def reload_changed(self) -> List["SectionChange"]:
+        """
+        원본 파일이 바뀐 섹션만 다시 파싱·검증해 바꿔 끼우고, 실제로 내용이 바뀐 섹션 목록을 돌려줍니다.
+        파싱이나 검증에 실패하면 예전 내용을 그대로 두고 reload_errors 에 이유를 남긴다.
+        """
+        if self.src_dir is None:
+            return []
+        changes = []
+        for name, filename in SECTION_FILES.items():
+            path = os.path.join(self.src_dir, filename)
+            stat = _stat(path)
+            if stat == self._source_stats.get(name):
+                continue
+            self._source_stats[name] = stat
+            try:
+                data = _read_section(path)
+            except (OSError, json.JSONDecodeError, csv.Error, UnicodeDecodeError) as exc:
+                self.reload_errors[name] = f"{filename} 를 읽지 못했네: {exc}"
+                continue
+            problems = validate_section(name, data, self[name])
+            if problems:
+                self.reload_errors[name] = f"{filename} 검증 실패: " + "; ".join(problems)
+                continue
+            self.reload_errors.pop(name, None)
+            change = self.replace_section(name, data)
+            if change.old_hash != change.new_hash:
+                changes.append(change)
+        return changes
+
+
+def load_bundle(path: str = BUNDLE_PATH, src_dir: Optional[str] = DB_DIR) -> SajuDB:
+    """번들을 연다. src_dir 이 주어지고 원본이 더 새로우면 먼저 다시 빌드하고, 핫 리로드 기준점도 잡습니다."""
+    if src_dir is not None and is_stale(src_dir, path):
+        build_bundle(src_dir, path)
+    db = SajuDB(path)
+    if src_dir is not None:
+        db.watch_sources(src_dir)
+    return db
+
+
+# ==========================================
+# 4. 핫 리로드 (Validation & Watcher)
+# ==========================================
+# 콘텐츠 팀이 saju_db/*.json 을 고치면 재시작 없이 그 섹션만 다시 읽는다.
+# 새 내용은 섹션별 검증을 통과해야만 들어가고, 바뀐 섹션 해시는 그 섹션을 읽는 분석 단계의 캐시만 무효화한다
+# (saju_engine.invalidate_stages).
+
+class SectionChange(NamedTuple):
+    name: str
+    old_hash: str
+    new_hash: str
+
+
+# 엔진이 최상위에서 꼭 찾는 키
+REQUIRED_KEYS = {
+    "shinsal": ["basic_shinsal", "rules"],
+    "symptom": ["rules"],
+    "timeline": ["life_stages_detailed", "ten_gods_impact"],
+    "lifecycle": ["year_pillar", "month_pillar", "day_pillar", "time_pillar"],
+    "love": ["conflict_triggers"],
+}
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def validate_section(name: str, data: Any, current: Any) -> List[str]:
+    """새 섹션 내용의 문제 목록 (비어 있으면 통과). 지금 쓰는 내용과 모양이 같아야 하고, 엔진이 읽는 구조를 갖춰야 한다."""
+    problems = []
+    if type(data) is not type(current):
+        return [f"최상위 형식이 {type(current).__name__} 에서 {type(data).__name__} 로 바뀜"]
+    if current and not data:
+        return ["내용이 비었음"]
+    if isinstance(data, dict):
+        problems += [f"'{key}' 키가 없음" for key in REQUIRED_KEYS.get(name, []) if key in current and key not in data]
+        if name in ("identity", "compatibility", "five_elements"):
+            problems += [f"'{key}' 항목이 객체가 아님" for key, value in data.items() if not isinstance(value, dict)]
+        if name == "compatibility":
+            problems += [f"'{key}' 점수가 숫자가 아님" for key, value in data.items()
+                         if isinstance(value, dict) and "score" in value and not isinstance(value["score"], (int, float))]
+        if "rules" in data:
+            problems += _validate_rules(data["rules"])
+    elif name == "glossary":
+        problems += [f"{i}번째 줄에 Term 이 없음" for i, row in enumerate(data) if not row.get("Term")]
+    return problems
+
+
+def _validate_rules(rules: Any) -> List[str]:
+    """신살/증상 규칙을 실제로 컴파일하고 예시 차트 하나에 평가해 본다."""
+    if not isinstance(rules, list):
+        return ["rules 가 목록이 아님"]
+    problems = [f"{i}번째 규칙에 {key} 가 없음" for i, rule in enumerate(rules)
+                for key in ("id", "type", "title") if not isinstance(rule, dict) or key not in rule]
+    if problems:
+        return problems
+    try:
+        from shinsal_rules import RuleSet
+        from saju_chart import SajuChart
+
+        RuleSet(rules).evaluate(SajuChart.from_pillars([6, 14, 16, 45]))
+    except Exception as exc:  # 규칙 모양이 어떻게 틀렸든 들이지 않는다
+        problems.append(f"규칙을 컴파일할 수 없음: {exc!r}")
+    return problems
+
+
+class DBWatcher:
+    """interval 초마다 원본 파일 상태를 보고, 바뀐 섹션이 있으면 on_change(변경 목록)를 부르는 백그라운드 스레드.
+    한 번의 확인이 예외로 끝나도 스레드는 살아 있고, 이유는 db.reload_errors["watcher"] 에 남는다."""
+
+    def __init__(self, db: SajuDB, on_change: Optional[Callable[[List[SectionChange]], None]] = None,
+                 interval: float = 2.0):
+        self.db = db
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        # on_change 가 실패한 변경은 다음 확인 때 다시 넘긴다 (섹션은 이미 바뀌었으니 캐시 무효화를 놓치면 안 된다)
+        self._pending: List[SectionChange] = []
+        self._thread = threading.Thread(target=self._run, name="shinryeong-db-watcher", daemon=True)
+
+    def start(self) -> "DBWatcher":
+        self._thread.start()
+        return self
+
+    def poll(self) -> List[SectionChange]:
+        changes, self._pending = self._pending + self.db.reload_changed(), []
+        if changes and self.on_change is not None:
+            try:
+                self.on_change(changes)
+            except Exception:
+                self._pending = changes
+                raise
+        return changes
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as exc:
+                self.db.reload_errors["watcher"] = f"핫 리로드 확인 실패 (계속 감시함): {exc!r}"
+            else:
+                self.db.reload_errors.pop("watcher", None)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    built = build_bundle()
+    print(f"DB 번들 생성 완료: {BUNDLE_PATH} ({os.path.getsize(BUNDLE_PATH)} bytes)")
+    print(f"content_hash = {built['content_hash']}")
+    for filename in built["missing"] + built["invalid"]:
+        print(f"경고: {filename} 를 읽지 못했네.")
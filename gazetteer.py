@@ -0,0 +1,334 @@
+import os
+import re
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import metrics
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_PATH = os.path.join(BASE_DIR, "saju_db", "gazetteer.json")
+# Nominatim 폴백으로 알아낸 도시를 쌓아두는 파일 (배포본 사전과 분리)
+USER_GAZETTEER_PATH = os.path.join(BASE_DIR, "saju_db", "gazetteer_user.json")
+
+#   python gazetteer.py --selftest   한글/로마자 표기, 행정구역 접미사, 오타, 없는 도시를 오프라인으로 확인
+# 환경변수 SHINRYEONG_GEOCODER_FALLBACK=0 이면 네트워크 폴백을 끈다
+ENABLE_NOMINATIM_FALLBACK = os.environ.get("SHINRYEONG_GEOCODER_FALLBACK", "1") != "0"
+NOMINATIM_USER_AGENT = "shinryeong_app_v4"
+NOMINATIM_MIN_INTERVAL = 1.0  # Nominatim 이용 정책: 초당 1회
+# Nominatim 도 못 찾은 이름은 TTL 동안 다시 묻지 않는다 (없는 도시 입력이 반복될 때 1초씩 막히지 않게)
+NEGATIVE_CACHE_SIZE = 1024
+NEGATIVE_CACHE_TTL = 3600.0
+
+_KO_SUFFIXES = ("특별자치시", "특별자치도", "특별시", "광역시", "시", "군")
+# 로마자 행정구역 접미사는 붙임표/공백으로 떨어져 있을 때만 뗀다 (Daegu, Orlando 의 끝 글자는 이름의 일부)
+_ROMAN_SUFFIX_RE = re.compile(r"(?<=\w)[\s\-]+(?:si|gun|gu|do)$")
+_STRIP_RE = re.compile(r"[\s\-_'’.,·]")
+
+
+def normalize_name(name: str) -> str:
+    """대소문자, 공백, 구두점, 한국 행정구역 접미사(시/군, -si/-gun/-gu/-do)를 정리한 검색 키를 만듭니다."""
+    key = _STRIP_RE.sub("", _ROMAN_SUFFIX_RE.sub("", name.strip().lower()))
+    for suffix in _KO_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix) + 1:
+            return key[:-len(suffix)]
+    return key
+
+
+# ==========================================
+# 2. 트라이 인덱스 (Prefix Trie Index)
+# ==========================================
+
+class _TrieNode:
+    __slots__ = ("children", "city_id")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.city_id: Optional[int] = None
+
+
+class Gazetteer:
+    """도시 이름(한글/영문/로마자 별칭)을 트라이로 색인하여 정확/접두어/유사 검색을 제공합니다."""
+
+    def __init__(self, cities: Optional[List[Dict[str, Any]]] = None):
+        self.cities: List[Dict[str, Any]] = []
+        self._root = _TrieNode()
+        self._lock = threading.Lock()
+        for city in cities or []:
+            self.add(city)
+
+    def add(self, city: Dict[str, Any]) -> int:
+        """도시 하나를 색인에 추가하고 그 id 를 돌려줍니다. (이미 있는 키는 덮어쓰지 않음)"""
+        with self._lock:
+            city_id = len(self.cities)
+            self.cities.append(city)
+            for alias in [city["name"]] + list(city.get("aliases", [])):
+                node = self._root
+                for ch in normalize_name(alias):
+                    node = node.children.setdefault(ch, _TrieNode())
+                if node.city_id is None:
+                    node.city_id = city_id
+            return city_id
+
+    def _node(self, key: str) -> Optional[_TrieNode]:
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, name: str) -> Optional[Dict[str, Any]]:
+        node = self._node(normalize_name(name))
+        if node is None or node.city_id is None:
+            return None
+        return self.cities[node.city_id]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """접두어로 시작하는 도시를 짧은 이름 순으로 돌려줍니다. (자동완성용)"""
+        start = self._node(normalize_name(prefix))
+        if start is None:
+            return []
+        found: List[int] = []
+        level = [start]
+        while level and len(found) < limit:
+            next_level = []
+            for node in level:
+                if node.city_id is not None and node.city_id not in found:
+                    found.append(node.city_id)
+                next_level.extend(node.children.values())
+            level = next_level
+        return [self.cities[i] for i in found[:limit]]
+
+    def fuzzy(self, name: str, max_distance: int = 1) -> Optional[Dict[str, Any]]:
+        """편집 거리 max_distance 이내에서 가장 가까운 도시를 찾습니다. (트라이 위에서 가지치기)"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        best: Tuple[int, Optional[int]] = (max_distance + 1, None)
+        first_row = list(range(len(key) + 1))
+
+        def walk(node: _TrieNode, ch: str, prev_row: List[int]):
+            nonlocal best
+            row = [prev_row[0] + 1]
+            for col in range(1, len(key) + 1):
+                cost = 0 if key[col - 1] == ch else 1
+                row.append(min(row[col - 1] + 1, prev_row[col] + 1, prev_row[col - 1] + cost))
+            if node.city_id is not None and row[-1] < best[0]:
+                best = (row[-1], node.city_id)
+            if min(row) < best[0]:
+                for next_ch, child in node.children.items():
+                    walk(child, next_ch, row)
+
+        for ch, child in self._root.children.items():
+            walk(child, ch, first_row)
+        return self.cities[best[1]] if best[1] is not None else None
+
+    def match(self, name: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """정확 → 유일한 접두어 → 편집 거리 1 순으로 도시를 찾고, 어느 경로로 찾았는지("exact"/"prefix"/"fuzzy")도 돌려줍니다.
+        거리 2 까지 허용하면 없는 도시가 엉뚱한 곳으로 붙으므로(Milan → 일산, Gimje → 김포) 1 까지만 본다."""
+        city = self.exact(name)
+        if city:
+            return city, "exact"
+        candidates = self.complete(name, limit=2)
+        if len(candidates) == 1:
+            return candidates[0], "prefix"
+        city = self.fuzzy(name, max_distance=1)
+        return (city, "fuzzy") if city else (None, None)
+
+    def search(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.match(name)[0]
+
+
+def _read_cities(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("cities", [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """배포본 사전과 사용자 누적 사전을 합친 공용 인덱스를 한 번만 만듭니다."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(_read_cities(GAZETTEER_PATH) + _read_cities(USER_GAZETTEER_PATH))
+    return _gazetteer
+
+
+# ==========================================
+# 3. 시간대 및 네트워크 폴백 (Timezone & Fallback)
+# ==========================================
+_timezone_finder = None
+
+
+def get_timezone_finder():
+    """TimezoneFinder 는 초기화 비용이 커서 프로세스당 하나만 만듭니다."""
+    global _timezone_finder
+    if _timezone_finder is None:
+        from timezonefinder import TimezoneFinder
+        _timezone_finder = TimezoneFinder()
+    return _timezone_finder
+
+
+_geocoder = None
+_geocode_lock = threading.Lock()
+_last_geocode_at = 0.0
+
+
+def _geocode_remote(city_name: str) -> Optional[Dict[str, Any]]:
+    """Nominatim 으로 조회하되 호출 간격을 NOMINATIM_MIN_INTERVAL 이상으로 제한합니다."""
+    global _geocoder, _last_geocode_at
+    from geopy.exc import GeopyError
+
+    with _geocode_lock:
+        if _geocoder is None:
+            from geopy.geocoders import Nominatim
+            _geocoder = Nominatim(user_agent=NOMINATIM_USER_AGENT)
+        # 잠금 안에서는 호출 시각만 예약하고, 기다림은 잠금 밖에서 한다 (다른 스레드의 사전 조회를 막지 않게)
+        slot = max(time.monotonic(), _last_geocode_at + NOMINATIM_MIN_INTERVAL)
+        _last_geocode_at = slot
+    wait = slot - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+    try:
+        location = _geocoder.geocode(city_name)
+    except GeopyError:
+        metrics.incr("geocoder_error")
+        return None
+    if not location:
+        return None
+    timezone_str = get_timezone_finder().timezone_at(lng=location.longitude, lat=location.latitude)
+    return {
+        "name": city_name,
+        "aliases": [],
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "timezone_str": timezone_str,
+    }
+
+
+def _write_back(city: Dict[str, Any]) -> None:
+    """폴백 결과를 로컬 인덱스와 사용자 사전 파일에 기록합니다."""
+    get_gazetteer().add(city)
+    with _gazetteer_lock:
+        cities = _read_cities(USER_GAZETTEER_PATH)
+        cities.append(city)
+        tmp_path = USER_GAZETTEER_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"cities": cities}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, USER_GAZETTEER_PATH)
+
+
+# ==========================================
+# 4. 공개 API (Public API)
+# ==========================================
+
+@lru_cache(maxsize=4096)
+def _lookup_cached(key: str) -> Optional[Tuple[float, float, str, str]]:
+    city, source = get_gazetteer().match(key)
+    if city is None:
+        return None
+    return (city["latitude"], city["longitude"], city["timezone_str"], source)
+
+
+_misses: "OrderedDict[str, float]" = OrderedDict()
+_misses_lock = threading.Lock()
+
+
+def _recent_miss(key: str) -> bool:
+    with _misses_lock:
+        expires = _misses.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _misses[key]
+            return False
+        return True
+
+
+def _remember_miss(key: str) -> None:
+    with _misses_lock:
+        _misses[key] = time.monotonic() + NEGATIVE_CACHE_TTL
+        _misses.move_to_end(key)
+        while len(_misses) > NEGATIVE_CACHE_SIZE:
+            _misses.popitem(last=False)
+
+
+def lookup_city(city_name: str, allow_network: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+    """도시 이름으로 위도, 경도, 시간대를 찾습니다. 로컬 사전에 없으면 (허용 시) Nominatim 으로 보충합니다.
+    결과의 source 는 찾은 경로("exact"/"prefix"/"fuzzy"/"nominatim")입니다."""
+    key = normalize_name(city_name or "")
+    if not key:
+        return None
+    hit = _lookup_cached(key)
+    if hit is None:
+        if allow_network is None:
+            allow_network = ENABLE_NOMINATIM_FALLBACK
+        if not allow_network:
+            metrics.incr("gazetteer_miss")
+            return None
+        if _recent_miss(key):
+            metrics.incr("geocoder_negative_cache_hit")
+            return None
+        metrics.incr("geocoder_fallback")
+        city = _geocode_remote(city_name)
+        if city is None:
+            metrics.incr("geocoder_fallback_failed")
+            _remember_miss(key)
+            return None
+        _write_back(city)
+        _lookup_cached.cache_clear()
+        hit = (city["latitude"], city["longitude"], city["timezone_str"], "nominatim")
+    latitude, longitude, timezone_str, source = hit
+    if source == "fuzzy":
+        metrics.incr("gazetteer_fuzzy")
+    return {"latitude": latitude, "longitude": longitude, "timezone_str": timezone_str, "source": source}
+
+
+# 입력 → (기대하는 도시 이름, 찾은 경로). 도시 이름이 None 이면 로컬 사전에서 못 찾아야 한다.
+SELFTEST_CASES = [
+    ("서울", "서울", "exact"),
+    ("서울특별시", "서울", "exact"),
+    ("Pusan", "부산", "exact"),
+    ("Busan-si", "부산", "exact"),
+    ("Jeju-do", "제주", "exact"),
+    ("jeju do", "제주", "exact"),
+    ("Daegu", "대구", "exact"),
+    ("Seoull", "서울", "fuzzy"),
+    ("Milan", None, None),
+    ("Gimje", None, None),
+]
+
+
+def selftest() -> Dict[str, Any]:
+    """SELFTEST_CASES 를 네트워크 없이 조회해 어긋난 항목을 돌려줍니다."""
+    wrong = []
+    for name, want_city, want_source in SELFTEST_CASES:
+        found = lookup_city(name, allow_network=False)
+        city = get_gazetteer().match(normalize_name(name))[0] if found else None
+        got = (city["name"] if city else None, found["source"] if found else None)
+        if got != (want_city, want_source):
+            wrong.append(f"{name}: {got} (기대 {(want_city, want_source)})")
+    return {"cases": len(SELFTEST_CASES), "wrong": wrong, "ok": not wrong}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--selftest"]:
+        result = selftest()
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result["ok"] else 1)
+    for name in sys.argv[1:]:
+        print(name, "→", lookup_city(name))
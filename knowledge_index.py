@@ -0,0 +1,470 @@
+import os
+import re
+import sys
+import json
+import mmap
+import math
+import struct
+from collections import Counter
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from db_bundle import DB_DIR, SECTION_FILES, load_bundle, write_atomic
+from saju_chart import CHEONGAN, JIJI, SIBSEONG_NAMES
+
+# ==========================================
+# 1. 설정 및 파일 포맷 (Settings & File Format)
+# ==========================================
+# 대화창이 총서(knowledgebase.txt), 시스템 프롬프트, 용어집, saju_db 의 구절을 인용할 수 있도록
+# 미리 만든 BM25 역색인입니다. 한국어는 형태소 분석 없이 글자 2-gram 으로 색인한다.
+#   python knowledge_index.py              색인 빌드
+#   python knowledge_index.py "재물운 언제"   색인 빌드(필요 시) 후 검색
+#   python knowledge_index.py --validate   총서 권 구성(제1권~제6권) + 60 일주마다 다른 일간·일지 전용 항목이 걸러지는지 확인
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(DB_DIR, "knowledge.index")
+TEXT_SOURCES = {
+    "총서": os.path.join(BASE_DIR, "knowledgebase.txt"),
+    "프롬프트": os.path.join(BASE_DIR, "prompt.txt"),
+}
+# 색인에 들어가는 DB 섹션 (핫 리로드로 이 중 하나가 바뀌면 색인도 다시 빌드해야 한다)
+INDEXED_SECTIONS = frozenset(SECTION_FILES)
+# 색인하지 않는 DB 항목 (규칙 정의·메타 설명은 인용할 거리가 아니다)
+SKIP_KEYS = {"rules", "meta", "desc", "en", "en_relation", "usage"}
+# 질문에 흔히 섞이는 한 글자 대명사·부사 (2-gram 이 아니라 한 글자 토큰으로 남는 것만)
+STOPWORDS = {"내", "나", "저", "제", "그", "이", "좀", "더", "잘", "왜", "뭐", "또", "꼭"}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+CHART_BOOST = 0.5          # 사용자 차트(일주·일간·주된 십성)와 엮인 구절 가산
+MAX_DOC_CHARS = 4000       # DB 항목 하나가 너무 길면 자른다
+SNIPPET_CHARS = 160
+
+# 헤더: magic, version, 메타(JSON) 길이, 문서 수, 용어 수, 게시 수, 용어 바이트 길이, 본문 바이트 길이.
+# 메타 뒤에는 (4바이트 경계에서 시작하는) 배열이 이어진다:
+#   term_offsets u32[V+1] · posting_offsets u32[V+1] · posting_docs u32[P] · doc_len u32[N]
+#   text_offsets u32[N+1] · posting_tf u16[P] · 용어 바이트(UTF-8, 바이트 순 정렬) · 본문 바이트(UTF-8)
+_HEADER = struct.Struct("<4sHIIIIII")
+_MAGIC = b"SJKI"
+_VERSION = 3  # 2: 한 글자 천간/지지 키에도 전용(only) 꼬리표, 3: 콜론 없는 본문 줄은 제목으로 보지 않음
+
+# 실제 제목 줄은 모두 '제N권:' 꼴이다. 콜론을 빼면 '제1권(사주)이 …' 같은 본문도 제목이 된다.
+_HEADING_RE = re.compile(r"^(제\d+[권부])\s*[:：]\s*(.*)$")
+_NUMBERED_RE = re.compile(r"^\d+\.\s+\S")
+_WORD_RE = re.compile(r"[0-9a-z]+|[^\W\d_a-z]+")
+_PILLAR_KEY_RE = re.compile(f"^([{''.join(CHEONGAN)}])_?([{''.join(JIJI)}])$")
+_STEM_PAIR_RE = re.compile(f"^([{''.join(CHEONGAN)}])_([{''.join(CHEONGAN)}])$")
+# 한 글자 키: 천간이면 일간 전용, 천간이 아닌 지지면 일지 전용 ('신'은 천간 辛으로 읽는다)
+_SINGLE_STEM = set(CHEONGAN)
+_SINGLE_BRANCH = set(JIJI) - _SINGLE_STEM
+
+
+def _pad(n: int) -> int:
+    return (4 - n % 4) % 4
+
+
+# ==========================================
+# 2. 토큰화 (Character n-gram Tokenizer)
+# ==========================================
+
+def tokenize(text: str) -> List[str]:
+    """영문/숫자는 단어 그대로, 한글·한자 어절은 글자 2-gram(한 글자 어절은 그 글자)으로 자릅니다."""
+    tokens: List[str] = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word.isascii():
+            if len(word) > 1:
+                tokens.append(word)
+        elif len(word) == 1:
+            if word not in STOPWORDS:
+                tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+# ==========================================
+# 3. 문서 수집 (Corpus Sections)
+# ==========================================
+# 문서 = (출처, 제목, 본문, 한정 태그, 가산 태그)
+#   한정 태그(only): 특정 일주/일간 전용 항목. 차트가 주어지면 맞는 사람에게만 보인다.
+#   가산 태그(tags): 본문/경로에 나온 십성·일주. 차트와 겹치면 점수를 올린다.
+
+class _Doc(NamedTuple):
+    source: str
+    title: str
+    text: str
+    only: List[str]
+    tags: List[str]
+
+
+def _mention_tags(text: str) -> List[str]:
+    return [f"sibseong:{name}" for name in SIBSEONG_NAMES if name in text]
+
+
+def split_volumes(text: str, source: str) -> Iterator[_Doc]:
+    """총서를 제N권/제N부 제목 줄로 나눕니다. 부 제목에는 소속 권을 붙인다."""
+    volume, title, lines = "", "머리말", []
+
+    def flush() -> Iterator[_Doc]:
+        body = "\n".join(line for line in lines if line.strip() and not set(line.strip()) <= {"="})
+        if body:
+            yield _Doc(source, title, body, [], _mention_tags(body))
+
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line.strip())
+        if match:
+            yield from flush()
+            label = f"{match.group(1)}: {match.group(2)}".rstrip(": ")
+            if match.group(1).endswith("권"):
+                volume, title = label, label
+            else:
+                title = f"{volume} > {label}" if volume else label
+            lines = []
+        else:
+            lines.append(line)
+    yield from flush()
+
+
+def split_numbered(text: str, source: str) -> Iterator[_Doc]:
+    """제N권 표시가 없는 문서(프롬프트)는 '1. …' 꼴의 번호 제목으로 나눕니다."""
+    title, lines = source, []
+    for line in text.splitlines():
+        if _NUMBERED_RE.match(line):
+            body = "\n".join(l for l in lines if l.strip())
+            if body:
+                yield _Doc(source, title, body, [], _mention_tags(body))
+            title, lines = line.strip(), []
+        else:
+            lines.append(line)
+    body = "\n".join(l for l in lines if l.strip())
+    if body:
+        yield _Doc(source, title, body, [], _mention_tags(body))
+
+
+def _leaf_text(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [text for key, item in value.items() if key not in SKIP_KEYS for text in _leaf_text(item)]
+    if isinstance(value, list):
+        return [text for item in value for text in _leaf_text(item)]
+    return []
+
+
+def _key_tags(path: List[str]) -> Tuple[List[str], List[str]]:
+    only, tags = [], []
+    for key in path:
+        pillar = _PILLAR_KEY_RE.match(key)
+        pair = _STEM_PAIR_RE.match(key)
+        if pillar:
+            only.append(f"pillar:{pillar.group(1)}{pillar.group(2)}")
+        elif pair:
+            only += [f"stem:{pair.group(1)}", f"stem:{pair.group(2)}"]
+        elif key in _SINGLE_STEM:
+            only.append(f"stem:{key}")
+        elif key in _SINGLE_BRANCH:
+            only.append(f"branch:{key}")
+        for name in SIBSEONG_NAMES:
+            if key.startswith(name):
+                tags.append(f"sibseong:{name}")
+    return only, tags
+
+
+def split_db(name: str, value: Any, path: Optional[List[str]] = None) -> Iterator[_Doc]:
+    """DB 섹션을 항목 단위 문서로 나눕니다. 하위에 객체가 있으면 더 내려가고, 아니면 그 항목을 한 문서로."""
+    path = path or []
+    if isinstance(value, dict) and len(path) < 3 and any(isinstance(v, dict) for v in value.values()):
+        for key, item in value.items():
+            if key not in SKIP_KEYS:
+                yield from split_db(name, item, path + [key])
+        return
+    text = "\n".join(_leaf_text(value))[:MAX_DOC_CHARS]
+    if not text.strip():
+        return
+    only, tags = _key_tags(path)
+    yield _Doc(f"DB:{name}", " > ".join(path) or name, text, only, tags + _mention_tags(text))
+
+
+def split_glossary(rows: List[Dict[str, str]]) -> Iterator[_Doc]:
+    for row in rows:
+        term = row.get("Term", "")
+        text = "\n".join(v for k, v in row.items() if k != "Global_Standard" and v)
+        if text:
+            _, tags = _key_tags([term])
+            yield _Doc("용어집", term, text, [], tags)
+
+
+def collect_documents(src_dir: str = DB_DIR) -> List[_Doc]:
+    docs: List[_Doc] = []
+    for source, path in TEXT_SOURCES.items():
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        has_headings = any(_HEADING_RE.match(line.strip()) for line in text.splitlines())
+        splitter = split_volumes if has_headings else split_numbered
+        docs.extend(splitter(text, source))
+    db = load_bundle(src_dir=src_dir)
+    for name in db:
+        if name not in INDEXED_SECTIONS:
+            continue
+        if name == "glossary":
+            docs.extend(split_glossary(db[name]))
+        else:
+            docs.extend(split_db(name, db[name]))
+    return docs
+
+
+# ==========================================
+# 4. 색인 빌드 (Build Step)
+# ==========================================
+
+def build_index(out_path: str = INDEX_PATH, src_dir: str = DB_DIR) -> Dict[str, Any]:
+    """모든 코퍼스를 문서로 나눠 BM25 역색인 파일을 만들고 메타 정보를 돌려줍니다."""
+    docs = collect_documents(src_dir)
+    postings: Dict[bytes, List[Tuple[int, int]]] = {}
+    doc_len = np.zeros(len(docs), dtype=np.uint32)
+    for doc_id, doc in enumerate(docs):
+        counts = Counter(tokenize(f"{doc.title}\n{doc.text}"))
+        doc_len[doc_id] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term.encode("utf-8"), []).append((doc_id, min(tf, 0xFFFF)))
+
+    terms = sorted(postings)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.uint32)
+    posting_offsets = np.zeros(len(terms) + 1, dtype=np.uint32)
+    term_offsets[1:] = np.cumsum([len(t) for t in terms])
+    posting_offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+    flat = [pair for t in terms for pair in postings[t]]
+    posting_docs = np.array([d for d, _ in flat], dtype=np.uint32)
+    posting_tf = np.array([tf for _, tf in flat], dtype=np.uint16)
+    texts = [doc.text.encode("utf-8") for doc in docs]
+    text_offsets = np.zeros(len(docs) + 1, dtype=np.uint32)
+    text_offsets[1:] = np.cumsum([len(t) for t in texts])
+    term_blob = b"".join(terms)
+    text_blob = b"".join(texts)
+
+    meta = {
+        "docs": [[doc.source, doc.title, doc.only, sorted(set(doc.tags))] for doc in docs],
+        "avgdl": float(doc_len.mean()) if len(docs) else 0.0,
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header = _HEADER.pack(_MAGIC, _VERSION, len(meta_bytes), len(docs), len(terms), len(flat),
+                          len(term_blob), len(text_blob))
+    arrays = (term_offsets, posting_offsets, posting_docs, doc_len, text_offsets, posting_tf)
+    write_atomic(out_path, [header + meta_bytes + b"\0" * _pad(len(header) + len(meta_bytes)),
+                            *(array.tobytes() for array in arrays), term_blob, text_blob])
+    return {"documents": len(docs), "terms": len(terms), "postings": len(flat), "bytes": os.path.getsize(out_path)}
+
+
+def is_stale(index_path: str = INDEX_PATH, src_dir: str = DB_DIR) -> bool:
+    """원본(총서, 프롬프트, DB 파일) 중 하나라도 색인보다 새로우면 True."""
+    if not os.path.exists(index_path):
+        return True
+    with open(index_path, "rb") as f:
+        head = f.read(_HEADER.size)
+    # 꼬리표 규칙이 바뀐 예전 형식이면 원본이 그대로여도 다시 빌드한다
+    if len(head) < _HEADER.size or _HEADER.unpack(head)[:2] != (_MAGIC, _VERSION):
+        return True
+    built_at = os.path.getmtime(index_path)
+    sources = list(TEXT_SOURCES.values()) + [os.path.join(src_dir, f) for f in SECTION_FILES.values()]
+    return any(os.path.exists(path) and os.path.getmtime(path) > built_at for path in sources)
+
+
+# ==========================================
+# 5. 검색 (mmap Reader & BM25 Query)
+# ==========================================
+
+class Passage(NamedTuple):
+    source: str
+    title: str
+    snippet: str
+    score: float
+
+    @property
+    def citation(self) -> str:
+        return f"{self.source} · {self.title}"
+
+
+def chart_profile(ganji_map: Dict[str, str], sibseong: Optional[str] = None) -> Dict[str, str]:
+    """검색 필터에 쓰는 차트 요약: 일주, 일간, 일지, 주된 십성(주어지면)."""
+    profile = {"pillar": ganji_map["day_gan"] + ganji_map["day_ji"], "stem": ganji_map["day_gan"],
+               "branch": ganji_map["day_ji"]}
+    if sibseong:
+        profile["sibseong"] = sibseong
+    return profile
+
+
+class KnowledgeIndex:
+    """mmap 한 색인 파일 위의 BM25 검색기. 용어 사전은 파일 안에서 이진 탐색하므로 여는 비용이 작다."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, meta_len, n_docs, n_terms, n_postings,
+         term_bytes, text_bytes) = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"지식 색인 형식이 올바르지 않네: {path}")
+        meta = json.loads(self._mm[_HEADER.size:_HEADER.size + meta_len].decode("utf-8"))
+        self.docs: List[List[Any]] = meta["docs"]
+        self.avgdl: float = meta["avgdl"] or 1.0
+
+        offset = _HEADER.size + meta_len
+        offset += _pad(offset)
+
+        def take(dtype: Any, count: int) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self._term_offsets = take(np.uint32, n_terms + 1)
+        self._posting_offsets = take(np.uint32, n_terms + 1)
+        self._posting_docs = take(np.uint32, n_postings)
+        self._doc_len = take(np.uint32, n_docs).astype(np.float32)
+        self._text_offsets = take(np.uint32, n_docs + 1)
+        self._posting_tf = take(np.uint16, n_postings)
+        self._term_base = offset
+        self._text_base = offset + term_bytes
+        self.n_docs = n_docs
+        self.n_terms = n_terms
+        self._length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len / self.avgdl)
+
+    def _term(self, i: int) -> bytes:
+        start = self._term_base + int(self._term_offsets[i])
+        return self._mm[start:self._term_base + int(self._term_offsets[i + 1])]
+
+    def term_id(self, term: str) -> int:
+        """용어 사전에서 이진 탐색합니다. 없으면 -1."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n_terms and self._term(lo) == key else -1
+
+    def text(self, doc_id: int) -> str:
+        start = self._text_base + int(self._text_offsets[doc_id])
+        return self._mm[start:self._text_base + int(self._text_offsets[doc_id + 1])].decode("utf-8")
+
+    def scores(self, query: str) -> np.ndarray:
+        """모든 문서의 BM25 점수 (n_docs,)."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            i = self.term_id(term)
+            if i < 0:
+                continue
+            lo, hi = int(self._posting_offsets[i]), int(self._posting_offsets[i + 1])
+            docs = self._posting_docs[lo:hi]
+            tf = self._posting_tf[lo:hi].astype(np.float32)
+            idf = math.log(1 + (self.n_docs - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            scores[docs] += qtf * idf * tf * (BM25_K1 + 1) / (tf + self._length_norm[docs])
+        return scores
+
+    def _chart_weights(self, profile: Dict[str, str]) -> np.ndarray:
+        """차트 필터: 다른 일주/일간 전용 항목은 0, 차트와 엮인 항목은 1 + CHART_BOOST."""
+        own = {f"pillar:{profile.get('pillar')}", f"stem:{profile.get('stem')}", f"branch:{profile.get('branch')}",
+               f"sibseong:{profile.get('sibseong')}"}
+        weights = np.ones(self.n_docs, dtype=np.float32)
+        for doc_id, (_, _, only, tags) in enumerate(self.docs):
+            if only and not own.intersection(only):
+                weights[doc_id] = 0.0
+            elif own.intersection(only) or own.intersection(tags):
+                weights[doc_id] = 1.0 + CHART_BOOST
+        return weights
+
+    def search(self, query: str, chart: Optional[Dict[str, str]] = None, k: int = 3) -> List[Passage]:
+        """질문에 맞는 구절 k 개를 점수 순으로 돌려줍니다. chart(chart_profile 결과)가 있으면 그 사람에 맞춰 거른다."""
+        scores = self.scores(query)
+        if chart:
+            scores *= self._chart_weights(chart)
+        hits = np.flatnonzero(scores > 0)
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        query_terms = set(tokenize(query))
+        return [Passage(self.docs[i][0], self.docs[i][1], self._snippet(int(i), query_terms), float(scores[i]))
+                for i in top]
+
+    def _snippet(self, doc_id: int, query_terms: set) -> str:
+        """문서에서 질문 용어가 가장 많이 겹치는 줄을 인용문으로 고릅니다."""
+        lines = [line.strip() for line in self.text(doc_id).splitlines() if line.strip()]
+        if not lines:
+            return ""
+        best = max(lines, key=lambda line: len(query_terms.intersection(tokenize(line))))
+        return best if len(best) <= SNIPPET_CHARS else best[:SNIPPET_CHARS - 1] + "…"
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def load_index(path: str = INDEX_PATH, src_dir: Optional[str] = DB_DIR) -> KnowledgeIndex:
+    """색인을 연다. src_dir 이 주어지고 원본이 더 새로우면 먼저 다시 빌드합니다."""
+    if src_dir is not None and is_stale(path, src_dir):
+        build_index(path, src_dir)
+    return KnowledgeIndex(path)
+
+
+def validate_chart_filter(index: Optional[KnowledgeIndex] = None,
+                          queries: Tuple[str, ...] = ("건강", "재물", "운세", "연애", "직업")) -> Dict[str, Any]:
+    """60 일주마다 (1) 제목 경로에 다른 일간·일지 키(또는 다른 일주 키)가 있는 문서의 가중치가 0 인지,
+    (2) 질문별 상위 결과에 그런 문서가 끼지 않는지 확인합니다."""
+    index = index or load_index()
+    foreign: List[str] = []
+    for code in range(60):
+        stem, branch = CHEONGAN[code % 10], JIJI[code % 12]
+        profile = chart_profile({"day_gan": stem, "day_ji": branch})
+        weights = index._chart_weights(profile)
+
+        def is_foreign(title: str) -> bool:
+            for key in title.split(" > "):
+                pillar = _PILLAR_KEY_RE.match(key)
+                pair = _STEM_PAIR_RE.match(key)
+                if pillar and pillar.group(1) + pillar.group(2) != stem + branch:
+                    return True
+                if pair and stem not in pair.groups():
+                    return True
+                if key in _SINGLE_STEM and key != stem:
+                    return True
+                if key in _SINGLE_BRANCH and key != branch:
+                    return True
+            return False
+
+        for doc_id, (_, title, _, _) in enumerate(index.docs):
+            if weights[doc_id] > 0 and is_foreign(title):
+                foreign.append(f"{stem}{branch}: {title}")
+        for query in queries:
+            for passage in index.search(query, chart=profile, k=5):
+                if is_foreign(passage.title):
+                    foreign.append(f"{stem}{branch} '{query}': {passage.title}")
+    return {"charts": 60, "queries": len(queries), "foreign": foreign[:20], "ok": not foreign}
+
+
+def validate_volumes(index: Optional[KnowledgeIndex] = None, expected: int = 6) -> Dict[str, Any]:
+    """총서 문서의 권이 제1권~제{expected}권 순서 그대로인지 확인합니다. (본문 줄이 제목으로 잘못 잡히면 어긋난다)"""
+    index = index or load_index()
+    volumes: List[str] = []
+    for source, title, _, _ in index.docs:
+        if source == "총서" and title.startswith("제"):
+            volume = title.split(":", 1)[0]
+            if not volumes or volumes[-1] != volume:
+                volumes.append(volume)
+    want = [f"제{n}권" for n in range(1, expected + 1)]
+    return {"volumes": volumes, "ok": volumes == want}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--validate"]:
+        index = load_index()
+        result = {"volumes": validate_volumes(index), **validate_chart_filter(index)}
+        result["ok"] = result["ok"] and result["volumes"]["ok"]
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result["ok"] else 1)
+    if len(sys.argv) > 1:
+        index = load_index()
+        for passage in index.search(" ".join(sys.argv[1:]), k=5):
+            print(f"[{passage.score:.2f}] {passage.citation}\n    {passage.snippet}")
+    else:
+        built = build_index()
+        print(f"지식 색인 생성 완료: {INDEX_PATH} (문서 {built['documents']}개, 용어 {built['terms']}개, "
+              f"{built['bytes']} bytes)")
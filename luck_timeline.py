@@ -0,0 +1,262 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from manse_calendar import (get_calendar, sexagenary_name, _to_epoch_seconds, TERMS_PER_YEAR,
+                            DAY_ANCHOR_DATE, DEFAULT_UTC_OFFSET)
+from saju_chart import SIBSEONG_NAMES, SIBSEONG_LUT, BRANCH_HIDDEN_STEMS, SajuChart
+
+# ==========================================
+# 1. 상수 (Constants)
+# ==========================================
+DAYS_PER_LUCK_YEAR = 3.0      # 절기까지 3일 = 대운수 1년
+DAEWOON_SPAN = 10             # 대운 하나는 10년
+DAEWOON_COUNT = 12            # 120세까지
+TROPICAL_YEAR_DAYS = 365.2422
+
+MALE = ('남', 'M', 'male', '남자', 'm')
+# 십성 → timeline_db['ten_gods_impact'] 의 묶음 이름 (비견/겁재 → 비겁운 …)
+SIBSEONG_GROUPS = ['비겁운', '식상운', '재성운', '관성운', '인성운']
+# 나이 → lifecycle_pillar_db 섹션 (초년/청년/중년/말년)
+LIFECYCLE_SECTIONS = [(0, 19, 'year_pillar'), (20, 39, 'month_pillar'), (40, 59, 'day_pillar'), (60, 200, 'time_pillar')]
+
+
+class LuckPillar(NamedTuple):
+    """대운/세운/월운/일진 한 칸. start 이상 end 미만 구간에 code(육십갑자 인덱스)가 작용한다."""
+    kind: str
+    start: datetime
+    end: datetime
+    code: int
+    sibseong: str        # 천간 십성 (일간 기준)
+    ji_sibseong: str     # 지지(대표 지장간) 십성
+
+    @property
+    def name(self) -> str:
+        return sexagenary_name(self.code)
+
+
+def _ten_gods(day_stem: int, code: int) -> Tuple[str, str]:
+    base = day_stem * 10
+    return (SIBSEONG_NAMES[SIBSEONG_LUT[base + code % 10]],
+            SIBSEONG_NAMES[SIBSEONG_LUT[base + BRANCH_HIDDEN_STEMS[code % 12][0]]])
+
+
+def ten_gods_bulk(day_stems: Any, codes: Any) -> Dict[str, Any]:
+    """일간 배열과 육십갑자 코드 배열(브로드캐스트 가능)의 십성 코드. {"gan", "ji"} 는 SIBSEONG_NAMES 인덱스."""
+    import numpy as np
+
+    table = np.frombuffer(SIBSEONG_LUT, dtype=np.uint8).reshape(10, 10)
+    main_hidden = np.array([h[0] for h in BRANCH_HIDDEN_STEMS], dtype=np.int64)
+    day_stems = np.asarray(day_stems, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    return {"gan": table[day_stems, codes % 10], "ji": table[day_stems, main_hidden[codes % 12]]}
+
+
+def is_forward(year_stem: int, gender: Optional[str]) -> bool:
+    """양년생 남자·음년생 여자는 순행, 그 반대는 역행. (성별을 모르면 남자로 본다)"""
+    male = gender is None or gender in MALE
+    return (year_stem % 2 == 0) == male
+
+
+# ==========================================
+# 2. 대운 (Decade Luck)
+# ==========================================
+
+def _month_jeol(chart: SajuChart, seconds: int) -> int:
+    """출생 시각이 속한 달을 연 절(節)의 인덱스."""
+    calendar = get_calendar()
+    i = calendar.term_index(seconds)
+    jeol = i - i % 2
+    # 경도 보정 오프셋이 조금 달라도 사주의 월주와 같은 달을 기준으로 삼는다
+    month = chart.pillar(1)
+    for shift in (0, -2, 2):
+        if calendar.term_pillars(jeol + shift)[1] == month:
+            return jeol + shift
+    return jeol
+
+
+def month_elapsed_days(chart: Any, birth_dt: datetime, utc_offset: float = DEFAULT_UTC_OFFSET) -> float:
+    """절입(월주가 바뀐 절기)부터 출생 시각까지 지난 날 수. (지장간 사령 판단용)"""
+    chart = SajuChart.from_ganji(chart)
+    seconds = _to_epoch_seconds(birth_dt, utc_offset)
+    return max(0.0, (seconds - get_calendar().terms[_month_jeol(chart, seconds)]) / 86400.0)
+
+
+def daewoon_start(chart: Any, birth_dt: datetime, gender: Optional[str],
+                  utc_offset: float = DEFAULT_UTC_OFFSET) -> Tuple[bool, float]:
+    """(순행 여부, 대운 시작 나이[년]). 출생 시각에서 다음(순행)/이전(역행) 절까지의 날 수 ÷ 3."""
+    chart = SajuChart.from_ganji(chart)
+    calendar = get_calendar()
+    seconds = _to_epoch_seconds(birth_dt, utc_offset)
+    jeol = _month_jeol(chart, seconds)
+    forward = is_forward(chart.stem(0), gender)
+    boundary = calendar.terms[jeol + 2] if forward else calendar.terms[jeol]
+    days = abs(boundary - seconds) / 86400.0
+    return forward, days / DAYS_PER_LUCK_YEAR
+
+
+def daewoon_number(start_age: float) -> int:
+    """관례상 쓰는 정수 대운수 (1~10)."""
+    return min(10, max(1, int(round(start_age))))
+
+
+class LuckTimeline:
+    """한 사람의 대운/세운/월운/일진을 필요한 만큼만 계산해 흘려보내는 타임라인입니다."""
+
+    def __init__(self, chart: Any, birth_dt: datetime, gender: Optional[str] = None,
+                 utc_offset: float = DEFAULT_UTC_OFFSET):
+        self.chart = SajuChart.from_ganji(chart)
+        self.birth_dt = birth_dt
+        self.utc_offset = utc_offset
+        self.day_stem = self.chart.day_stem
+        self.forward, self.start_age = daewoon_start(self.chart, birth_dt, gender, utc_offset)
+
+    def _pillar(self, kind: str, start: datetime, end: datetime, code: int) -> LuckPillar:
+        return LuckPillar(kind, start, end, code, *_ten_gods(self.day_stem, code))
+
+    def _age_to_datetime(self, age: float) -> datetime:
+        return self.birth_dt + timedelta(days=age * TROPICAL_YEAR_DAYS)
+
+    def age_at(self, when: datetime) -> float:
+        return (when - self.birth_dt).days / TROPICAL_YEAR_DAYS
+
+    # --- 대운 ---
+    def _daewoon(self, k: int) -> LuckPillar:
+        """k 번째(0부터) 대운: 월주에서 순행/역행으로 k+1 칸."""
+        age = self.start_age + k * DAEWOON_SPAN
+        code = (self.chart.pillar(1) + (1 if self.forward else -1) * (k + 1)) % 60
+        return self._pillar("대운", self._age_to_datetime(age), self._age_to_datetime(age + DAEWOON_SPAN), code)
+
+    def daewoon(self, count: int = DAEWOON_COUNT) -> Iterator[LuckPillar]:
+        return (self._daewoon(k) for k in range(count))
+
+    def daewoon_index_at(self, when: datetime) -> int:
+        """해당 시점이 몇 번째 대운인지 (0 부터). 대운이 들기 전이면 -1."""
+        return max(int((self.age_at(when) - self.start_age) // DAEWOON_SPAN), -1)
+
+    def daewoon_at(self, when: datetime) -> Optional[LuckPillar]:
+        """해당 시점의 대운. 대운이 들기 전(start_age 이전)이면 None."""
+        k = self.daewoon_index_at(when)
+        return self._daewoon(k) if k >= 0 else None
+
+    # --- 세운 / 월운 / 일진 ---
+    def years(self, first_year: int, last_year: int) -> Iterator[LuckPillar]:
+        """세운: 입춘부터 다음 입춘까지."""
+        calendar = get_calendar()
+        for year in range(first_year, last_year + 1):
+            i = (year - calendar.first_year) * TERMS_PER_YEAR + 2  # 입춘
+            yield self._pillar("세운", calendar.term_datetime(i, self.utc_offset),
+                               calendar.term_datetime(i + TERMS_PER_YEAR, self.utc_offset), (year - 4) % 60)
+
+    def months(self, start: datetime, end: datetime) -> Iterator[LuckPillar]:
+        """월운: start~end 에 걸치는 절(節) 구간마다 한 칸."""
+        calendar = get_calendar()
+        i = calendar.term_index(_to_epoch_seconds(start, self.utc_offset))
+        i -= i % 2
+        while True:
+            begin = calendar.term_datetime(i, self.utc_offset)
+            if begin >= end:
+                return
+            yield self._pillar("월운", begin, calendar.term_datetime(i + 2, self.utc_offset),
+                               calendar.term_pillars(i)[1])
+            i += 2
+
+    def days(self, start: date, end: date) -> Iterator[LuckPillar]:
+        """일진: start 이상 end 미만의 날마다 한 칸 (하루의 시작은 전날 23시 자시)."""
+        code = day_pillar_code(start)
+        current = datetime.combine(start, datetime.min.time())
+        for _ in range((end - start).days):
+            nxt = current + timedelta(days=1)
+            yield self._pillar("일진", current - timedelta(hours=1), nxt - timedelta(hours=1), code)
+            current, code = nxt, (code + 1) % 60
+
+
+# ==========================================
+# 3. 다수 사용자용 벡터 경로 (Many Users, One Day)
+# ==========================================
+
+def day_pillar_code(day: date) -> int:
+    """그 날(자정 기준)의 일진 육십갑자 인덱스."""
+    return get_calendar().day_pillar(datetime.combine(day, datetime.min.time()) + timedelta(hours=12))
+
+
+def iter_day_codes(start: date, end: date, chunk_days: int = 366) -> Iterator[Tuple[Any, Any]]:
+    """start~end 일진을 (datetime64[D] 배열, 코드 배열) 청크로 흘려보냅니다."""
+    import numpy as np
+
+    first = np.datetime64(start, 'D')
+    last = np.datetime64(end, 'D')
+    anchor = np.datetime64(DAY_ANCHOR_DATE.date(), 'D')
+    anchor_code = get_calendar().day_anchor_index
+    while first < last:
+        days = np.arange(first, min(first + chunk_days, last), dtype='datetime64[D]')
+        yield days, (anchor_code + (days - anchor).astype(np.int64)) % 60
+        first = days[-1] + 1
+
+
+def daily_ten_gods(day_stems: Any, day: date) -> Dict[str, Any]:
+    """사용자 일간 배열(백만 명 규모도 가능)에 대해 그 날 일진의 십성 코드 배열."""
+    return ten_gods_bulk(day_stems, day_pillar_code(day))
+
+
+# ==========================================
+# 4. DB 연결 (timeline_db / lifecycle_pillar_db)
+# ==========================================
+
+def _life_stage(age: int, stages: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """timeline_db['life_stages_detailed'] 의 '30~39세' 범위로 나이대를 찾습니다."""
+    for key, data in stages.items():
+        bounds = [int(x) for x in re.findall(r'\d+', data.get('range', ''))]
+        if len(bounds) == 2 and bounds[0] <= age <= bounds[1]:
+            return key, data
+    return "", {}
+
+
+def lifecycle_section(age: int) -> str:
+    for lo, hi, section in LIFECYCLE_SECTIONS:
+        if lo <= age <= hi:
+            return section
+    return LIFECYCLE_SECTIONS[-1][2]
+
+
+def timeline_reports(timeline: LuckTimeline, db: Dict, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """현재 대운과 올해 세운으로 timeline_db / lifecycle_pillar_db 문구를 골라 보고서 항목을 만듭니다."""
+    now = now or datetime.now()
+    timeline_db = db.get('timeline', {})
+    lifecycle_db = db.get('lifecycle', {})
+    chart = timeline.chart
+    day_gan = chart['day_gan']
+    age = now.year - timeline.birth_dt.year
+    reports: List[Dict[str, Any]] = []
+
+    # 1. 세운 분석
+    year = next(timeline.years(now.year, now.year))
+    yearly = timeline_db.get('yearly_2025_2026', {}).get(day_gan, {}).get(str(now.year))
+    group = SIBSEONG_GROUPS[SIBSEONG_NAMES.index(year.sibseong) // 2]
+    content = yearly or f"올해 {year.name}년은 자네에게 **{year.sibseong}**({group})의 기운이 드는 해네."
+    reports.append({
+        "type": f"⚡️ **{year.sibseong}** 세운 분석",
+        "title": f"{now.year}년 {year.name}년의 기운이네.",
+        "content": content,
+    })
+
+    # 2. 대운 & 라이프 사이클 분석
+    daewoon = timeline.daewoon_at(now)
+    stage_key, stage = _life_stage(age, timeline_db.get('life_stages_detailed', {}))
+    section = lifecycle_db.get(lifecycle_section(age), {})
+    if daewoon is not None and (stage or section):
+        group = SIBSEONG_GROUPS[SIBSEONG_NAMES.index(daewoon.sibseong) // 2]
+        lines = []
+        if stage:
+            lines.append(f"자네는 현재 **{stage.get('desc', '')}**의 흐름에 있네.")
+        impact = timeline_db.get('ten_gods_impact', {}).get(stage_key, {}).get(group)
+        if impact:
+            lines.append(impact)
+        if section.get(daewoon.sibseong):
+            lines.append(f"이 시기에 **{daewoon.sibseong}**의 대운이 들어왔으니, {section[daewoon.sibseong]}")
+        reports.append({
+            "type": f"⚖️ {section.get('desc', '대운 흐름 분석')}",
+            "title": f"**{daewoon.name} 대운** ({daewoon_number(timeline.start_age)}대운, "
+                     f"{'순행' if timeline.forward else '역행'})의 흐름",
+            "content": "\n\n".join(lines),
+        })
+    return reports
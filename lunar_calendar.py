@@ -0,0 +1,352 @@
+import os
+import sys
+import mmap
+import struct
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from solar_time import KOREA_LMT_OFFSET, KOREA_OFFSET_HISTORY
+
+# ==========================================
+# 1. 상수 및 파일 포맷 (Constants & File Format)
+# ==========================================
+# 한국 음력(태음태양력) 1900~2100년 표입니다. 한 해를 uint32 하나에 담는다:
+#   비트 0~12   달 크기 (해당 위치의 달이 30일이면 1, 29일이면 0; 윤달이 있으면 13개월)
+#   비트 13~16  윤달 (0 이면 없음, 5 이면 5월 다음에 윤5월)
+#   비트 17~23  설날(음력 1월 1일)이 양력 1월 1일로부터 며칠 뒤인지
+# 음력 ↔ 양력 변환은 해 단위 누적 일수 표만 보면 되므로 O(1) 이다.
+FIRST_YEAR = 1900
+LAST_YEAR = 2100
+MONTHS_MAX = 13
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saju_db", "lunar_calendar.bin")
+
+# 헤더: magic, version, first_year, n_years
+_HEADER = struct.Struct("<4sHHH")
+_MAGIC = b"LUNR"
+_VERSION = 1
+_LEAP_SHIFT = 13
+_NEW_YEAR_SHIFT = 17
+
+# 생성 결과 검증용 기준값 (한국천문연구원 음양력 자료): 설날, 윤달
+KNOWN_NEW_YEARS = {2000: date(2000, 2, 5), 2020: date(2020, 1, 25), 2023: date(2023, 1, 22),
+                   2024: date(2024, 2, 10), 2025: date(2025, 1, 29), 2026: date(2026, 2, 17)}
+KNOWN_LEAP_MONTHS = {2012: 3, 2014: 9, 2017: 5, 2020: 4, 2023: 2, 2025: 6}
+
+
+class LunarDate(NamedTuple):
+    year: int
+    month: int
+    day: int
+    is_leap: bool = False
+
+
+def _pack(lengths: List[int], leap_month: int, new_year_offset: int) -> int:
+    bits = sum(1 << i for i, n in enumerate(lengths) if n == 30)
+    return bits | (leap_month << _LEAP_SHIFT) | (new_year_offset << _NEW_YEAR_SHIFT)
+
+
+def _unpack(word: int) -> Tuple[List[int], int, int]:
+    leap_month = (word >> _LEAP_SHIFT) & 0xF
+    n_months = 13 if leap_month else 12
+    lengths = [30 if word >> i & 1 else 29 for i in range(n_months)]
+    return lengths, leap_month, word >> _NEW_YEAR_SHIFT
+
+
+def month_position(month: int, is_leap: bool, leap_month: int) -> int:
+    """해 안에서 달의 순번(0부터). 윤달은 같은 숫자의 평달 바로 다음 자리다."""
+    return month - 1 + (1 if leap_month and (month > leap_month or (is_leap and month == leap_month)) else 0)
+
+
+# ==========================================
+# 2. 테이블 생성기 (Generator, ephem 사용)
+# ==========================================
+# 규칙: 합삭(새달)이 든 날(한국 표준시 기준)이 그달 초하루, 동지가 든 달이 11월,
+# 동지~동지 사이에 달이 13개면 그 안에서 중기(中氣)가 없는 첫 달이 윤달.
+
+def _standard_offset(utc_dt: datetime) -> float:
+    """음력 날짜를 가르는 표준시(서머타임 제외). 1908년 이전은 서울 지방평균시."""
+    offset = KOREA_LMT_OFFSET
+    for switch_at, value in KOREA_OFFSET_HISTORY:
+        if utc_dt < switch_at:
+            break
+        offset = value
+    return {10.0: 9.0, 9.5: 8.5}.get(offset, offset)
+
+
+def _local_ordinal(moment) -> int:
+    import ephem
+
+    utc_dt = ephem.Date(moment).datetime()
+    return (utc_dt + timedelta(hours=_standard_offset(utc_dt))).toordinal()
+
+
+def _principal_terms(first_year: int, last_year: int) -> List[int]:
+    """중기(태양 황경 30° 배수) 날짜들의 ordinal (정렬됨)."""
+    import ephem
+    from manse_calendar import _find_term
+
+    days = []
+    for year in range(first_year, last_year + 1):
+        for k in range(12):
+            longitude = 30.0 * k  # 춘분(0°)부터
+            guess = ephem.Date(datetime(year, 3, 20)) + longitude / 360.0 * 365.2422
+            days.append(_local_ordinal(_find_term(longitude, guess)))
+    return sorted(days)
+
+
+def generate_lunar_table(first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR) -> List[int]:
+    """ephem 으로 합삭과 중기를 계산하여 해마다 packed uint32 를 만듭니다. (오프라인 빌드 전용)"""
+    import ephem
+    from bisect import bisect_left, bisect_right
+
+    terms = _principal_terms(first_year - 1, last_year + 1)
+    solstices = {}
+    for year in range(first_year - 1, last_year + 2):
+        moment = ephem.next_solstice(ephem.Date(datetime(year, 12, 1)))
+        solstices[year] = _local_ordinal(moment)
+
+    new_moons = []
+    moment = ephem.previous_new_moon(ephem.Date(datetime(first_year - 1, 11, 1)))
+    end = ephem.Date(datetime(last_year + 2, 2, 1))
+    while moment < end:
+        new_moons.append(_local_ordinal(moment))
+        moment = ephem.next_new_moon(moment)
+
+    # 동지가 든 달(11월)부터 다음 동지가 든 달 직전까지를 한 묶음으로 번호를 매긴다
+    months: Dict[int, List[Tuple[int, bool, int, int]]] = {}  # 해 → (월, 윤달, 초하루, 일수)
+    for year in range(first_year, last_year + 2):
+        a = bisect_right(new_moons, solstices[year - 1]) - 1
+        b = bisect_right(new_moons, solstices[year]) - 1
+        leap_at = -1
+        if b - a == 13:
+            for i in range(a + 1, b):
+                lo = bisect_left(terms, new_moons[i])
+                if lo >= len(terms) or terms[lo] >= new_moons[i + 1]:
+                    leap_at = i
+                    break
+        number = 10
+        for i in range(a, b):
+            is_leap = i == leap_at
+            if not is_leap:
+                number = number % 12 + 1
+            lunar_year = year - 1 if number >= 11 else year
+            months.setdefault(lunar_year, []).append((number, is_leap, new_moons[i], new_moons[i + 1] - new_moons[i]))
+
+    words = []
+    for year in range(first_year, last_year + 1):
+        entries = sorted(months[year], key=lambda m: m[2])
+        leap_month = next((n for n, is_leap, _, _ in entries if is_leap), 0)
+        new_year_offset = entries[0][2] - date(year, 1, 1).toordinal()
+        words.append(_pack([length for _, _, _, length in entries], leap_month, new_year_offset))
+    return words
+
+
+def build_table(path: str = TABLE_PATH, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR) -> str:
+    """음력 표를 계산하여 mmap 가능한 바이너리 파일로 저장합니다."""
+    words = generate_lunar_table(first_year, last_year)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, first_year, len(words)))
+        f.write(struct.pack(f"<{len(words)}I", *words))
+    return path
+
+
+# ==========================================
+# 3. 로더 및 변환 (Loader & Conversion)
+# ==========================================
+
+class LunarCalendar:
+    """mmap 으로 올린 음력 표. 해마다 설날 ordinal 과 달별 누적 일수를 미리 펼쳐 두고 O(1) 로 변환합니다."""
+
+    def __init__(self, path: str = TABLE_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, first_year, n_years = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"음력 표 형식이 올바르지 않네: {path}")
+        self.first_year = first_year
+        self.n_years = n_years
+        self.words = memoryview(self._mm)[_HEADER.size:_HEADER.size + 4 * n_years].cast("I")
+        self._leap: List[int] = []
+        self._new_year: List[int] = []
+        self._cumulative: List[List[int]] = []  # 해마다 [0, 1월 끝, 2월 끝, …] (윤달 포함 위치 순)
+        for year, word in enumerate(self.words, first_year):
+            lengths, leap_month, offset = _unpack(word)
+            cumulative = [0]
+            for n in lengths:
+                cumulative.append(cumulative[-1] + n)
+            self._leap.append(leap_month)
+            self._new_year.append(date(year, 1, 1).toordinal() + offset)
+            self._cumulative.append(cumulative)
+        self._np = None
+
+    @property
+    def last_year(self) -> int:
+        return self.first_year + self.n_years - 1
+
+    def _year_index(self, year: int) -> int:
+        if not self.first_year <= year <= self.last_year:
+            raise ValueError(f"음력 표 범위({self.first_year}~{self.last_year}) 밖의 해네.")
+        return year - self.first_year
+
+    def leap_month(self, year: int) -> int:
+        """그해 윤달 (없으면 0)."""
+        return self._leap[self._year_index(year)]
+
+    def month_days(self, year: int, month: int, is_leap: bool = False) -> int:
+        y = self._year_index(year)
+        if is_leap and self._leap[y] != month:
+            raise ValueError(f"음력 {year}년에는 윤{month}월이 없네.")
+        pos = month_position(month, is_leap, self._leap[y])
+        return self._cumulative[y][pos + 1] - self._cumulative[y][pos]
+
+    def to_solar(self, year: int, month: int, day: int, is_leap: bool = False) -> date:
+        """음력 날짜를 양력 date 로 바꿉니다. 없는 날짜(윤달 아님, 30일 없음 등)는 ValueError."""
+        if not 1 <= month <= 12:
+            raise ValueError(f"음력 {month}월은 없네.")
+        length = self.month_days(year, month, is_leap)
+        if not 1 <= day <= length:
+            raise ValueError(f"음력 {year}년 {'윤' if is_leap else ''}{month}월은 {length}일까지네.")
+        y = year - self.first_year
+        return date.fromordinal(self._new_year[y] + self._cumulative[y][month_position(month, is_leap, self._leap[y])]
+                                + day - 1)
+
+    def from_solar(self, solar: date) -> LunarDate:
+        """양력 date 를 음력 날짜로 바꿉니다."""
+        ordinal = solar.toordinal()
+        # 양력 1~2월은 아직 전해 음력일 수 있다 (마지막 해의 11·12월은 표 다음 해 양력에 걸친다)
+        y = min(solar.year - self.first_year, self.n_years - 1)
+        if 0 <= y and ordinal < self._new_year[y]:
+            y -= 1
+        if not 0 <= y < self.n_years or ordinal >= self._new_year[y] + self._cumulative[y][-1]:
+            raise ValueError(f"음력 표 범위({self.first_year}~{self.last_year}) 밖의 날짜네.")
+        rel = ordinal - self._new_year[y]
+        cumulative, leap_month = self._cumulative[y], self._leap[y]
+        pos = 0
+        while cumulative[pos + 1] <= rel:  # 많아야 13번
+            pos += 1
+        is_leap = bool(leap_month) and pos == leap_month
+        month = pos + 1 - (1 if leap_month and pos >= leap_month else 0)
+        return LunarDate(self.first_year + y, month, rel - cumulative[pos] + 1, is_leap)
+
+    # ---- 벡터 변환 (배치 입력용) ----
+    def _arrays(self):
+        import numpy as np
+
+        if self._np is None:
+            cumulative = np.zeros((self.n_years, MONTHS_MAX + 1), dtype=np.int64)
+            for y, row in enumerate(self._cumulative):
+                cumulative[y, :len(row)] = row
+                cumulative[y, len(row):] = row[-1]
+            self._np = (np.array(self._new_year, dtype=np.int64), cumulative, np.array(self._leap, dtype=np.int64))
+        return self._np
+
+    def to_solar_bulk(self, years: Any, months: Any, days: Any, is_leap: Any = False):
+        """to_solar 의 NumPy 버전. datetime64[D] 배열을 돌려주며, 없는 날짜가 섞여 있으면 ValueError."""
+        import numpy as np
+
+        new_year, cumulative, leap = self._arrays()
+        years, months, days = (np.asarray(a, dtype=np.int64) for a in (years, months, days))
+        is_leap = np.broadcast_to(np.asarray(is_leap, dtype=bool), years.shape)
+        y = years - self.first_year
+        if np.any((y < 0) | (y >= self.n_years)):
+            raise ValueError(f"음력 표 범위({self.first_year}~{self.last_year}) 밖의 해가 섞여 있네.")
+        leap_month = leap[y]
+        pos = months - 1 + ((leap_month > 0) & ((months > leap_month) | (is_leap & (months == leap_month))))
+        bad = (months < 1) | (months > 12) | (is_leap & (leap_month != months)) | (days < 1)
+        length = cumulative[y, np.clip(pos + 1, 0, MONTHS_MAX)] - cumulative[y, np.clip(pos, 0, MONTHS_MAX)]
+        bad |= days > length
+        if np.any(bad):
+            raise ValueError(f"없는 음력 날짜가 {int(bad.sum())}개 섞여 있네 (첫 위치 {int(np.argmax(bad))}).")
+        ordinal = new_year[y] + cumulative[y, pos] + days - 1
+        return (ordinal - date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+
+    def from_solar_bulk(self, dates: Any) -> Dict[str, Any]:
+        """from_solar 의 NumPy 버전. {"year", "month", "day", "is_leap"} 배열 dict."""
+        import numpy as np
+
+        new_year, cumulative, leap = self._arrays()
+        days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64) + date(1970, 1, 1).toordinal()
+        y = np.searchsorted(new_year, days, side="right") - 1
+        if np.any(y < 0) or np.any(days >= new_year[-1] + cumulative[-1, -1]):
+            raise ValueError(f"음력 표 범위({self.first_year}~{self.last_year}) 밖의 날짜가 섞여 있네.")
+        rel = days - new_year[y]
+        pos = (cumulative[y, 1:] <= rel[:, None]).sum(axis=1)
+        leap_month = leap[y]
+        is_leap = (leap_month > 0) & (pos == leap_month)
+        month = pos + 1 - ((leap_month > 0) & (pos >= leap_month))
+        return {"year": y + self.first_year, "month": month, "day": rel - cumulative[y, pos] + 1, "is_leap": is_leap}
+
+
+_calendar: Optional[LunarCalendar] = None
+
+
+def get_lunar_calendar() -> LunarCalendar:
+    """프로세스당 한 번만 표를 mmap 합니다. (파일이 없으면 생성)"""
+    global _calendar
+    if _calendar is None:
+        if not os.path.exists(TABLE_PATH):
+            build_table(TABLE_PATH)
+        _calendar = LunarCalendar(TABLE_PATH)
+    return _calendar
+
+
+def lunar_to_solar(year: int, month: int, day: int, is_leap: bool = False) -> date:
+    return get_lunar_calendar().to_solar(year, month, day, is_leap)
+
+
+def solar_to_lunar(solar: date) -> LunarDate:
+    return get_lunar_calendar().from_solar(solar)
+
+
+def lunar_datetime_to_solar(dt: datetime, is_leap: bool = False) -> datetime:
+    """음력 날짜 + 시각(dt 의 연/월/일을 음력으로 읽는다)을 양력 datetime 으로 바꿉니다. 시각은 그대로 둔다."""
+    return datetime.combine(lunar_to_solar(dt.year, dt.month, dt.day, is_leap), dt.time())
+
+
+# ==========================================
+# 4. 검증 (Validation against ephem)
+# ==========================================
+
+def validate_table(calendar: Optional[LunarCalendar] = None, years: Optional[List[int]] = None) -> List[str]:
+    """표를 ephem 천문 계산으로 다시 만들어 비교하고, 알려진 설날/윤달과도 맞춰 봅니다. 어긋난 항목 설명 목록."""
+    calendar = calendar or get_lunar_calendar()
+    years = years or list(range(calendar.first_year, calendar.last_year + 1))
+    problems = []
+    # 연속된 구간끼리 묶어 다시 계산한다 (경계 해의 앞뒤 동지가 필요하므로 구간 단위가 싸다)
+    start = 0
+    while start < len(years):
+        end = start
+        while end + 1 < len(years) and years[end + 1] == years[end] + 1:
+            end += 1
+        expected = generate_lunar_table(years[start], years[end])
+        for year, word in zip(years[start:end + 1], expected):
+            if calendar.words[year - calendar.first_year] != word:
+                problems.append(f"{year}: 표 {calendar.words[year - calendar.first_year]:#010x} ≠ 계산 {word:#010x}")
+        start = end + 1
+    for year, new_year in KNOWN_NEW_YEARS.items():
+        if calendar.first_year <= year <= calendar.last_year and calendar.to_solar(year, 1, 1) != new_year:
+            problems.append(f"{year}: 설날 {calendar.to_solar(year, 1, 1)} ≠ {new_year}")
+    for year, leap_month in KNOWN_LEAP_MONTHS.items():
+        if calendar.first_year <= year <= calendar.last_year and calendar.leap_month(year) != leap_month:
+            problems.append(f"{year}: 윤달 {calendar.leap_month(year)} ≠ {leap_month}")
+    # 왕복 변환: 모든 음력 날짜 → 양력 → 음력
+    for year in years:
+        for pos in range(13 if calendar.leap_month(year) else 12):
+            leap_month = calendar.leap_month(year)
+            is_leap = bool(leap_month) and pos == leap_month
+            month = pos + 1 - (1 if leap_month and pos >= leap_month else 0)
+            for day in (1, calendar.month_days(year, month, is_leap)):
+                back = calendar.from_solar(calendar.to_solar(year, month, day, is_leap))
+                if back != LunarDate(year, month, day, is_leap):
+                    problems.append(f"{year}-{month}-{day}{'(윤)' if is_leap else ''}: 왕복 변환 결과 {back}")
+    return problems
+
+
+if __name__ == "__main__":
+    if "--validate" in sys.argv:
+        issues = validate_table()
+        print("\n".join(issues) or "음력 표 검증 통과")
+        sys.exit(1 if issues else 0)
+    out = build_table()
+    print(f"음력 표 생성 완료: {out} ({os.path.getsize(out)} bytes)")
@@ -0,0 +1,263 @@
+import os
+import math
+import mmap
+import struct
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from saju_chart import CHEONGAN, JIJI
+
+# ==========================================
+# 1. 상수 및 파일 포맷 (Constants & File Format)
+# ==========================================
+
+# 한 해의 24절기 (소한부터 시작, 15도 간격). 짝수 인덱스가 월을 가르는 '절(節)'이다.
+SOLAR_TERMS = [
+    "소한", "대한", "입춘", "우수", "경칩", "춘분", "청명", "곡우",
+    "입하", "소만", "망종", "하지", "소서", "대서", "입추", "처서",
+    "백로", "추분", "한로", "상강", "입동", "소설", "대설", "동지",
+]
+TERMS_PER_YEAR = len(SOLAR_TERMS)
+FIRST_TERM_LONGITUDE = 285.0  # 소한의 태양 황경
+
+FIRST_YEAR = 1900
+LAST_YEAR = 2100
+
+# 일주 앵커: 1900-01-01 은 갑술(甲戌)일, 육십갑자 인덱스 10
+DAY_ANCHOR_DATE = datetime(1900, 1, 1)
+DAY_ANCHOR_INDEX = 10
+
+DEFAULT_UTC_OFFSET = 9.0  # KST (135°E)
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saju_db", "manse_calendar.bin")
+
+# 헤더: magic, version, first_year, n_years, terms_per_year, day_anchor_index, reserved
+_HEADER = struct.Struct("<4sHHHHHH")
+_MAGIC = b"MNSE"
+_VERSION = 1
+_EPOCH = datetime(1970, 1, 1)
+
+
+def sexagenary_name(index: int) -> str:
+    """육십갑자 인덱스(0=갑자)를 '갑자' 형태의 문자열로 바꿉니다."""
+    return CHEONGAN[index % 10] + JIJI[index % 12]
+
+
+def sexagenary_index(stem: int, branch: int) -> int:
+    """천간/지지 인덱스 쌍을 육십갑자 인덱스로 바꿉니다. (음양이 맞지 않으면 ValueError)"""
+    if stem % 2 != branch % 2:
+        raise ValueError(f"존재하지 않는 간지 조합이네: {CHEONGAN[stem]}{JIJI[branch]}")
+    return (6 * stem - 5 * branch) % 60
+
+
+def _to_epoch_seconds(dt: datetime, utc_offset: float) -> int:
+    """naive 현지 시각을 UTC 기준 epoch 초로 변환합니다."""
+    return int((dt - _EPOCH).total_seconds() - utc_offset * 3600)
+
+
+# ==========================================
+# 2. 테이블 생성기 (Generator, ephem 사용)
+# ==========================================
+
+def _sun_longitude(date) -> float:
+    import ephem
+    sun = ephem.Sun()
+    sun.compute(date)
+    # 광행차가 포함된 시황경(apparent)을 써야 천문연 발표 시각과 맞는다
+    apparent = ephem.Equatorial(sun.g_ra, sun.g_dec, epoch=date)
+    return math.degrees(ephem.Ecliptic(apparent).lon)
+
+
+def _find_term(target_lon: float, guess) -> float:
+    """태양 황경이 target_lon 이 되는 순간(ephem.Date)을 이분법으로 찾습니다."""
+    import ephem
+
+    def diff(d):
+        return (_sun_longitude(d) - target_lon + 180.0) % 360.0 - 180.0
+
+    lo, hi = ephem.Date(guess - 5), ephem.Date(guess + 5)
+    for _ in range(40):  # 10일 구간 / 2^40 → 1ms 미만
+        mid = ephem.Date((lo + hi) / 2)
+        if diff(mid) < 0:
+            lo = mid
+        else:
+            hi = mid
+    return ephem.Date((lo + hi) / 2)
+
+
+def generate_solar_terms(first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR) -> List[int]:
+    """ephem 으로 24절기 시각을 계산하여 UTC epoch 초 목록으로 반환합니다. (오프라인 빌드 전용)"""
+    import ephem
+
+    terms: List[int] = []
+    for year in range(first_year, last_year + 1):
+        for k in range(TERMS_PER_YEAR):
+            target = (FIRST_TERM_LONGITUDE + 15.0 * k) % 360.0
+            # 소한(1/6경)부터 약 15.2일 간격으로 초기값을 잡는다
+            guess = ephem.Date(datetime(year, 1, 6)) + k * 15.218
+            moment = _find_term(target, guess)
+            terms.append(int(round((ephem.Date(moment).datetime() - _EPOCH).total_seconds())))
+    return terms
+
+
+def build_table(path: str = TABLE_PATH, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR) -> str:
+    """절기 테이블을 계산하여 mmap 가능한 바이너리 파일로 저장합니다."""
+    terms = generate_solar_terms(first_year, last_year)
+    header = _HEADER.pack(_MAGIC, _VERSION, first_year, last_year - first_year + 1,
+                          TERMS_PER_YEAR, DAY_ANCHOR_INDEX, 0)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{len(terms)}q", *terms))
+    return path
+
+
+# ==========================================
+# 3. 로더 및 조회 (Loader & Lookup)
+# ==========================================
+
+class ManseCalendar:
+    """mmap 으로 올린 절기 테이블 위에서 년월일시 간지를 산술/이분탐색으로 계산합니다."""
+
+    def __init__(self, path: str = TABLE_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, first_year, n_years, per_year, day_anchor, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION or per_year != TERMS_PER_YEAR:
+            raise ValueError(f"만세력 테이블 형식이 올바르지 않네: {path}")
+        self.first_year = first_year
+        self.n_years = n_years
+        self.day_anchor_index = day_anchor
+        # 헤더 뒤의 int64 배열을 복사 없이 그대로 본다
+        self.terms = memoryview(self._mm)[_HEADER.size:].cast("q")
+        self._np_terms = None
+
+    @property
+    def last_year(self) -> int:
+        return self.first_year + self.n_years - 1
+
+    def term_datetime(self, index: int, utc_offset: float = DEFAULT_UTC_OFFSET) -> datetime:
+        """절기 인덱스의 시각을 naive 현지 시각으로 돌려줍니다."""
+        return _EPOCH + timedelta(seconds=self.terms[index] + utc_offset * 3600)
+
+    def term_index(self, seconds: int) -> int:
+        """주어진 UTC epoch 초 직전(포함)의 절기 인덱스를 찾습니다."""
+        i = bisect_right(self.terms, seconds) - 1
+        if i < 0 or i >= len(self.terms) - 1:
+            raise ValueError(f"만세력 범위({self.first_year}~{self.last_year}) 밖의 날짜네.")
+        return i
+
+    def term_pillars(self, index: int) -> Tuple[int, int]:
+        """절기 인덱스가 속한 (년주, 월주) 육십갑자 인덱스."""
+        year_idx, slot = divmod(index, TERMS_PER_YEAR)
+        jeol = slot // 2  # 0=소한(축월), 1=입춘(인월) ...
+
+        saju_year = self.first_year + year_idx - (1 if jeol == 0 else 0)
+        year_pillar = (saju_year - 4) % 60
+        month_offset = (jeol - 1) % 12  # 인월=0
+        month_stem = ((year_pillar % 10) % 5 * 2 + 2 + month_offset) % 10
+        return year_pillar, sexagenary_index(month_stem, (month_offset + 2) % 12)
+
+    def day_pillar(self, dt: datetime) -> int:
+        """일주 육십갑자 인덱스. 자시(23시)부터 다음 날로 넘긴다."""
+        days = (dt + timedelta(hours=1) - DAY_ANCHOR_DATE).days
+        return (self.day_anchor_index + days) % 60
+
+    def pillars(self, dt: datetime, utc_offset: float = DEFAULT_UTC_OFFSET) -> List[int]:
+        """년/월/일/시 주의 육십갑자 인덱스 4개를 계산합니다."""
+        year_pillar, month_pillar = self.term_pillars(self.term_index(_to_epoch_seconds(dt, utc_offset)))
+        day_pillar = self.day_pillar(dt)
+        hour_branch = ((dt.hour + 1) // 2) % 12
+        hour_stem = ((day_pillar % 10) % 5 * 2 + hour_branch) % 10
+        time_pillar = sexagenary_index(hour_stem, hour_branch)
+        return [year_pillar, month_pillar, day_pillar, time_pillar]
+
+    def ganji(self, dt: datetime, utc_offset: float = DEFAULT_UTC_OFFSET) -> Dict[str, str]:
+        """get_ganji 와 같은 모양의 간지 dict 를 만듭니다."""
+        result = {}
+        for column, idx in zip(['year', 'month', 'day', 'time'], self.pillars(dt, utc_offset)):
+            result[f'{column}_gan'] = CHEONGAN[idx % 10]
+            result[f'{column}_ji'] = JIJI[idx % 12]
+        return result
+
+    def pillars_bulk(self, datetimes: Any, utc_offset: Any = DEFAULT_UTC_OFFSET):
+        """datetime 배열을 받아 (n, 4) int8 배열(년/월/일/시 육십갑자 인덱스)을 돌려줍니다."""
+        import numpy as np
+
+        if self._np_terms is None:
+            self._np_terms = np.frombuffer(self._mm, dtype="<i8", offset=_HEADER.size)
+        local = np.asarray(datetimes, dtype="datetime64[s]")
+        local_sec = local.astype(np.int64)
+        offset_sec = np.rint(np.asarray(utc_offset, dtype=np.float64) * 3600).astype(np.int64)
+
+        i = np.searchsorted(self._np_terms, local_sec - offset_sec, side="right") - 1
+        if np.any(i < 0) or np.any(i >= len(self._np_terms) - 1):
+            raise ValueError(f"만세력 범위({self.first_year}~{self.last_year}) 밖의 날짜가 섞여 있네.")
+        year_idx, slot = np.divmod(i, TERMS_PER_YEAR)
+        jeol = slot // 2
+
+        saju_year = self.first_year + year_idx - (jeol == 0)
+        year_pillar = (saju_year - 4) % 60
+        month_offset = (jeol - 1) % 12
+        month_stem = ((year_pillar % 10) % 5 * 2 + 2 + month_offset) % 10
+        month_pillar = (6 * month_stem - 5 * ((month_offset + 2) % 12)) % 60
+
+        anchor_sec = int((DAY_ANCHOR_DATE - _EPOCH).total_seconds())
+        days = (local_sec + 3600 - anchor_sec) // 86400
+        day_pillar = (self.day_anchor_index + days) % 60
+        hour = (local_sec % 86400) // 3600
+        hour_branch = ((hour + 1) // 2) % 12
+        hour_stem = ((day_pillar % 10) % 5 * 2 + hour_branch) % 10
+        time_pillar = (6 * hour_stem - 5 * hour_branch) % 60
+
+        return np.stack([year_pillar, month_pillar, day_pillar, time_pillar], axis=1).astype(np.int8)
+
+    def month_elapsed_bulk(self, datetimes: Any, utc_offset: Any = DEFAULT_UTC_OFFSET, month_branches: Any = None):
+        """
+        datetime 배열 각각이 속한 달의 절입 시각부터 지난 날 수 (float64 배열).
+        month_branches(사주 월지 코드)를 주면 luck_timeline 처럼 그 월지를 연 절에 맞춰 앞뒤 한 달까지 옮겨 본다.
+        """
+        import numpy as np
+
+        if self._np_terms is None:
+            self._np_terms = np.frombuffer(self._mm, dtype="<i8", offset=_HEADER.size)
+        local_sec = np.asarray(datetimes, dtype="datetime64[s]").astype(np.int64)
+        seconds = local_sec - np.rint(np.asarray(utc_offset, dtype=np.float64) * 3600).astype(np.int64)
+        i = np.searchsorted(self._np_terms, seconds, side="right") - 1
+        if np.any(i < 0) or np.any(i >= len(self._np_terms) - 1):
+            raise ValueError(f"만세력 범위({self.first_year}~{self.last_year}) 밖의 날짜가 섞여 있네.")
+        jeol = i - i % 2
+        if month_branches is not None:
+            branches = np.asarray(month_branches, dtype=np.int64)
+
+            def branch_of(j):
+                # 절 인덱스의 월지: 소한(slot 0)=축 … 절 하나마다 한 지지씩
+                return ((j % TERMS_PER_YEAR) // 2 + 1) % 12
+
+            jeol = np.where(branch_of(jeol) == branches, jeol,
+                            np.where(branch_of(jeol - 2) == branches, jeol - 2,
+                                     np.where(branch_of(jeol + 2) == branches, jeol + 2, jeol)))
+        return np.maximum(seconds - self._np_terms[jeol], 0) / 86400.0
+
+
+_calendar: Optional[ManseCalendar] = None
+
+
+def get_calendar() -> ManseCalendar:
+    """프로세스당 한 번만 테이블을 mmap 합니다. (파일이 없으면 생성)"""
+    global _calendar
+    if _calendar is None:
+        if not os.path.exists(TABLE_PATH):
+            build_table(TABLE_PATH)
+        _calendar = ManseCalendar(TABLE_PATH)
+    return _calendar
+
+
+def lookup_pillars_bulk(datetimes: Sequence[Any], utc_offset: Any = DEFAULT_UTC_OFFSET):
+    """여러 시각의 사주 기둥을 한꺼번에 조회합니다. 반환값은 (n, 4) int8 배열."""
+    return get_calendar().pillars_bulk(datetimes, utc_offset)
+
+
+if __name__ == "__main__":
+    out = build_table()
+    print(f"만세력 테이블 생성 완료: {out} ({os.path.getsize(out)} bytes)")
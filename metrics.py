@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+# 단계별 소요 시간(span)과 사건 카운터를 모으는 선택 기능입니다. 기본은 꺼져 있고, 꺼져 있으면
+# span() 은 공유 no-op 객체를, incr() 은 즉시 반환하므로 비용은 함수 호출 한 번 정도다.
+#   SHINRYEONG_METRICS=1                       계측 켜기 (또는 metrics.enable())
+#   SHINRYEONG_METRICS_FILE=stats-{pid}.json   프로세스 종료 시 누적 통계를 파일로 남김 ({pid} 치환)
+#   python metrics.py stats-*.json             통계 파일(여러 워커 것도 합산)을 Prometheus 텍스트로 출력
+ENABLED = os.environ.get("SHINRYEONG_METRICS", "0") == "1"
+STATS_PATH = os.environ.get("SHINRYEONG_METRICS_FILE")
+METRIC_PREFIX = "shinryeong"
+
+# 단계 소요 시간 히스토그램 구간(초): 수 µs 짜리 표 조회부터 지오코더 왕복까지
+BUCKETS_SECONDS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def enable(flag: bool = True) -> None:
+    """실행 중에 계측을 켜거나 끕니다. (이미 쌓인 통계는 그대로 둔다)"""
+    global ENABLED
+    ENABLED = flag
+
+
+# ==========================================
+# 2. 누적 통계 (Process-wide Registry)
+# ==========================================
+
+class Registry:
+    """프로세스 전체의 단계별 히스토그램과 사건 카운터입니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        # 단계 이름 → [구간별 개수(누적 아님, 마지막 칸은 +Inf), 합계 초, 개수]
+        self.stages: Dict[str, List[Any]] = {}
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = [[0] * (len(BUCKETS_SECONDS) + 1), 0.0, 0]
+            stage[0][bisect_left(BUCKETS_SECONDS, seconds)] += 1
+            stage[1] += seconds
+            stage[2] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "buckets": list(BUCKETS_SECONDS),
+                "counters": dict(self.counters),
+                "stages": {name: {"buckets": list(b), "sum": s, "count": c}
+                           for name, (b, s, c) in self.stages.items()},
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """다른 프로세스의 snapshot() 을 더합니다. (구간 정의가 같아야 한다)"""
+        if list(snapshot.get("buckets", BUCKETS_SECONDS)) != list(BUCKETS_SECONDS):
+            raise ValueError("히스토그램 구간이 다른 통계는 합칠 수 없네.")
+        with self._lock:
+            for name, n in snapshot.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            for name, data in snapshot.get("stages", {}).items():
+                stage = self.stages.setdefault(name, [[0] * (len(BUCKETS_SECONDS) + 1), 0.0, 0])
+                stage[0] = [a + b for a, b in zip(stage[0], data["buckets"])]
+                stage[1] += data["sum"]
+                stage[2] += data["count"]
+
+    def record_trace(self, metadata: Dict[str, Any]) -> None:
+        """다른 프로세스(서비스 워커)가 보고서에 붙여 보낸 Trace.as_metadata() 를 단계별 관측 한 번씩으로 더합니다."""
+        for name, ms in metadata.get("spans_ms", {}).items():
+            self.observe(name, ms / 1000.0)
+        for name, n in metadata.get("counters", {}).items():
+            self.incr(name, n)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.stages.clear()
+
+
+_registry = Registry()
+
+
+def get_registry() -> Registry:
+    return _registry
+
+
+# ==========================================
+# 3. 요청 단위 추적 & 계측 지점 (Per-request Trace & Instrumentation)
+# ==========================================
+
+class Trace:
+    """보고서 하나를 만드는 동안의 단계별 소요 시간과 사건입니다. activate(trace) 안에서 일어난 span/incr 이 모인다."""
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def as_metadata(self) -> Dict[str, Any]:
+        """보고서에 붙일 메타데이터: 단계별 밀리초와 사건 카운트."""
+        return {"spans_ms": {name: round(seconds * 1000.0, 3) for name, seconds in self.spans.items()},
+                "counters": dict(self.counters)}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("shinryeong_trace", default=None)
+
+
+class _Activation:
+    __slots__ = ("trace", "token")
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self.token = None
+
+    def __enter__(self) -> Trace:
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc) -> bool:
+        _current_trace.reset(self.token)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "began")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        seconds = time.perf_counter() - self.began
+        _registry.observe(self.name, seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans[self.name] = trace.spans.get(self.name, 0.0) + seconds
+        return False
+
+
+def span(name: str):
+    """with span("ganji"): … 로 단계 소요 시간을 잽니다. 계측이 꺼져 있으면 아무것도 하지 않는다."""
+    return _Span(name) if ENABLED else _NOOP_SPAN
+
+
+def incr(name: str, n: int = 1) -> None:
+    """사건 카운터를 올립니다. (캐시 적중, 지오코더 폴백, 진태양시 폴백 등)"""
+    if not ENABLED:
+        return
+    _registry.incr(name, n)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + n
+
+
+def new_trace() -> Optional[Trace]:
+    """계측이 켜져 있을 때만 Trace 를 만듭니다. (꺼져 있으면 None)"""
+    return Trace() if ENABLED else None
+
+
+def activate(trace: Optional[Trace]):
+    """with activate(trace): … 안의 span/incr 을 trace 에도 기록합니다. trace 가 None 이면 아무것도 하지 않는다."""
+    return _Activation(trace) if trace is not None else _NOOP_SPAN
+
+
+# ==========================================
+# 4. 내보내기 (Prometheus Text & Stats File)
+# ==========================================
+
+def _format_le(bound: float) -> str:
+    return repr(float(bound))
+
+
+def to_prometheus(snapshot: Optional[Dict[str, Any]] = None) -> str:
+    """통계를 Prometheus 텍스트 노출 형식(0.0.4)으로 만듭니다."""
+    snapshot = snapshot or _registry.snapshot()
+    bounds = snapshot.get("buckets", BUCKETS_SECONDS)
+    lines = [f"# HELP {METRIC_PREFIX}_stage_seconds 사주 계산 단계별 소요 시간",
+             f"# TYPE {METRIC_PREFIX}_stage_seconds histogram"]
+    for name in sorted(snapshot["stages"]):
+        data = snapshot["stages"][name]
+        cumulative = 0
+        for bound, n in zip(bounds, data["buckets"]):
+            cumulative += n
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{name}",le="{_format_le(bound)}"}} {cumulative}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {data["count"]}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {data["sum"]:.9f}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {data["count"]}')
+    lines += [f"# HELP {METRIC_PREFIX}_events_total 캐시 적중·폴백 등 사건 수",
+              f"# TYPE {METRIC_PREFIX}_events_total counter"]
+    for name in sorted(snapshot["counters"]):
+        lines.append(f'{METRIC_PREFIX}_events_total{{event="{name}"}} {snapshot["counters"][name]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_stats(path: str) -> None:
+    """누적 통계를 JSON 파일로 원자적으로 씁니다."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_registry.snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_stats(paths: Iterable[str]) -> Dict[str, Any]:
+    """여러 통계 파일(예: 워커별)을 합쳐 하나의 snapshot 으로 만듭니다."""
+    merged = Registry()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            merged.merge(json.load(f))
+    return merged.snapshot()
+
+
+def _write_stats_at_exit() -> None:
+    if ENABLED and STATS_PATH:
+        write_stats(STATS_PATH.format(pid=os.getpid()))
+
+
+atexit.register(_write_stats_at_exit)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("사용법: python metrics.py stats.json [stats2.json …]")
+    sys.stdout.write(to_prometheus(load_stats(sys.argv[1:])))
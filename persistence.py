@@ -0,0 +1,408 @@
+import os
+import sys
+import json
+import time
+import random
+import atexit
+import sqlite3
+import threading
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+import metrics
+from metrics import span
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+# 보고서와 세션(입력·보고서·대화)을 남기는 write-behind 저장 계층입니다.
+# 분석 요청 경로는 submit() 으로 메모리 버퍼에 넣고 곧바로 돌아가며, 백그라운드 스레드가 모아서 한꺼번에 쓴다.
+#   SHINRYEONG_PERSIST=sqlite:saju_db/sessions.sqlite   로컬 SQLite (기본값)
+#   SHINRYEONG_PERSIST=jsonl:sessions.jsonl             로컬 JSONL
+#   SHINRYEONG_PERSIST=gsheet:<스프레드시트 키>           Google Sheets (SHINRYEONG_GSHEET_CREDENTIALS=서비스 계정 JSON)
+#   SHINRYEONG_PERSIST=off                              저장하지 않음
+#   python persistence.py --selftest                    임시 폴더의 로컬 싱크로 재시도/백프레셔 점검
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SPEC = "sqlite:" + os.path.join(BASE_DIR, "saju_db", "sessions.sqlite")
+GSHEET_WORKSHEET = "records"
+GSHEET_CELL_LIMIT = 50000  # Google Sheets 셀 하나의 최대 글자 수
+
+MAX_BUFFER = 10000       # 버퍼가 차면 가장 오래된 기록부터 버린다 (요청 경로는 절대 기다리지 않는다)
+BATCH_SIZE = 200         # 한 번에 싱크로 보내는 최대 기록 수
+FLUSH_INTERVAL = 1.0     # 기록이 적어도 이 간격(초)마다는 내보낸다
+MAX_RETRIES = 5          # 같은 묶음을 이만큼 실패하면 dead letter 로 넘긴다
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    if hasattr(value, "item"):  # NumPy 스칼라
+        return value.item()
+    return str(value)
+
+
+def make_record(kind: str, session_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """저장 단위: {kind, session_id, created_at, payload}. payload 의 직렬화는 쓰기 스레드에서 한다."""
+    return {"kind": kind, "session_id": session_id, "created_at": datetime.now().isoformat(timespec="seconds"),
+            "payload": payload}
+
+
+def _row(record: Dict[str, Any]) -> List[str]:
+    payload = json.dumps(record["payload"], ensure_ascii=False, default=_json_default)
+    return [record["created_at"], record["kind"], record["session_id"], payload]
+
+
+# ==========================================
+# 2. 싱크 (Sinks)
+# ==========================================
+# 싱크는 write_batch(records) 하나만 구현하면 된다. 실패하면 예외를 던지고, 재시도는 WriteBehindWriter 몫이다.
+# 로컬 싱크는 세션 복원용 load_session(session_id) 도 제공한다.
+
+class JsonlSink:
+    """한 줄에 기록 하나씩 덧붙이는 로컬 파일 싱크입니다."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        lines = [json.dumps(record, ensure_ascii=False, default=_json_default) + "\n" for record in records]
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        latest = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if session_id not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # 쓰다 끊긴 마지막 줄
+                    continue
+                if record.get("kind") == "session" and record.get("session_id") == session_id:
+                    latest = record["payload"]
+        return latest
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSink:
+    """records 테이블에 executemany 로 한꺼번에 넣는 로컬 SQLite 싱크입니다."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "created_at TEXT NOT NULL, kind TEXT NOT NULL, session_id TEXT NOT NULL, payload TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_session ON records (session_id, kind)")
+        self._conn.commit()
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        rows = [_row(record) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO records (created_at, kind, session_id, payload) VALUES (?, ?, ?, ?)", rows)
+
+    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM records WHERE session_id = ? AND kind = 'session' "
+                                     "ORDER BY id DESC LIMIT 1", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class GSheetSink:
+    """Google Sheets 워크시트에 append_rows 로 묶어 쓰는 싱크입니다. (gspread 는 처음 쓸 때 불러온다)"""
+
+    def __init__(self, spreadsheet_key: str, credentials_path: Optional[str] = None,
+                 worksheet: str = GSHEET_WORKSHEET):
+        self.spreadsheet_key = spreadsheet_key
+        self.credentials_path = credentials_path or os.environ.get("SHINRYEONG_GSHEET_CREDENTIALS")
+        self.worksheet_name = worksheet
+        self._worksheet = None
+
+    def _open(self):
+        if self._worksheet is None:
+            import gspread
+
+            client = gspread.service_account(filename=self.credentials_path) if self.credentials_path \
+                else gspread.service_account()
+            spreadsheet = client.open_by_key(self.spreadsheet_key)
+            try:
+                self._worksheet = spreadsheet.worksheet(self.worksheet_name)
+            except gspread.WorksheetNotFound:
+                self._worksheet = spreadsheet.add_worksheet(self.worksheet_name, rows=1000, cols=4)
+                self._worksheet.append_row(["created_at", "kind", "session_id", "payload"])
+        return self._worksheet
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        rows = []
+        for record in records:
+            row = _row(record)
+            if len(row[3]) > GSHEET_CELL_LIMIT:
+                # 셀 한도를 넘는 보고서는 잘라 두고 표시만 남긴다 (원본은 로컬 싱크에)
+                row[3] = row[3][:GSHEET_CELL_LIMIT - 20] + " …(truncated)"
+            rows.append(row)
+        self._open().append_rows(rows, value_input_option="RAW")
+
+    def close(self) -> None:
+        self._worksheet = None
+
+
+def open_sink(spec: Optional[str] = None) -> Optional[Any]:
+    """'sqlite:경로' / 'jsonl:경로' / 'gsheet:키' / 'off' 로 싱크를 엽니다. (off 면 None)"""
+    spec = spec or os.environ.get("SHINRYEONG_PERSIST") or DEFAULT_SPEC
+    if spec == "off":
+        return None
+    scheme, _, target = spec.partition(":")
+    if scheme == "sqlite":
+        return SqliteSink(target)
+    if scheme == "jsonl":
+        return JsonlSink(target)
+    if scheme == "gsheet":
+        return GSheetSink(target)
+    raise ValueError(f"모르는 저장 방식이네: {spec}")
+
+
+# ==========================================
+# 3. Write-behind 큐 (Buffered Background Writer)
+# ==========================================
+
+class WriteBehindWriter:
+    """
+    제한된 메모리 버퍼 + 백그라운드 묶음 쓰기입니다.
+    submit() 은 잠금 한 번으로 끝나고, 버퍼가 차면 가장 오래된 기록을 버린다(persistence_dropped).
+    쓰기가 실패하면 지수 백오프(지터 포함)로 같은 묶음을 다시 시도하고, max_retries 번 실패하면
+    dead_letter(보통 로컬 JSONL 싱크)로 넘기거나 버린다.
+    """
+
+    def __init__(self, sink: Any, max_buffer: int = MAX_BUFFER, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, max_retries: int = MAX_RETRIES,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 dead_letter: Optional[Any] = None, sleep: Callable[[float], None] = time.sleep):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dead_letter = dead_letter
+        self._sleep = sleep
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self._in_flight: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._closing = False
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "retries": 0, "dead_lettered": 0, "batches": 0}
+        self._thread = threading.Thread(target=self._run, name="shinryeong-write-behind", daemon=True)
+        self._thread.start()
+
+    # --- 요청 경로 ---
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """기록을 버퍼에 넣습니다. 기다리지 않으며, 버퍼가 차서 오래된 기록을 밀어냈으면 False."""
+        with self._cond:
+            if self._closing:
+                return False
+            full = len(self._buffer) == self._buffer.maxlen
+            self._buffer.append(record)
+            self.stats["enqueued"] += 1
+            if full:
+                self.stats["dropped"] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        metrics.incr("persistence_enqueued")
+        if full:
+            metrics.incr("persistence_dropped")
+        return not full
+
+    def save_report(self, session_id: str, kind: str, user_data: Dict[str, Any], report: Dict[str, Any]) -> bool:
+        return self.submit(make_record(kind, session_id, {"user": user_data, "report": report}))
+
+    def save_session(self, session_id: str, snapshot: Dict[str, Any]) -> bool:
+        return self.submit(make_record("session", session_id, snapshot))
+
+    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """가장 최근 세션 스냅샷. 아직 버퍼에 있는 것이 먼저고, 없으면 싱크(로컬 싱크만 지원)에서 읽는다."""
+        with self._cond:
+            for record in reversed(list(self._in_flight) + list(self._buffer)):
+                if record["kind"] == "session" and record["session_id"] == session_id:
+                    return json.loads(json.dumps(record["payload"], ensure_ascii=False, default=_json_default))
+        loader = getattr(self.sink, "load_session", None)
+        return loader(session_id) if loader else None
+
+    # --- 백그라운드 ---
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._buffer and not self._closing:
+                    self._cond.wait(self.flush_interval)
+                if not self._buffer:
+                    if self._closing:
+                        return
+                    continue
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._in_flight = batch
+            self._write_with_retry(batch)
+            with self._cond:
+                self._in_flight = []
+                self._cond.notify_all()
+
+    def _write_with_retry(self, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("persistence_write"):
+                    self.sink.write_batch(batch)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+                metrics.incr("persistence_written", len(batch))
+                return
+            except Exception as exc:  # 싱크마다 예외 종류가 달라(gspread/sqlite/OSError) 모두 재시도 대상으로 본다
+                if attempt == self.max_retries:
+                    self._give_up(batch, exc)
+                    return
+                self.stats["retries"] += 1
+                metrics.incr("persistence_retry")
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                self._sleep(delay * (0.5 + random.random() / 2))
+
+    def _give_up(self, batch: List[Dict[str, Any]], exc: Exception) -> None:
+        if self.dead_letter is not None:
+            try:
+                self.dead_letter.write_batch(batch)
+                self.stats["dead_lettered"] += len(batch)
+                metrics.incr("persistence_dead_letter", len(batch))
+                return
+            except Exception:
+                pass
+        self.stats["dropped"] += len(batch)
+        metrics.incr("persistence_dropped", len(batch))
+        print(f"[persistence] 기록 {len(batch)}건을 쓰지 못해 버렸네: {exc}", file=sys.stderr)
+
+    # --- 마무리 ---
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """버퍼와 쓰는 중인 묶음이 모두 나갈 때까지 기다립니다. (시간 안에 비우면 True)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._buffer or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else self.flush_interval)
+                self._cond.notify()
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """남은 기록을 내보내고 쓰기 스레드를 멈춥니다."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        for sink in (self.sink, self.dead_letter):
+            if sink is not None:
+                sink.close()
+
+
+def open_writer(spec: Optional[str] = None, **kwargs: Any) -> Optional[WriteBehindWriter]:
+    """설정(SHINRYEONG_PERSIST)대로 싱크를 열고 write-behind 쓰기를 시작합니다. 종료 시 남은 기록을 내보낸다."""
+    sink = open_sink(spec)
+    if sink is None:
+        return None
+    if isinstance(sink, GSheetSink) and "dead_letter" not in kwargs:
+        # 네트워크 싱크가 끝내 실패한 묶음은 로컬 JSONL 에 남긴다
+        kwargs["dead_letter"] = JsonlSink(os.path.join(BASE_DIR, "saju_db", "persistence_dead_letter.jsonl"))
+    writer = WriteBehindWriter(sink, **kwargs)
+    atexit.register(writer.close)
+    return writer
+
+
+# ==========================================
+# 4. 자체 점검 (Self-test against Local Sinks)
+# ==========================================
+
+class _FlakySink:
+    """처음 fail_times 번은 실패하고 그 뒤로는 inner 싱크에 쓰는 점검용 싱크."""
+
+    def __init__(self, inner: Any, fail_times: int):
+        self.inner = inner
+        self.fail_times = fail_times
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise OSError("일부러 낸 쓰기 실패")
+        self.inner.write_batch(records)
+
+    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.inner.load_session(session_id)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def selftest() -> List[str]:
+    """임시 폴더의 SQLite/JSONL 싱크로 묶음 쓰기, 재시도, 버퍼 한도, dead letter, 세션 복원을 점검합니다."""
+    import tempfile
+
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make in (("sqlite", lambda: SqliteSink(os.path.join(tmp, "s.sqlite"))),
+                           ("jsonl", lambda: JsonlSink(os.path.join(tmp, "s.jsonl")))):
+            writer = WriteBehindWriter(_FlakySink(make(), fail_times=2), batch_size=50, flush_interval=0.05,
+                                       sleep=lambda _: None)
+            began = time.perf_counter()
+            for i in range(500):
+                writer.save_session(f"s{i % 5}", {"turn": i, "at": datetime(2024, 1, 1)})
+            submit_ms = (time.perf_counter() - began) * 1000
+            if not writer.flush(10):
+                problems.append(f"{name}: 버퍼를 비우지 못함")
+            if writer.stats["written"] != 500 or writer.stats["retries"] != 2:
+                problems.append(f"{name}: 기록/재시도 수가 다름 {writer.stats}")
+            restored = writer.load_session("s3")
+            if not restored or restored["turn"] != 498 or restored["at"] != "2024-01-01 00:00:00":
+                problems.append(f"{name}: 세션 복원 실패 {restored}")
+            writer.close()
+            if submit_ms > 100:
+                problems.append(f"{name}: submit 500건에 {submit_ms:.1f}ms (요청 경로가 기다림)")
+
+        # 버퍼 한도: 쓰기가 막혀 있어도 submit 은 기다리지 않고 오래된 것을 버린다
+        gate = threading.Event()
+        dead = JsonlSink(os.path.join(tmp, "dead.jsonl"))
+
+        class _BlockedSink:
+            def write_batch(self, records):
+                gate.wait(5)
+                raise OSError("막힌 싱크")
+
+            def close(self):
+                pass
+
+        writer = WriteBehindWriter(_BlockedSink(), max_buffer=100, batch_size=10, flush_interval=0.01,
+                                   max_retries=1, dead_letter=dead, sleep=lambda _: None)
+        accepted = sum(writer.submit(make_record("report", "x", {"i": i})) for i in range(1000))
+        gate.set()
+        writer.flush(10)
+        writer.close()
+        if accepted >= 1000 or writer.stats["dropped"] == 0:
+            problems.append(f"버퍼 한도가 지켜지지 않음 {writer.stats}")
+        with open(dead.path, encoding="utf-8") as f:
+            if sum(1 for _ in f) != writer.stats["dead_lettered"]:
+                problems.append("dead letter 기록 수가 다름")
+    return problems
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--selftest":
+        found = selftest()
+        print("\n".join(found) or "persistence 자체 점검 통과")
+        sys.exit(1 if found else 0)
+    sys.exit("사용법: python persistence.py --selftest")
@@ -0,0 +1,428 @@
+import os
+import sys
+import glob
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+from saju_chart import CHEONGAN, JIJI, OHENG, SIBSEONG_NAMES, PILLAR_COLUMNS, SajuChart
+from day_strength import STRENGTH_LABELS
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+# 회원 전체의 분포(일주 빈도, 오행 과다/고립 비율, 신살 보유율, 궁합 점수 분포)를 원본 보고서를 다시 훑지 않고
+# 볼 수 있도록, 보고서·배치 결과가 나올 때마다 고정 크기 NumPy 카운터에 더해 두는 선택 기능입니다.
+# 카운터는 더하기만 하므로 워커별로 따로 모았다가 파일 단위로 합치면 된다. (metrics.py 와 같은 방식)
+#   SHINRYEONG_POPSTATS=1                          집계 켜기 (또는 population_stats.enable())
+#   SHINRYEONG_POPSTATS_FILE=popstats-{pid}.json   워커별 집계 파일 ({pid} 치환, FLUSH_SECONDS 마다 + 종료 시 기록)
+#   python population_stats.py popstats-*.json     파일들을 합쳐 분포(JSON)로 출력 (--merge out.json 으로 합본 저장)
+#   python population_stats.py --selftest          샤드 합산 = 한 번에 집계, 단건 경로 = 배치 경로 확인
+# numpy 는 처음 집계할 때 불러온다 (saju_engine 이 표준 라이브러리만으로 import 되도록)
+#
+# 집계 단위는 '요청(보고서)'이다. 워커마다 최근 SEEN_SIZE 명의 회원 키(member_id/user_id, 없으면 출생 입력)를
+# 기억해 같은 사람의 재요청·화면 재실행은 repeats 로만 세므로 대부분의 중복은 빠지지만, 워커 사이나 기억 범위
+# 밖의 재방문까지 지우지는 못한다. 회원 전체를 정확히 한 번씩 세려면 회원 DB 로 배치(observe_frame)를 돌린다.
+ENABLED = os.environ.get("SHINRYEONG_POPSTATS", "0") == "1"
+STATS_PATH = os.environ.get("SHINRYEONG_POPSTATS_FILE")
+FLUSH_SECONDS = float(os.environ.get("SHINRYEONG_POPSTATS_FLUSH", "30"))
+SEEN_SIZE = int(os.environ.get("SHINRYEONG_POPSTATS_SEEN", "100000"))
+
+# 고정 구간 히스토그램. 구간이 다른 파일끼리는 합치지 않는다.
+ELEMENT_BIN_WIDTH = 0.5        # 가중 오행 카운트 0, 0.5, … 8 이상
+ELEMENT_BINS = 17
+STRENGTH_BIN_WIDTH = 0.05      # 일간 강약 점수 0~1
+STRENGTH_BINS = 20
+COMPAT_BIN_WIDTH = 5           # 궁합 점수 0~100 (마지막 칸이 100점)
+COMPAT_BINS = 21
+# analyze_ohang_imbalance 와 같은 과다/고립 기준 (계절 배율 없는 가중 카운트로 본다)
+EXCESS_COUNT = 3.5
+LACK_COUNT = 0.5
+
+LAYOUT = {"element": [ELEMENT_BIN_WIDTH, ELEMENT_BINS], "strength": [STRENGTH_BIN_WIDTH, STRENGTH_BINS],
+          "compat": [COMPAT_BIN_WIDTH, COMPAT_BINS]}
+# 카운터 이름 → 모양. 일주는 60갑자 인덱스, 십성은 일간을 뺀 7자리(천간 3 + 대표 지장간 4)
+COUNTERS = {
+    "day_pillar": (60,),
+    "element_hist": (len(OHENG), ELEMENT_BINS),
+    "element_excess": (len(OHENG),),
+    "element_lack": (len(OHENG),),
+    "sibseong": (len(SIBSEONG_NAMES),),
+    "strength_label": (len(STRENGTH_LABELS),),
+    "strength_score": (STRENGTH_BINS,),
+    "yongsin": (len(OHENG),),
+    "compat_score": (COMPAT_BINS,),
+}
+TOTALS = ("charts", "shinsal_charts", "pairs", "compat_unscored", "repeats")
+_OTHER_GAN = [0, 1, 3]  # 년·월·시 천간 (일간 자신은 언제나 비견이라 뺀다)
+
+
+def enable(flag: bool = True) -> None:
+    """실행 중에 집계를 켜거나 끕니다. (이미 쌓인 카운터는 그대로 둔다)"""
+    global ENABLED
+    ENABLED = flag
+
+
+def day_pillar_name(code: int) -> str:
+    return CHEONGAN[code % 10] + JIJI[code % 12]
+
+
+# ==========================================
+# 2. 누적 집계 (Mergeable Aggregates)
+# ==========================================
+
+class PopulationStats:
+    """회원 분포 카운터 묶음입니다. 모든 값이 개수의 합이라 merge() 는 더하기 한 번이다."""
+
+    def __init__(self):
+        import numpy as np
+
+        self._lock = threading.Lock()
+        self.arrays = {name: np.zeros(shape, dtype=np.int64) for name, shape in COUNTERS.items()}
+        self.totals = dict.fromkeys(TOTALS, 0)
+        # 신살은 DB 규칙(id)마다 늘어나므로 dict 로 센다
+        self.shinsal: Dict[str, int] = {}
+
+    # --- 단건 보고서 ---
+    def observe_chart(self, ganji_map: Any, strength: Optional[Dict[str, Any]] = None,
+                      shinsal_ids: Optional[Iterable[str]] = None) -> None:
+        """차트 하나를 더합니다. strength 는 StrengthProfile.as_dict(), shinsal_ids 는 발동한 규칙 id (없으면 건너뜀)."""
+        chart = SajuChart.from_ganji(ganji_map)
+        elements = chart.element_counts()
+        gan, ji = chart.sibseong_codes()
+        a = self.arrays
+        with self._lock:
+            self.totals["charts"] += 1
+            a["day_pillar"][chart.pillar(2)] += 1
+            for e, count in enumerate(elements):
+                a["element_hist"][e, min(int(count / ELEMENT_BIN_WIDTH), ELEMENT_BINS - 1)] += 1
+                if count >= EXCESS_COUNT:
+                    a["element_excess"][e] += 1
+                elif count <= LACK_COUNT:
+                    a["element_lack"][e] += 1
+            for code in [gan[i] for i in _OTHER_GAN] + list(ji):
+                a["sibseong"][code] += 1
+            if strength is not None:
+                a["strength_label"][STRENGTH_LABELS.index(strength["label"])] += 1
+                a["strength_score"][min(int(strength["score"] / STRENGTH_BIN_WIDTH), STRENGTH_BINS - 1)] += 1
+                a["yongsin"][OHENG.index(strength["yongsin"])] += 1
+            if shinsal_ids is not None:
+                self.totals["shinsal_charts"] += 1
+                for rule_id in shinsal_ids:
+                    self.shinsal[rule_id] = self.shinsal.get(rule_id, 0) + 1
+
+    # --- 배치 프레임 ---
+    def observe_frame(self, frame: Any, rules: Optional[List[Dict[str, Any]]] = None) -> None:
+        """saju_batch.compute_chart_frame 결과를 컬럼 단위로 더합니다. rules(신살 규칙)가 있으면 신살도 센다."""
+        import numpy as np
+
+        n = len(frame)
+        if n == 0:
+            return
+        stems = np.stack([frame[f'{c}_gan_code'].to_numpy(dtype=np.int64) for c in PILLAR_COLUMNS], axis=1)
+        branches = np.stack([frame[f'{c}_ji_code'].to_numpy(dtype=np.int64) for c in PILLAR_COLUMNS], axis=1)
+        elements = frame[[f'oheng_{elem}' for elem in OHENG]].to_numpy(dtype=np.float64)
+        sibseong = np.concatenate(
+            [frame[[f'{PILLAR_COLUMNS[i]}_sibseong_code' for i in _OTHER_GAN]].to_numpy(dtype=np.int64),
+             frame[[f'{c}_ji_sibseong_code' for c in PILLAR_COLUMNS]].to_numpy(dtype=np.int64)], axis=1)
+
+        day_codes = (6 * stems[:, 2] - 5 * branches[:, 2]) % 60
+        bins = np.minimum((elements / ELEMENT_BIN_WIDTH).astype(np.int64), ELEMENT_BINS - 1)
+        element_hist = np.stack([np.bincount(bins[:, e], minlength=ELEMENT_BINS) for e in range(len(OHENG))])
+        delta = {
+            "day_pillar": np.bincount(day_codes, minlength=60),
+            "element_hist": element_hist,
+            "element_excess": (elements >= EXCESS_COUNT).sum(axis=0),
+            "element_lack": (elements <= LACK_COUNT).sum(axis=0),
+            "sibseong": np.bincount(sibseong.ravel(), minlength=len(SIBSEONG_NAMES)),
+        }
+        if 'strength_code' in frame:
+            # 보고서(StrengthProfile.as_dict)와 같은 소수 셋째 자리 점수로 구간을 나눈다
+            scores = np.round(frame['strength_score'].to_numpy(dtype=np.float64), 3)
+            score_bins = np.minimum((scores / STRENGTH_BIN_WIDTH).astype(np.int64), STRENGTH_BINS - 1)
+            delta["strength_label"] = np.bincount(frame['strength_code'].to_numpy(dtype=np.int64),
+                                                  minlength=len(STRENGTH_LABELS))
+            delta["strength_score"] = np.bincount(score_bins, minlength=STRENGTH_BINS)
+            delta["yongsin"] = np.bincount(frame['yongsin_code'].to_numpy(dtype=np.int64), minlength=len(OHENG))
+        fired = None
+        if rules:
+            from shinsal_rules import get_ruleset
+
+            fired = get_ruleset(rules, "shinsal").evaluate_bulk(stems, branches, elements).sum(axis=0).tolist()
+        with self._lock:
+            self.totals["charts"] += n
+            for name, counts in delta.items():
+                self.arrays[name] += counts
+            if fired is not None:
+                self.totals["shinsal_charts"] += n
+                for rule, hits in zip(rules, fired):
+                    if hits:
+                        self.shinsal[rule["id"]] = self.shinsal.get(rule["id"], 0) + hits
+
+    # --- 궁합 ---
+    def observe_compatibility(self, score: Any) -> None:
+        """궁합 점수 하나를 더합니다. (DB 에 점수가 없는 조합은 개수만 센다)"""
+        with self._lock:
+            self.totals["pairs"] += 1
+            if not isinstance(score, (int, float)):
+                self.totals["compat_unscored"] += 1
+                return
+            self.arrays["compat_score"][min(max(int(score // COMPAT_BIN_WIDTH), 0), COMPAT_BINS - 1)] += 1
+
+    def observe_repeat(self) -> None:
+        """이미 센 회원(또는 궁합 쌍)의 재요청 한 건."""
+        with self._lock:
+            self.totals["repeats"] += 1
+
+    # --- 스냅샷 / 합치기 ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "layout": LAYOUT,
+                "totals": dict(self.totals),
+                "counters": {name: counts.tolist() for name, counts in self.arrays.items()},
+                "shinsal": dict(self.shinsal),
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """다른 워커의 snapshot() 을 더합니다. (구간 정의가 같아야 한다)"""
+        import numpy as np
+
+        if snapshot.get("layout", LAYOUT) != LAYOUT:
+            raise ValueError("히스토그램 구간이 다른 집계는 합칠 수 없네.")
+        with self._lock:
+            for name, n in snapshot.get("totals", {}).items():
+                self.totals[name] = self.totals.get(name, 0) + n
+            for name, counts in snapshot.get("counters", {}).items():
+                self.arrays[name] += np.asarray(counts, dtype=np.int64)
+            for rule_id, n in snapshot.get("shinsal", {}).items():
+                self.shinsal[rule_id] = self.shinsal.get(rule_id, 0) + n
+
+    def reset(self) -> None:
+        with self._lock:
+            for counts in self.arrays.values():
+                counts[:] = 0
+            self.totals = dict.fromkeys(TOTALS, 0)
+            self.shinsal.clear()
+
+
+_stats: Optional[PopulationStats] = None
+_stats_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def get_stats() -> PopulationStats:
+    """프로세스 전체 집계를 돌려줍니다. (처음 부를 때 만든다)"""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = PopulationStats()
+    return _stats
+
+
+# ==========================================
+# 3. 집계 지점 (Observation Hooks)
+# ==========================================
+# 엔진 쪽에서는 `if population_stats.ENABLED:` 로 감싸 부르므로, 꺼져 있으면 비용이 없다.
+
+def _maybe_flush() -> None:
+    global _last_flush
+    if STATS_PATH and time.monotonic() - _last_flush >= FLUSH_SECONDS:
+        _last_flush = time.monotonic()
+        write_stats(STATS_PATH.format(pid=os.getpid()))
+
+
+_seen: "OrderedDict[str, None]" = OrderedDict()
+_seen_lock = threading.Lock()
+
+
+def member_key(user_data: Dict[str, Any]) -> str:
+    """회원 식별 키: member_id/user_id 가 있으면 그것, 없으면 출생 입력(시각·도시·성별·음력 여부)."""
+    member = user_data.get('member_id', user_data.get('user_id'))
+    if member is not None:
+        return f"id:{member}"
+    return "|".join(str(user_data.get(k, '')) for k in ('birth_dt', 'city', 'gender', 'is_lunar', 'is_leap_month',
+                                                         'lunar_date'))
+
+
+def _first_seen(key: str) -> bool:
+    """최근 SEEN_SIZE 개 키 안에 없으면 기억하고 True."""
+    with _seen_lock:
+        if key in _seen:
+            _seen.move_to_end(key)
+            return False
+        _seen[key] = None
+        if len(_seen) > SEEN_SIZE:
+            _seen.popitem(last=False)
+        return True
+
+
+def observe_report(report: Dict[str, Any], db: Dict) -> None:
+    """보고서(SajuReportStream.report) 하나를 더합니다. 신살은 DB 규칙을 직접 평가한다. (문구 유무와 무관하게 센다)
+    같은 회원이 최근에 이미 세졌으면 repeats 만 올린다."""
+    from shinsal_rules import get_ruleset
+
+    if not _first_seen(member_key(report.get("user") or {})):
+        get_stats().observe_repeat()
+        _maybe_flush()
+        return
+    ganji_map = report["saju"]
+    rules = db.get('shinsal', {}).get('rules', [])
+    fired = [rule["id"] for rule in get_ruleset(rules, "shinsal").evaluate(ganji_map)] if rules else None
+    get_stats().observe_chart(ganji_map, report.get("strength"), fired)
+    _maybe_flush()
+
+
+def observe_frame(frame: Any, db: Optional[Dict] = None) -> None:
+    """배치 차트 프레임 하나를 더합니다. db 가 없으면(차트만 계산) 신살은 세지 않는다."""
+    rules = db.get('shinsal', {}).get('rules', []) if db is not None else None
+    get_stats().observe_frame(frame, rules)
+    _maybe_flush()
+
+
+def observe_compatibility(score: Any, user_a: Optional[Dict[str, Any]] = None,
+                          user_b: Optional[Dict[str, Any]] = None) -> None:
+    """궁합 점수 하나를 더합니다. 두 사람이 주어지면 같은 쌍(순서 무관)의 재요청은 repeats 로만 센다."""
+    if user_a is not None and user_b is not None:
+        pair = "&".join(sorted((member_key(user_a), member_key(user_b))))
+        if not _first_seen(f"pair:{pair}"):
+            get_stats().observe_repeat()
+            _maybe_flush()
+            return
+    get_stats().observe_compatibility(score)
+    _maybe_flush()
+
+
+# ==========================================
+# 4. 저장 & 분포 (Persistence & Distributions)
+# ==========================================
+
+def write_stats(path: str, snapshot: Optional[Dict[str, Any]] = None) -> None:
+    """집계를 JSON 파일로 원자적으로 씁니다."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot or get_stats().snapshot(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_stats(paths: Iterable[str]) -> Dict[str, Any]:
+    """여러 집계 파일(워커별)을 합쳐 하나의 snapshot 으로 만듭니다."""
+    merged = PopulationStats()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            merged.merge(json.load(f))
+    return merged.snapshot()
+
+
+def shard_paths(pattern: Optional[str] = None) -> List[str]:
+    """SHINRYEONG_POPSTATS_FILE 의 {pid} 를 * 로 바꿔 워커별 집계 파일을 찾습니다."""
+    pattern = pattern or STATS_PATH
+    return sorted(glob.glob(pattern.replace("{pid}", "*"))) if pattern else []
+
+
+def _rates(counts: List[int], total: int, names: List[str]) -> Dict[str, float]:
+    return {name: round(n / total, 6) if total else 0.0 for name, n in zip(names, counts)}
+
+
+def _bin_labels(width: float, bins: int) -> List[str]:
+    return [f"{i * width:g}-{(i + 1) * width:g}" for i in range(bins - 1)] + [f"{(bins - 1) * width:g}+"]
+
+
+def distributions(snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """대시보드용 분포: 일주 빈도, 오행 과다/고립 비율과 구간 분포, 십성 비중, 강약·용신, 신살 보유율, 궁합 점수 분포."""
+    snapshot = snapshot or get_stats().snapshot()
+    totals, counters = snapshot["totals"], snapshot["counters"]
+    charts = totals["charts"]
+    element_labels = _bin_labels(ELEMENT_BIN_WIDTH, ELEMENT_BINS)
+    return {
+        "unit": "request",  # 최근 재요청은 뺀 요청 단위 (맨 위 설명 참고)
+        "charts": charts,
+        "pairs": totals["pairs"],
+        "repeats": totals.get("repeats", 0),
+        "day_pillar": {day_pillar_name(code): n for code, n in enumerate(counters["day_pillar"])},
+        "element_excess_rate": _rates(counters["element_excess"], charts, OHENG),
+        "element_lack_rate": _rates(counters["element_lack"], charts, OHENG),
+        "element_hist": {elem: dict(zip(element_labels, row)) for elem, row in zip(OHENG, counters["element_hist"])},
+        "sibseong_share": _rates(counters["sibseong"], sum(counters["sibseong"]), SIBSEONG_NAMES),
+        "strength_label": dict(zip(STRENGTH_LABELS, counters["strength_label"])),
+        "strength_score": dict(zip(_bin_labels(STRENGTH_BIN_WIDTH, STRENGTH_BINS), counters["strength_score"])),
+        "yongsin": dict(zip(OHENG, counters["yongsin"])),
+        "shinsal_prevalence": {rule_id: round(n / totals["shinsal_charts"], 6)
+                               for rule_id, n in sorted(snapshot["shinsal"].items())} if totals["shinsal_charts"] else {},
+        "compat_score": dict(zip(_bin_labels(COMPAT_BIN_WIDTH, COMPAT_BINS)[:-1] + ["100"], counters["compat_score"])),
+        "compat_unscored": totals["compat_unscored"],
+    }
+
+
+def _write_stats_at_exit() -> None:
+    if ENABLED and STATS_PATH and _stats is not None:
+        write_stats(STATS_PATH.format(pid=os.getpid()))
+
+
+atexit.register(_write_stats_at_exit)
+
+
+# ==========================================
+# 5. 자체 점검 (Self-check)
+# ==========================================
+
+def selftest(n: int = 4000, shards: int = 4, seed: int = 7) -> Dict[str, Any]:
+    """무작위 출생 기록으로 (1) 샤드별 집계를 합친 결과가 한 번에 집계한 결과와 같은지,
+    (2) 단건 경로(observe_chart)가 배치 경로(observe_frame)와 같은 카운트를 내는지 확인합니다."""
+    import numpy as np
+    import pandas as pd
+    from db_bundle import load_bundle
+    from saju_batch import compute_chart_frame, _frame_reports
+    from saju_engine import calculate_strength
+    from shinsal_rules import get_ruleset
+
+    db = load_bundle()
+    rules = db.get('shinsal', {}).get('rules', [])
+    rng = np.random.default_rng(seed)
+    births = np.datetime64('1950-01-01T00:00') + rng.integers(0, 70 * 365 * 1440, n).astype('timedelta64[m]')
+    frame = compute_chart_frame(pd.DataFrame({"birth_dt": births, "city": "Seoul"}))
+
+    whole = PopulationStats()
+    whole.observe_frame(frame, rules)
+    merged = PopulationStats()
+    for part in np.array_split(np.arange(n), shards):
+        shard = PopulationStats()
+        shard.observe_frame(frame.iloc[part], rules)
+        merged.merge(json.loads(json.dumps(shard.snapshot())))
+
+    single = PopulationStats()
+    for report in _frame_reports(frame, None):
+        chart = report["saju"]
+        fired = [rule["id"] for rule in get_ruleset(rules, "shinsal").evaluate(chart)]
+        single.observe_chart(chart, calculate_strength(chart, report["true_solar_dt"]).as_dict(), fired)
+    scores = rng.integers(40, 101, 500).tolist() + ['??'] * 3
+    for score in scores:
+        whole.observe_compatibility(score)
+        single.observe_compatibility(score)
+        merged.observe_compatibility(score)
+
+    reference = whole.snapshot()
+    return {"charts": n, "shards": shards,
+            "merge_equal": merged.snapshot() == reference,
+            "single_equal": single.snapshot() == reference}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--selftest"]:
+        result = selftest()
+        print(json.dumps(result, ensure_ascii=False))
+        sys.exit(0 if result["merge_equal"] and result["single_equal"] else 1)
+    out_path = None
+    if args[:1] == ["--merge"] and len(args) >= 2:
+        out_path, args = args[1], args[2:]
+    paths = args or shard_paths()
+    if not paths:
+        sys.exit("사용법: python population_stats.py [--merge out.json] popstats-*.json | --selftest")
+    snapshot = load_stats(paths)
+    if out_path:
+        write_stats(out_path, snapshot)
+    print(json.dumps(distributions(snapshot), ensure_ascii=False, indent=2))
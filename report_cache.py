@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+import metrics
+from saju_chart import PILLAR_KEYS
+
+# ==========================================
+# 1. 정규화된 차트 키 (Canonical Chart Key)
+# ==========================================
+def chart_key(ganji_map: Dict[str, str], gender: Optional[str], analysis_year: int, birth_year: int,
+              luck_start: Optional[int] = None, month_phase: Optional[int] = None,
+              daewoon: Optional[int] = None) -> str:
+    """
+    이름/도시와 무관하게 분석 결과를 결정하는 입력만으로 키를 만듭니다.
+    사주 8글자 + 성별 + 분석 연도 + 나이(생애 주기 분석용; 같은 8글자는 60년에 한 번만 반복되므로 적중률 손실은 없다)
+    + 대운수(절입일까지의 거리로 정해지며, 같은 8글자라도 다를 수 있다)
+    + 월지 사령 단계(절입 후 경과 일수로 정해지며, 일간 강약과 용신을 바꾼다)
+    + 지금 몇 번째 대운인지(생일과 대운수로 정해지며 해 중간에도 바뀐다; 운세 흐름 문구가 달라진다).
+    """
+    chart = "".join(ganji_map[key] for key in PILLAR_KEYS)
+    key = f"{chart}|{gender or '-'}|{analysis_year}|{analysis_year - birth_year}"
+    if luck_start is not None:
+        key = f"{key}|{luck_start}"
+    if month_phase is not None:
+        key = f"{key}|p{month_phase}"
+    return key if daewoon is None else f"{key}|d{daewoon}"
+
+
+def _digest(key: str, db_hash: str) -> str:
+    """디스크 저장소용 내용 주소: (차트 키, DB 번들 해시)의 SHA-256."""
+    return hashlib.sha256(f"{key}|{db_hash}".encode("utf-8")).hexdigest()
+
+
+# ==========================================
+# 2. 2단 캐시 (In-process LRU + SQLite)
+# ==========================================
+
+class ReportCache:
+    """메모리 LRU 뒤에 선택적인 SQLite 저장소를 둔 보고서 캐시입니다."""
+
+    def __init__(self, maxsize: int = 2048, disk_path: Optional[str] = None):
+        self.maxsize = maxsize
+        # digest → (db_hash, value): db_hash 로 특정 버전의 항목만 골라 지울 수 있게 한다
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.db_hash: Optional[str] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports (digest TEXT PRIMARY KEY, db_hash TEXT NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_db_hash ON reports (db_hash)")
+            self._conn.commit()
+
+    def get(self, key: str, db_hash: str) -> Optional[Any]:
+        digest = _digest(key, db_hash)
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                self.stats["memory_hits"] += 1
+                metrics.incr("report_cache_memory_hit")
+                return self._memory[digest][1]
+            if self._conn is not None:
+                row = self._conn.execute("SELECT payload FROM reports WHERE digest = ?", (digest,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(digest, db_hash, value)
+                    self.stats["disk_hits"] += 1
+                    metrics.incr("report_cache_disk_hit")
+                    return value
+            self.stats["misses"] += 1
+            metrics.incr("report_cache_miss")
+            return None
+
+    def put(self, key: str, db_hash: str, value: Any) -> None:
+        digest = _digest(key, db_hash)
+        with self._lock:
+            self._remember(digest, db_hash, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO reports (digest, db_hash, payload) VALUES (?, ?, ?)",
+                    (digest, db_hash, json.dumps(value, ensure_ascii=False)),
+                )
+                self._conn.commit()
+
+    def _remember(self, digest: str, db_hash: str, value: Any) -> None:
+        self._memory[digest] = (db_hash, value)
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, keep_db_hash: Optional[str] = None) -> None:
+        """메모리 캐시를 비우고, 디스크에서는 keep_db_hash 가 아닌 항목(없으면 전부)을 지웁니다."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                if keep_db_hash is None:
+                    self._conn.execute("DELETE FROM reports")
+                else:
+                    self._conn.execute("DELETE FROM reports WHERE db_hash != ?", (keep_db_hash,))
+                self._conn.commit()
+
+    def drop(self, db_hashes: Iterable[str]) -> int:
+        """주어진 버전 해시로 만든 항목만 지웁니다. (핫 리로드로 바뀐 섹션에 기대는 항목) 지운 메모리 항목 수를 돌려준다."""
+        db_hashes = set(db_hashes)
+        with self._lock:
+            stale = [digest for digest, (db_hash, _) in self._memory.items() if db_hash in db_hashes]
+            for digest in stale:
+                del self._memory[digest]
+            if self._conn is not None and db_hashes:
+                self._conn.executemany("DELETE FROM reports WHERE db_hash = ?", [(h,) for h in db_hashes])
+                self._conn.commit()
+        return len(stale)
+
+    def retain(self, db_hashes: Iterable[str]) -> None:
+        """주어진 버전 해시가 아닌 항목을 모두 지웁니다. (시작할 때 예전 DB 로 만든 디스크 항목 정리)"""
+        db_hashes = set(db_hashes)
+        with self._lock:
+            for digest in [d for d, (db_hash, _) in self._memory.items() if db_hash not in db_hashes]:
+                del self._memory[digest]
+            if self._conn is not None:
+                marks = ",".join("?" * len(db_hashes))
+                self._conn.execute(f"DELETE FROM reports WHERE db_hash NOT IN ({marks})", tuple(db_hashes))
+                self._conn.commit()
+
+    def bind(self, db_hash: str) -> None:
+        """현재 DB 번들 해시를 알려줍니다. 해시가 바뀌었으면 이전 DB로 만든 항목을 명시적으로 무효화합니다."""
+        if db_hash != self.db_hash:
+            self.invalidate(keep_db_hash=db_hash)
+            self.db_hash = db_hash
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
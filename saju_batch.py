@@ -0,0 +1,200 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from manse_calendar import get_calendar, lookup_pillars_bulk, DEFAULT_UTC_OFFSET
+from lunar_calendar import get_lunar_calendar
+from solar_time import true_solar_time_bulk, korea_utc_offsets, utc_offset_hours, KOREA_TIMEZONES
+from metrics import span
+import population_stats
+from saju_chart import CHEONGAN, JIJI, OHENG, SIBSEONG_NAMES, PILLAR_COLUMNS, SIBSEONG_LUT, BRANCH_HIDDEN_STEMS
+from saju_engine import get_location_info, build_analytics
+from day_strength import month_phase_bulk, strength_bulk
+import saju_chart
+
+# ==========================================
+# 1. 배치 처리 (Batch Processing)
+# ==========================================
+# NumPy/pandas 를 쓰는 대량 처리 경로입니다. saju_engine 은 표준 라이브러리만으로 가져올 수 있어야 하므로
+# 여기로 떼어 두고, saju_engine.process_saju_batch 등은 처음 쓸 때 이 모듈을 불러온다.
+# 천간/지지/오행/십성을 작은 정수로 부호화하고, saju_chart 의 평탄화 테이블을 NumPy 조회 배열로 본다.
+STEM_ELEMENT = np.frombuffer(saju_chart.STEM_ELEMENT, dtype=np.int8)
+BRANCH_ELEMENT = np.frombuffer(saju_chart.BRANCH_ELEMENT, dtype=np.int8)
+# 지장간 첫 글자(대표 지장간)의 천간 코드
+BRANCH_MAIN_HIDDEN = np.array([hidden[0] for hidden in BRANCH_HIDDEN_STEMS], dtype=np.int8)
+# SIBSEONG_TABLE[일간, 대상 천간] → 십성 코드
+SIBSEONG_TABLE = np.frombuffer(SIBSEONG_LUT, dtype=np.int8).reshape(10, 10)
+STEM_ELEMENT_WEIGHTS = np.array(saju_chart.STEM_ELEMENT_WEIGHTS, dtype=np.float32)
+BRANCH_ELEMENT_WEIGHTS = np.array(saju_chart.BRANCH_ELEMENT_WEIGHTS, dtype=np.float32)
+
+
+def encode_pillars(pillars: np.ndarray) -> Dict[str, np.ndarray]:
+    """(n, 4) 육십갑자 인덱스 배열을 천간/지지 코드 배열 두 개(각 (n, 4))로 나눕니다."""
+    pillars = pillars.astype(np.int16)
+    return {"stems": (pillars % 10).astype(np.int8), "branches": (pillars % 12).astype(np.int8)}
+
+
+def calculate_sibseong_bulk(stems: np.ndarray, branches: np.ndarray) -> Dict[str, np.ndarray]:
+    """calculate_sibseong 의 벡터 버전. 천간 십성과 지장간(대표) 십성 코드를 (n, 4) 배열로 돌려줍니다."""
+    day = stems[:, 2:3]
+    return {"gan": SIBSEONG_TABLE[day, stems], "ji": SIBSEONG_TABLE[day, BRANCH_MAIN_HIDDEN[branches]]}
+
+
+def calculate_five_elements_bulk(stems: np.ndarray, branches: np.ndarray) -> np.ndarray:
+    """calculate_five_elements_count 의 벡터 버전. (n, 5) 가중 오행 카운트(목화토금수 순)."""
+    return STEM_ELEMENT_WEIGHTS[stems].sum(axis=1) + BRANCH_ELEMENT_WEIGHTS[branches].sum(axis=1)
+
+
+def _iter_record_frames(records: Any, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """DataFrame / JSONL 경로 / dict 이터러블을 chunk_size 단위 DataFrame 으로 잘라 흘려보냅니다."""
+    if isinstance(records, pd.DataFrame):
+        for start in range(0, len(records), chunk_size):
+            yield records.iloc[start:start + chunk_size]
+    elif isinstance(records, (str, os.PathLike)):
+        with pd.read_json(records, lines=True, chunksize=chunk_size, dtype=False) as reader:
+            for frame in reader:
+                yield frame
+    else:
+        chunk: List[Dict[str, Any]] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk)
+
+
+def compute_chart_frame(frame: pd.DataFrame, allow_network: Optional[bool] = None) -> pd.DataFrame:
+    """출생 기록 DataFrame(birth_dt, city …)에 진태양시·사주 코드·십성·오행·일간 강약 컬럼을 붙입니다.
+    allow_network=False 면 지명 사전에 없는 도시를 Nominatim 으로 찾지 않고 진태양시 보정 없이(미보정 경로) 둔다."""
+    n = len(frame)
+    birth = pd.to_datetime(frame['birth_dt']).to_numpy(dtype='datetime64[s]')
+    if 'is_lunar' in frame:
+        # 음력 행은 날짜만 양력으로 바꾸고 시각은 그대로 둔다
+        lunar = frame['is_lunar'].fillna(False).to_numpy(dtype=bool)
+        if lunar.any():
+            leap = frame['is_leap_month'].fillna(False).to_numpy(dtype=bool)[lunar] if 'is_leap_month' in frame \
+                else False
+            days = pd.DatetimeIndex(birth[lunar])
+            solar_days = get_lunar_calendar().to_solar_bulk(days.year, days.month, days.day, leap)
+            birth = birth.copy()
+            birth[lunar] = solar_days + (birth[lunar] - birth[lunar].astype('datetime64[D]'))
+    cities = frame['city'].fillna('Seoul') if 'city' in frame else pd.Series(['Seoul'] * n, index=frame.index)
+
+    # 도시는 고유값만 조회한다 (지명 사전 + LRU 캐시)
+    locations = {city: get_location_info(city, allow_network) for city in pd.unique(cities)}
+    longitude = np.array([(locations[c] or {}).get('longitude', np.nan) for c in cities], dtype=np.float64)
+    tz_names = [(locations[c] or {}).get('timezone_str') for c in cities]
+    located = ~np.isnan(longitude)
+
+    utc_offsets = korea_utc_offsets(birth)
+    for i, tz_name in enumerate(tz_names):
+        if located[i] and tz_name and tz_name not in KOREA_TIMEZONES:
+            utc_offsets[i] = utc_offset_hours(birth[i].astype(datetime), tz_name)
+    solar = np.where(located, true_solar_time_bulk(birth, np.nan_to_num(longitude), utc_offsets), birth)
+    term_offsets = np.where(located, longitude / 15.0, DEFAULT_UTC_OFFSET)
+
+    codes = encode_pillars(lookup_pillars_bulk(solar, term_offsets))
+    stems, branches = codes['stems'], codes['branches']
+    sibseong = calculate_sibseong_bulk(stems, branches)
+    elements = calculate_five_elements_bulk(stems, branches)
+    # 사령 단계는 단건 경로(luck_timeline.month_elapsed_days)와 같게 한국 표준시 기준 + 월지 맞춤으로 본다
+    elapsed = get_calendar().month_elapsed_bulk(solar, DEFAULT_UTC_OFFSET, branches[:, 1])
+    phases = month_phase_bulk(branches[:, 1], elapsed)
+    strength = strength_bulk(stems, branches, phases)
+
+    out = frame.copy()
+    out['true_solar_dt'] = solar
+    for col, column in enumerate(PILLAR_COLUMNS):
+        out[f'{column}_gan_code'] = stems[:, col]
+        out[f'{column}_ji_code'] = branches[:, col]
+        out[f'{column}_sibseong_code'] = sibseong['gan'][:, col]
+        out[f'{column}_ji_sibseong_code'] = sibseong['ji'][:, col]
+    for e, elem in enumerate(OHENG):
+        out[f'oheng_{elem}'] = elements[:, e]
+    # 강약 등급은 day_strength.STRENGTH_LABELS, 용신은 OHENG 인덱스
+    out['month_phase'] = phases.astype(np.int8)
+    out['strength_score'] = strength['score'].astype(np.float32)
+    out['strength_code'] = strength['label'].astype(np.int8)
+    out['yongsin_code'] = strength['yongsin'].astype(np.int8)
+    return out
+
+
+def _frame_reports(frame: pd.DataFrame, db: Optional[Dict]) -> Iterator[Dict[str, Any]]:
+    """compute_chart_frame 결과를 process_saju_input 과 같은 모양의 보고서로 복원합니다. (컬럼 단위 디코딩)"""
+    stem_names, branch_names, sibseong_names = np.array(CHEONGAN), np.array(JIJI), np.array(SIBSEONG_NAMES)
+    columns: Dict[str, List[Any]] = {}
+    for column in PILLAR_COLUMNS:
+        columns[f'{column}_gan'] = stem_names[frame[f'{column}_gan_code'].to_numpy()].tolist()
+        columns[f'{column}_ji'] = branch_names[frame[f'{column}_ji_code'].to_numpy()].tolist()
+        columns[f'sib_{column}_gan'] = sibseong_names[frame[f'{column}_sibseong_code'].to_numpy()].tolist()
+        columns[f'sib_{column}_ji_sibseong'] = sibseong_names[frame[f'{column}_ji_sibseong_code'].to_numpy()].tolist()
+    elements = frame[[f'oheng_{elem}' for elem in OHENG]].to_numpy(dtype=np.float64).tolist()
+    solar_dts = frame['true_solar_dt'].dt.to_pydatetime().tolist()
+    names = frame['name'].tolist() if 'name' in frame else [None] * len(frame)
+    genders = frame['gender'].tolist() if 'gender' in frame else [None] * len(frame)
+
+    ganji_keys = [f'{column}_{part}' for column in PILLAR_COLUMNS for part in ('gan', 'ji')]
+    sibseong_keys = [f'{column}_{part}' for column in PILLAR_COLUMNS for part in ('gan', 'ji_sibseong')]
+    for i, true_solar_dt in enumerate(solar_dts):
+        ganji_map = {key: columns[key][i] for key in ganji_keys}
+        sibseong_map = {key: columns[f'sib_{key}'][i] for key in sibseong_keys}
+        five_elements_count = dict(zip(OHENG, elements[i]))
+        report: Dict[str, Any] = {
+            "name": names[i],
+            "true_solar_dt": true_solar_dt,
+            "saju": ganji_map,
+            "sibseong": sibseong_map,
+            "five_elements": five_elements_count,
+        }
+        if db is not None:
+            report['analytics'] = build_analytics(ganji_map, sibseong_map, five_elements_count, true_solar_dt, db,
+                                                  genders[i])
+        yield report
+
+
+def require_pyarrow() -> Tuple[Any, Any]:
+    """Parquet 출력용 (pyarrow, pyarrow.parquet). 설치돼 있지 않으면 무엇이 필요한지 알려 준다."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet 출력에는 pyarrow 가 필요하네. (pip install pyarrow 또는 requirements.txt)") from exc
+    return pa, pq
+
+
+def _timed_chart_frame(frame: pd.DataFrame, db: Optional[Dict] = None) -> pd.DataFrame:
+    with span("batch_chart_frame"):
+        frame = compute_chart_frame(frame)
+    if population_stats.ENABLED:
+        # 청크 하나를 컬럼 단위로 분포 집계에 더한다 (db 가 없으면 신살은 빼고)
+        population_stats.observe_frame(frame, db)
+    return frame
+
+
+def process_saju_batch(records: Any, db: Optional[Dict] = None, output_path: Optional[str] = None,
+                       chunk_size: int = 10000) -> Any:
+    """
+    대량 출생 기록(DataFrame, JSONL 경로, dict 이터러블)을 청크 단위로 벡터화하여 분석합니다.
+    output_path 가 없으면 보고서 dict 를 하나씩 내보내는 제너레이터를, '.parquet' 경로가 주어지면
+    차트 컬럼을 Parquet 파일로 흘려 쓰고 그 경로를 돌려줍니다. (db 를 주면 분석 문구까지 생성)
+    """
+    frames = (_timed_chart_frame(frame, db) for frame in _iter_record_frames(records, chunk_size))
+    if output_path is None:
+        return (report for frame in frames for report in _frame_reports(frame, db))
+
+    pa, pq = require_pyarrow()
+    writer = None
+    try:
+        for frame in frames:
+            frame = frame.assign(birth_dt=pd.to_datetime(frame['birth_dt']))
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return output_path
@@ -0,0 +1,217 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+# ==========================================
+# 1. 상수 및 기본 맵핑 (Constants & Maps)
+# ==========================================
+CHEONGAN = ["갑", "을", "병", "정", "무", "기", "경", "신", "임", "계"]
+JIJI = ["자", "축", "인", "묘", "진", "사", "오", "미", "신", "유", "술", "해"]
+OHENG_MAP = {
+    '갑': '목', '을': '목', '병': '화', '정': '화', '무': '토', '기': '토', 
+    '경': '금', '신': '금', '임': '수', '계': '수',
+    '인': '목', '묘': '목', '사': '화', '오': '화', '진': '토', '술': '토', '축': '토', '미': '토',
+    '신': '금', '유': '금', '해': '수', '자': '수'
+}
+JIJANGGAN = {
+    '자': ['임', '계'], '축': ['계', '신', '기'], '인': ['무', '병', '갑'], 
+    '묘': ['갑', '을'], '진': ['을', '계', '무'], '사': ['무', '경', '병'],
+    '오': ['병', '기', '정'], '미': ['정', '을', '기'], '신': ['경', '임', '무'], 
+    '유': ['경', '신'], '술': ['신', '정', '무'], '해': ['무', '갑', '임']
+}
+SIBSEONG_MAP = {
+    # 십성 맵핑 전체 (Day Gan : Target Gan)
+    ('갑', '갑'): '비견', ('갑', '을'): '겁재', ('갑', '병'): '식신', ('갑', '정'): '상관', ('갑', '무'): '편재',
+    ('갑', '기'): '정재', ('갑', '경'): '편관', ('갑', '신'): '정관', ('갑', '임'): '편인', ('갑', '계'): '정인',
+    ('을', '갑'): '겁재', ('을', '을'): '비견', ('을', '병'): '상관', ('을', '정'): '식신', ('을', '무'): '정재',
+    ('을', '기'): '편재', ('을', '경'): '정관', ('을', '신'): '편관', ('을', '임'): '정인', ('을', '계'): '편인',
+    ('병', '갑'): '편인', ('병', '을'): '정인', ('병', '병'): '비견', ('병', '정'): '겁재', ('병', '무'): '식신',
+    ('병', '기'): '상관', ('병', '경'): '편재', ('병', '신'): '정재', ('병', '임'): '편관', ('병', '계'): '정관',
+    ('정', '갑'): '정인', ('정', '을'): '편인', ('정', '병'): '겁재', ('정', '정'): '비견', ('정', '무'): '상관',
+    ('정', '기'): '식신', ('정', '경'): '정재', ('정', '신'): '편재', ('정', '임'): '정관', ('정', '계'): '편관',
+    ('무', '갑'): '편관', ('무', '을'): '정관', ('무', '병'): '편인', ('무', '정'): '정인', ('무', '무'): '비견',
+    ('무', '기'): '겁재', ('무', '경'): '식신', ('무', '신'): '상관', ('무', '임'): '편재', ('무', '계'): '정재',
+    ('기', '갑'): '정관', ('기', '을'): '편관', ('기', '병'): '정인', ('기', '정'): '편인', ('기', '무'): '겁재',
+    ('기', '기'): '비견', ('기', '경'): '상관', ('기', '신'): '식신', ('기', '임'): '정재', ('기', '계'): '편재',
+    ('경', '갑'): '편재', ('경', '을'): '정재', ('경', '병'): '편관', ('경', '정'): '정관', ('경', '무'): '편인',
+    ('경', '기'): '정인', ('경', '경'): '비견', ('경', '신'): '겁재', ('경', '임'): '식신', ('경', '계'): '상관',
+    ('신', '갑'): '정재', ('신', '을'): '편재', ('신', '병'): '정관', ('신', '정'): '편관', ('신', '무'): '정인',
+    ('신', '기'): '편인', ('신', '경'): '겁재', ('신', '신'): '비견', ('신', '임'): '상관', ('신', '계'): '식신',
+    ('임', '갑'): '식신', ('임', '을'): '상관', ('임', '병'): '편재', ('임', '정'): '정재', ('임', '무'): '편관',
+    ('임', '기'): '정관', ('임', '경'): '편인', ('임', '신'): '정인', ('임', '임'): '비견', ('임', '계'): '겁재',
+    ('계', '갑'): '상관', ('계', '을'): '식신', ('계', '병'): '정재', ('계', '정'): '편재', ('계', '무'): '정관',
+    ('계', '기'): '편관', ('계', '경'): '정인', ('계', '신'): '편인', ('계', '임'): '겁재', ('계', '계'): '비견',
+}
+
+OHENG = ['목', '화', '토', '금', '수']
+SIBSEONG_NAMES = ['비견', '겁재', '식신', '상관', '편재', '정재', '편관', '정관', '편인', '정인']
+PILLAR_COLUMNS = ['year', 'month', 'day', 'time']
+PILLAR_KEYS = [f'{column}_{part}' for column in PILLAR_COLUMNS for part in ('gan', 'ji')]
+STEM_CODE = {g: i for i, g in enumerate(CHEONGAN)}
+BRANCH_CODE = {j: i for i, j in enumerate(JIJI)}
+_KEY_INDEX = {key: i for i, key in enumerate(PILLAR_KEYS)}
+
+# ==========================================
+# 2. 평탄화된 조회 테이블 (Flat Lookup Tables)
+# ==========================================
+# 문자열 dict 대신 정수 코드로 바로 인덱싱하는 bytes/tuple 테이블. (천간 0~9, 지지 0~11, 오행 0~4, 십성 0~9)
+STEM_ELEMENT = bytes(OHENG.index(OHENG_MAP[g]) for g in CHEONGAN)
+BRANCH_ELEMENT = bytes(OHENG.index(OHENG_MAP[j]) for j in JIJI)
+# 지장간: 지지별 천간 코드 (본래 순서 유지)
+BRANCH_HIDDEN_STEMS: Tuple[bytes, ...] = tuple(bytes(CHEONGAN.index(g) for g in JIJANGGAN[j]) for j in JIJI)
+# SIBSEONG_LUT[일간 * 10 + 대상 천간] → 십성 코드
+SIBSEONG_LUT = bytes(SIBSEONG_NAMES.index(SIBSEONG_MAP[(d, t)]) for d in CHEONGAN for t in CHEONGAN)
+
+
+def _element_weights() -> Tuple[Tuple[Tuple[float, ...], ...], Tuple[Tuple[float, ...], ...]]:
+    """오행 카운트 가중치(본기 1, 지장간 앞 두 글자 0.5)를 글자별 5칸 벡터로 펼칩니다."""
+    stem_w = []
+    for s in range(10):
+        row = [0.0] * 5
+        row[STEM_ELEMENT[s]] += 1.0
+        stem_w.append(tuple(row))
+    branch_w = []
+    for b in range(12):
+        row = [0.0] * 5
+        row[BRANCH_ELEMENT[b]] += 1.0
+        for hidden in BRANCH_HIDDEN_STEMS[b][:2]:
+            row[STEM_ELEMENT[hidden]] += 0.5
+        branch_w.append(tuple(row))
+    return tuple(stem_w), tuple(branch_w)
+
+
+STEM_ELEMENT_WEIGHTS, BRANCH_ELEMENT_WEIGHTS = _element_weights()
+
+
+# ==========================================
+# 3. 사주 값 타입 (SajuChart Value Type)
+# ==========================================
+
+class SajuChart(Mapping):
+    """
+    사주 8글자를 8바이트(천간/지지 코드 × 4주)로 들고 있는 불변 값 타입입니다.
+    해시 가능하므로 캐시 키로 쓸 수 있고, 기존 간지 dict 처럼 chart['day_gan'] 으로도 읽을 수 있습니다.
+    """
+
+    __slots__ = ('codes',)
+
+    def __init__(self, codes: bytes):
+        if len(codes) != 8:
+            raise ValueError("사주 코드는 8바이트여야 하네.")
+        object.__setattr__(self, 'codes', bytes(codes))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("SajuChart 는 바꿀 수 없네.")
+
+    @classmethod
+    def from_ganji(cls, ganji_map: Any) -> "SajuChart":
+        """'year_gan' … 'time_ji' 키를 가진 간지 dict (또는 SajuChart) 로부터 만듭니다."""
+        if isinstance(ganji_map, SajuChart):
+            return ganji_map
+        g = ganji_map
+        return cls(bytes((STEM_CODE[g['year_gan']], BRANCH_CODE[g['year_ji']],
+                          STEM_CODE[g['month_gan']], BRANCH_CODE[g['month_ji']],
+                          STEM_CODE[g['day_gan']], BRANCH_CODE[g['day_ji']],
+                          STEM_CODE[g['time_gan']], BRANCH_CODE[g['time_ji']])))
+
+    @classmethod
+    def from_pillars(cls, pillars: Any) -> "SajuChart":
+        """년/월/일/시 육십갑자 인덱스 4개(0=갑자)로부터 만듭니다."""
+        return cls(bytes(code for idx in pillars for code in (int(idx) % 10, int(idx) % 12)))
+
+    # --- 정수 접근자 ---
+    def stem(self, pillar: int) -> int:
+        return self.codes[2 * pillar]
+
+    def branch(self, pillar: int) -> int:
+        return self.codes[2 * pillar + 1]
+
+    def pillar(self, pillar: int) -> int:
+        """해당 주의 육십갑자 인덱스."""
+        return (6 * self.codes[2 * pillar] - 5 * self.codes[2 * pillar + 1]) % 60
+
+    @property
+    def stems(self) -> bytes:
+        return self.codes[0::2]
+
+    @property
+    def branches(self) -> bytes:
+        return self.codes[1::2]
+
+    @property
+    def day_stem(self) -> int:
+        return self.codes[4]
+
+    # --- 계산 ---
+    def sibseong_codes(self) -> Tuple[bytes, bytes]:
+        """(천간 십성 코드 4개, 대표 지장간 십성 코드 4개)."""
+        base = self.codes[4] * 10
+        gan = bytes(SIBSEONG_LUT[base + s] for s in self.codes[0::2])
+        ji = bytes(SIBSEONG_LUT[base + BRANCH_HIDDEN_STEMS[b][0]] for b in self.codes[1::2])
+        return gan, ji
+
+    def element_counts(self) -> List[float]:
+        """가중 오행 카운트 (목화토금수 순)."""
+        c = self.codes
+        rows = (STEM_ELEMENT_WEIGHTS[c[0]], BRANCH_ELEMENT_WEIGHTS[c[1]], STEM_ELEMENT_WEIGHTS[c[2]],
+                BRANCH_ELEMENT_WEIGHTS[c[3]], STEM_ELEMENT_WEIGHTS[c[4]], BRANCH_ELEMENT_WEIGHTS[c[5]],
+                STEM_ELEMENT_WEIGHTS[c[6]], BRANCH_ELEMENT_WEIGHTS[c[7]])
+        return [sum(column) for column in zip(*rows)]
+
+    # --- 간지 dict 호환 뷰 ---
+    def __getitem__(self, key: str) -> str:
+        i = _KEY_INDEX[key]
+        return (JIJI if i & 1 else CHEONGAN)[self.codes[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(PILLAR_KEYS)
+
+    def __len__(self) -> int:
+        return 8
+
+    def as_dict(self) -> Dict[str, str]:
+        return {key: self[key] for key in PILLAR_KEYS}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, SajuChart):
+            return self.codes == other.codes
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self) -> int:
+        return hash(self.codes)
+
+    def __reduce__(self):
+        return (SajuChart, (self.codes,))
+
+    def __repr__(self) -> str:
+        return "SajuChart(" + " ".join(self[f'{c}_gan'] + self[f'{c}_ji'] for c in PILLAR_COLUMNS) + ")"
+
+
+# ==========================================
+# 4. 메모리 벤치마크 (Memory Benchmark)
+# ==========================================
+
+def benchmark_memory(n: int = 100000) -> Dict[str, float]:
+    """n 개의 차트를 간지 dict 와 SajuChart 로 각각 들고 있을 때 차트당 바이트를 잰다."""
+    import random
+    import tracemalloc
+
+    rng = random.Random(0)
+    pillar_sets = [[rng.randrange(60) for _ in range(4)] for _ in range(n)]
+    results = {}
+    for label, build in (
+        ("dict", lambda p: SajuChart.from_pillars(p).as_dict()),
+        ("SajuChart", SajuChart.from_pillars),
+    ):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        held = [build(p) for p in pillar_sets]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[label] = (after - before) / n
+        del held
+    return results
+
+
+if __name__ == "__main__":
+    for label, per_chart in benchmark_memory().items():
+        print(f"{label:>10}: 차트당 {per_chart:.1f} bytes")
@@ -1,112 +1,68 @@
-import json
-import pandas as pd
-import os
-import ephem
-import math
-from datetime import datetime, timedelta
-import pytz
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
-from typing import Dict, Any, List, Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from manse_calendar import get_calendar, DEFAULT_UTC_OFFSET
+from gazetteer import lookup_city
+from lunar_calendar import get_lunar_calendar, lunar_datetime_to_solar
+from solar_time import true_solar_time
+from report_cache import ReportCache, chart_key
+from shinsal_rules import get_ruleset
+from luck_timeline import LuckTimeline, timeline_reports, daewoon_number, month_elapsed_days
+from day_strength import StrengthProfile, chart_strength, month_phase, GROUPS
+import metrics
+from metrics import span
+import population_stats
 
 # ==========================================
 # 1. 상수 및 기본 맵핑 (Constants & Maps)
 # ==========================================
-CHEONGAN = ["갑", "을", "병", "정", "무", "기", "경", "신", "임", "계"]
-JIJI = ["자", "축", "인", "묘", "진", "사", "오", "미", "신", "유", "술", "해"]
-OHENG_MAP = {
-    '갑': '목', '을': '목', '병': '화', '정': '화', '무': '토', '기': '토', 
-    '경': '금', '신': '금', '임': '수', '계': '수',
-    '인': '목', '묘': '목', '사': '화', '오': '화', '진': '토', '술': '토', '축': '토', '미': '토',
-    '신': '금', '유': '금', '해': '수', '자': '수'
-}
-JIJANGGAN = {
-    '자': ['임', '계'], '축': ['계', '신', '기'], '인': ['무', '병', '갑'], 
-    '묘': ['갑', '을'], '진': ['을', '계', '무'], '사': ['무', '경', '병'],
-    '오': ['병', '기', '정'], '미': ['정', '을', '기'], '신': ['경', '임', '무'], 
-    '유': ['경', '신'], '술': ['신', '정', '무'], '해': ['무', '갑', '임']
-}
-SIBSEONG_MAP = {
-    # 십성 맵핑 전체 (Day Gan : Target Gan)
-    ('갑', '갑'): '비견', ('갑', '을'): '겁재', ('갑', '병'): '식신', ('갑', '정'): '상관', ('갑', '무'): '편재',
-    ('갑', '기'): '정재', ('갑', '경'): '편관', ('갑', '신'): '정관', ('갑', '임'): '편인', ('갑', '계'): '정인',
-    ('을', '갑'): '겁재', ('을', '을'): '비견', ('을', '병'): '상관', ('을', '정'): '식신', ('을', '무'): '정재',
-    ('을', '기'): '편재', ('을', '경'): '정관', ('을', '신'): '편관', ('을', '임'): '정인', ('을', '계'): '편인',
-    ('병', '갑'): '편인', ('병', '을'): '정인', ('병', '병'): '비견', ('병', '정'): '겁재', ('병', '무'): '식신',
-    ('병', '기'): '상관', ('병', '경'): '편재', ('병', '신'): '정재', ('병', '임'): '편관', ('병', '계'): '정관',
-    ('정', '갑'): '정인', ('정', '을'): '편인', ('정', '병'): '겁재', ('정', '정'): '비견', ('정', '무'): '상관',
-    ('정', '기'): '식신', ('정', '경'): '정재', ('정', '신'): '편재', ('정', '임'): '정관', ('정', '계'): '편관',
-    ('무', '갑'): '편관', ('무', '을'): '정관', ('무', '병'): '편인', ('무', '정'): '정인', ('무', '무'): '비견',
-    ('무', '기'): '겁재', ('무', '경'): '식신', ('무', '신'): '상관', ('무', '임'): '편재', ('무', '계'): '정재',
-    ('기', '갑'): '정관', ('기', '을'): '편관', ('기', '병'): '정인', ('기', '정'): '편인', ('기', '무'): '겁재',
-    ('기', '기'): '비견', ('기', '경'): '상관', ('기', '신'): '식신', ('기', '임'): '정재', ('기', '계'): '편재',
-    ('경', '갑'): '편재', ('경', '을'): '정재', ('경', '병'): '편관', ('경', '정'): '정관', ('경', '무'): '편인',
-    ('경', '기'): '정인', ('경', '경'): '비견', ('경', '신'): '겁재', ('경', '임'): '식신', ('경', '계'): '상관',
-    ('신', '갑'): '정재', ('신', '을'): '편재', ('신', '병'): '정관', ('신', '정'): '편관', ('신', '무'): '정인',
-    ('신', '기'): '편인', ('신', '경'): '겁재', ('신', '신'): '비견', ('신', '임'): '상관', ('신', '계'): '식신',
-    ('임', '갑'): '식신', ('임', '을'): '상관', ('임', '병'): '편재', ('임', '정'): '정재', ('임', '무'): '편관',
-    ('임', '기'): '정관', ('임', '경'): '편인', ('임', '신'): '정인', ('임', '임'): '비견', ('임', '계'): '겁재',
-    ('계', '갑'): '상관', ('계', '을'): '식신', ('계', '병'): '정재', ('계', '정'): '편재', ('계', '무'): '정관',
-    ('계', '기'): '편관', ('계', '경'): '정인', ('계', '신'): '편인', ('계', '임'): '겁재', ('계', '계'): '비견',
-}
+# 표 자체와 정수 코드용 평탄화 테이블은 saju_chart 에 있다 (여기서는 기존 이름 그대로 재노출)
+from saju_chart import (CHEONGAN, JIJI, OHENG_MAP, JIJANGGAN, SIBSEONG_MAP, OHENG, SIBSEONG_NAMES,
+                        PILLAR_COLUMNS, STEM_CODE, SIBSEONG_LUT, BRANCH_HIDDEN_STEMS, SajuChart)
 
 # ==========================================
 # 2. 유틸리티 및 계산 함수 (Utility & Calculation)
 # ==========================================
 
-def get_location_info(city_name: str) -> Optional[Dict[str, Any]]:
-    """도시 이름으로 위도, 경도, 시간대 정보를 가져옵니다."""
-    try:
-        geolocator = Nominatim(user_agent="shinryeong_app_v4")
-        location = geolocator.geocode(city_name)
-        if not location: return None
-        tf = TimezoneFinder()
-        timezone_str = tf.timezone_at(lng=location.longitude, lat=location.latitude)
-        return {
-            "latitude": location.latitude,
-            "longitude": location.longitude,
-            "timezone_str": timezone_str
-        }
-    except Exception:
-        return None
-
-def get_true_solar_time(dt: datetime, longitude: float, timezone_str: str) -> datetime:
-    """사용자 좌표를 기준으로 진태양시를 계산하여 시간을 보정합니다. (KST 135도 기준)"""
-    try:
-        local_tz = pytz.timezone(timezone_str)
-        local_dt = local_tz.localize(dt)
-        utc_dt = local_dt.astimezone(pytz.utc)
-        
-        sun = ephem.Sun()
-        observer = ephem.Observer()
-        observer.lon = str(longitude * ephem.degree)
-        next_noon = observer.next_transit(ephem.Sun(), start=utc_dt, use_center=True)
-        
-        noon_kst = pytz.utc.localize(next_noon).astimezone(pytz.timezone('Asia/Seoul'))
-        std_noon_kst = noon_kst.replace(hour=12, minute=0, second=0, microsecond=0)
-        
-        time_offset = noon_kst - std_noon_kst
-        true_solar_dt = dt + time_offset
-        
-        return true_solar_dt.replace(tzinfo=None)
-    except Exception:
-        return dt
+def get_location_info(city_name: str, allow_network: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+    """도시 이름으로 위도, 경도, 시간대 정보를 가져옵니다. (로컬 지명 사전 우선, Nominatim 은 폴백)"""
+    return lookup_city(city_name, allow_network)
 
-def get_ganji(dt: datetime, is_lunar: bool = False, is_leap_month: bool = False) -> Dict[str, str]:
+def get_true_solar_time(dt: datetime, longitude: float, timezone_str: Optional[str]) -> datetime:
+    """사용자 좌표를 기준으로 진태양시를 계산하여 시간을 보정합니다. (경도 보정 + 균시차, 닫힌 식)"""
+    if not timezone_str:
+        # 바다 위 등 시간대를 모를 때는 경도로 정한 명목 시간대를 쓴다
+        metrics.incr("solar_time_nominal_timezone")
+        timezone_str = f"Etc/GMT{-round(longitude / 15):+d}"
+    return true_solar_time(dt, longitude, timezone_str)
+
+def get_ganji(dt: datetime, is_lunar: bool = False, is_leap_month: bool = False,
+              utc_offset: float = DEFAULT_UTC_OFFSET) -> Dict[str, str]:
     """
-    정밀한 진태양시 기준으로 년월일시 간지를 계산합니다. (DB 부재로 더미 로직 사용)
+    정밀한 진태양시 기준으로 년월일시 간지를 계산합니다. (사전 계산된 만세력 테이블 사용)
+    utc_offset 은 dt 가 UTC 보다 몇 시간 앞선 시각인지를 뜻하며, 절기 경계 비교에만 쓰입니다.
+    is_lunar 이면 dt 의 연/월/일을 음력(is_leap_month 면 윤달)으로 읽어 양력으로 바꾼 뒤 계산합니다.
     """
-    # 🚨 실제 만세력 DB가 필요함. 여기서는 특정 날짜에 대한 더미 간지 사용.
-    if dt.year == 2025 and dt.month == 12 and dt.day == 9:
-         # 2025년 12월 9일 17:45 (가정)
-         ganji = {'year_gan': '을', 'year_ji': '사', 'month_gan': '무', 'month_ji': '자',
-             'day_gan': '경', 'day_ji': '진', 'time_gan': '을', 'time_ji': '유'}
-    else:
-        # 기본 더미: 2023년 3월 15일 14:30 (계묘년 을묘월 정축일 정미시)
-        ganji = {'year_gan': '계', 'year_ji': '묘', 'month_gan': '을', 'month_ji': '묘',
-                 'day_gan': '정', 'day_ji': '축', 'time_gan': '정', 'time_ji': '미'}
-        
-    return ganji
+    if is_lunar:
+        dt = lunar_datetime_to_solar(dt, is_leap_month)
+    return get_calendar().ganji(dt, utc_offset)
+
+def solar_birth_dt(user_data: Dict[str, Any]) -> datetime:
+    """
+    출생 입력을 양력 벽시계 시각으로 돌려줍니다. 음력 입력은 진태양시 보정 전에 바꿔야 한다.
+    lunar_date=(연, 월, 일) 이 있으면 birth_dt 의 날짜 대신 쓴다 (음력 2월 30일처럼 양력 달력에 없는 날짜용).
+    """
+    birth_dt = user_data['birth_dt']
+    if not user_data.get('is_lunar', False):
+        return birth_dt
+    is_leap = user_data.get('is_leap_month', False)
+    lunar_date = user_data.get('lunar_date')
+    if lunar_date:
+        if isinstance(lunar_date, str):
+            lunar_date = [int(part) for part in lunar_date.split('-')]
+        year, month, day = lunar_date
+        return datetime.combine(get_lunar_calendar().to_solar(year, month, day, is_leap), birth_dt.time())
+    return lunar_datetime_to_solar(birth_dt, is_leap)
 
 def _get_data_safe(db: Dict, key_path: str) -> Any:
     """JSON DB에서 안전하게 데이터를 추출합니다."""
@@ -119,48 +75,33 @@ def _get_data_safe(db: Dict, key_path: str) -> Any:
             return {}
     return data
 
+_SIBSEONG_KEYS = [(f'{column}_gan', f'{column}_ji_sibseong') for column in PILLAR_COLUMNS]
+
 def calculate_sibseong(day_gan: str, ganji_map: Dict[str, str]) -> Dict[str, str]:
-    """4柱 8글자에 대한 십성(十星)을 계산합니다. (천간 중심)"""
+    """4柱 8글자에 대한 십성(十星)을 계산합니다. (천간 중심, 정수 코드 조회 테이블 사용)"""
+    codes = SajuChart.from_ganji(ganji_map).codes
+    base = STEM_CODE[day_gan] * 10
     result = {}
-    for column in ['year', 'month', 'day', 'time']:
-        gan = ganji_map[f'{column}_gan']
-        ji = ganji_map[f'{column}_ji']
-        
+    for i, (gan_key, ji_key) in enumerate(_SIBSEONG_KEYS):
         # 1. 천간 십성
-        result[f'{column}_gan'] = SIBSEONG_MAP.get((day_gan, gan), '일간')
-        
-        # 2. 지장간 십성 (주요 지장간만)
-        main_jijanggan = JIJANGGAN.get(ji, [])
-        if main_jijanggan:
-            # 여기서는 지장간의 첫 번째 글자 십성만 대표로 저장
-            jg_gan = main_jijanggan[0] 
-            result[f'{column}_ji_sibseong'] = SIBSEONG_MAP.get((day_gan, jg_gan), '')
-                
+        result[gan_key] = SIBSEONG_NAMES[SIBSEONG_LUT[base + codes[2 * i]]]
+        # 2. 지장간 십성 (지장간의 첫 번째 글자 십성만 대표로 저장)
+        result[ji_key] = SIBSEONG_NAMES[SIBSEONG_LUT[base + BRANCH_HIDDEN_STEMS[codes[2 * i + 1]][0]]]
     return result
 
 def calculate_five_elements_count(ganji_map: Dict[str, str]) -> Dict[str, float]:
-    """사주 8글자 및 지장간까지 오행 카운트를 계산합니다. (지장간 가중치 0.5)"""
-    counts = {'목': 0, '화': 0, '토': 0, '금': 0, '수': 0}
-    
-    # 1. 8글자 오행 카운트 (가중치 1)
-    for key in ['year_gan', 'year_ji', 'month_gan', 'month_ji', 
-                'day_gan', 'day_ji', 'time_gan', 'time_ji']:
-        char = ganji_map[key]
-        element = OHENG_MAP.get(char)
-        if element:
-            counts[element] += 1
-            
-    # 2. 지장간 오행 카운트 (주요 2개, 가중치 0.5)
-    for ji in [ganji_map['year_ji'], ganji_map['month_ji'], 
-               ganji_map['day_ji'], ganji_map['time_ji']]:
-        jijanggan_list = JIJANGGAN.get(ji, [])
-        for i in range(min(2, len(jijanggan_list))): 
-            jg_gan = jijanggan_list[i]
-            element = OHENG_MAP.get(jg_gan)
-            if element:
-                counts[element] += 0.5 
-                
-    return counts
+    """사주 8글자 및 지장간까지 오행 카운트를 계산합니다. (지장간 주요 2개 가중치 0.5)"""
+    return dict(zip(OHENG, SajuChart.from_ganji(ganji_map).element_counts()))
+
+def calculate_strength(ganji_map: Dict[str, str], true_solar_dt: Optional[datetime] = None) -> StrengthProfile:
+    """월령(사령 천간)·통근·득세로 일간 강약(신강/신약)과 용신을 계산합니다. (시각을 모르면 정기가 사령)"""
+    return _strength_at(SajuChart.from_ganji(ganji_map), true_solar_dt)
+
+@lru_cache(maxsize=1024)
+def _strength_at(chart: SajuChart, true_solar_dt: Optional[datetime]) -> StrengthProfile:
+    # 한 보고서의 직업·건강 단계와 보고서 본문이 같은 차트로 거듭 묻는다 (절기 이분탐색을 한 번만)
+    elapsed = month_elapsed_days(chart, true_solar_dt) if true_solar_dt is not None else None
+    return chart_strength(chart, elapsed)
 
 # ==========================================
 # 3. DB 기반 심층 분석 함수 (Deep Dive Analysis)
@@ -175,20 +116,29 @@ def get_day_pillar_identity(day_ganji: str, db: Dict) -> Dict[str, str]:
         "keywords": ", ".join(identity_data.get('keywords', []))
     }
 
-def analyze_ohang_imbalance(ohang_counts: Dict[str, float], day_gan_elem: str, db: Dict) -> List[Dict[str, Any]]:
-    """five_elements_matrix.json과 health_db.json을 사용하여 오행 불균형을 분석합니다."""
+def analyze_ohang_imbalance(ohang_counts: Dict[str, float], day_gan_elem: str, db: Dict,
+                            strength: Optional[StrengthProfile] = None) -> List[Dict[str, Any]]:
+    """five_elements_matrix.json과 health_db.json을 사용하여 오행 불균형을 분석합니다.
+    strength 가 주어지면 계절(월령) 배율을 곱한 오행 가중치로 과다/고립을 판정하고 기신 오행을 짚습니다."""
     reports = []
     matrix_db = db.get('five_elements', {})
     health_db = db.get('health', {}).get('health_remedy', {})
+    diagnosis_db = db.get('health', {}).get('element_diagnosis', {})
+    remedy_db = db.get('health', {}).get('remedy', {})
     elements = ['목', '화', '토', '금', '수']
     eng_map = {'목': 'Wood', '화': 'Fire', '토': 'Earth', '금': 'Metal', '수': 'Water'}
+    if strength is not None:
+        ohang_counts = strength.weighted_counts(sum(ohang_counts.values()))
     
     for elem in elements:
         count = ohang_counts.get(elem, 0)
+        diagnosis = diagnosis_db.get(elem, {})
         
         # 과다(Excess) 분석 (3.5 이상)
         if count >= 3.5:
             data = matrix_db.get(f"{elem}({eng_map.get(elem)})", {}).get("excess", {})
+            if not data and diagnosis:
+                data = {"psychology": diagnosis.get('desc', ''), "physical": diagnosis.get('excess_symptom', '')}
             if data:
                 reports.append({
                     "type": f"🔥 오행 **{elem}** 과다 (태과)",
@@ -202,6 +152,10 @@ def analyze_ohang_imbalance(ohang_counts: Dict[str, float], day_gan_elem: str, d
         elif count <= 0.5:
             data = matrix_db.get(f"{elem}({eng_map.get(elem)})", {}).get("isolation", {})
             remedy = health_db.get(f"{elem}({eng_map.get(elem)})_문제", {})
+            if not data and diagnosis:
+                data = {"psychology": diagnosis.get('desc', ''), "physical": diagnosis.get('weak_symptom', '')}
+            if not remedy and remedy_db.get(elem):
+                remedy = {"food_remedy": remedy_db[elem].get('food', ''), "action_remedy": remedy_db[elem].get('action', '')}
             
             if data and remedy:
                 reports.append({
@@ -214,193 +168,338 @@ def analyze_ohang_imbalance(ohang_counts: Dict[str, float], day_gan_elem: str, d
                                 f"\n* **행동:** {remedy.get('action_remedy', '')}"
                                 f"\n*신령의 일침:* {data.get('shamanic_voice', '기운을 채워야 할 때네.')}"
                 })
-                
-    return reports
 
-def perform_cold_reading(ganji_map: Dict[str, str], db: Dict) -> List[Dict[str, Any]]:
-    """symptom_mapping.json을 사용하여 콜드 리딩 분석을 수행합니다. (콜드리딩 DB 사용)"""
-    reports = []
-    symptom_db = db.get('symptom', {}).get('patterns', {})
-    ohang_counts = calculate_five_elements_count(ganji_map)
-    
-    # 1. 습한 사주 체크
-    if ohang_counts.get('수', 0) >= 3 or ganji_map['month_ji'] in ['해', '자', '축']:
-        data = symptom_db.get('습한_사주(Wet_Chart)', {})
-        if data:
-            reports.append({
-                "type": "☔ 습한 사주 (환경 진단)",
-                "title": f"이 신령이 자네의 환경을 먼저 짚어보네.",
-                "content": f"**환경/주거지:** {data.get('environment', '')}"
-                           f"\n**신체 증상:** {data.get('body', '')}"
-                           f"\n*신령의 일침:* {data.get('shamanic_voice', '눅눅한 기운을 걷어내게.')}"
-            })
-            
-    # 2. 양인살 발동 체크
-    day_gan = ganji_map['day_gan']
-    yangin_ji = {'갑': '묘', '병': '오', '무': '오', '경': '유', '임': '자'}.get(day_gan)
-    
-    if yangin_ji and (ganji_map['day_ji'] == yangin_ji or ganji_map['month_ji'] == yangin_ji):
-        data = symptom_db.get('양인살_발동(Sheep_Blade)', {})
-        if data:
+    # 기신(忌神): 용신을 극하는 오행이 가장 센 오행이면 그 장부부터 탈이 나기 쉽다
+    if strength is not None and diagnosis_db.get(strength.gisin):
+        gisin = strength.gisin
+        if ohang_counts.get(gisin, 0) >= max(ohang_counts.values()) and not any(gisin in r['type'] for r in reports):
+            diagnosis = diagnosis_db[gisin]
+            remedy = remedy_db.get(strength.yongsin, {})
             reports.append({
-                "type": "🔪 양인살 발동 (기질 진단)",
-                "title": f"자네 몸에 **강력한 칼날**을 품고 있네.",
-                "content": f"**기질/습관:** {data.get('habit', '')}"
-                           f"\n**신령의 일침:** {data.get('shamanic_voice', '칼날을 잘 쓰면 명의가 되고 못 쓰면 살인자네.')}"
+                "type": f"⚠️ 기신 오행 **{gisin}** 주의",
+                "title": f"용신 {strength.yongsin}을(를) 누르는 {gisin} 기운이 가장 세네.",
+                "content": f"**약한 곳:** {diagnosis.get('organ', '')}"
+                            f"\n**신체:** {diagnosis.get('excess_symptom', '')}"
+                            + (f"\n\n**용신({strength.yongsin}) 개운법:**"
+                               f"\n* **음식:** {remedy.get('food', '')}"
+                               f"\n* **행동:** {remedy.get('action', '')}" if remedy else "")
             })
-            
+                
     return reports
 
+def perform_cold_reading(ganji_map: Dict[str, str], db: Dict,
+                         five_elements_count: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """symptom_mapping.json 의 규칙(rules)으로 콜드 리딩 분석을 수행합니다. (콜드리딩 DB 사용)"""
+    symptom = db.get('symptom', {})
+    elements = [five_elements_count.get(e, 0) for e in OHENG] if five_elements_count is not None else None
+    return get_ruleset(symptom.get('rules', []), 'symptom').render(ganji_map, symptom.get('patterns', {}), elements)
+
 def analyze_shinsal(ganji_map: Dict[str, str], db: Dict) -> List[Dict[str, Any]]:
-    """shinsal_db.json을 사용하여 신살 분석을 수행합니다. (신살 DB 사용)"""
-    reports = []
-    shinsal_db = db.get('shinsal', {}).get('basic_meanings', {})
-    
-    # 도화살 (자오묘유)
-    dohwa_jis = ['자', '오', '묘', '유']
-    if any(ji in dohwa_jis for ji in [ganji_map['year_ji'], ganji_map['month_ji'], ganji_map['time_ji']]):
-        data = shinsal_db.get('도화살(Peach_Blossom)', {})
-        if data: reports.append({"type": "🌷 도화살", "title": "타고난 매력의 별", "content": data.get('desc', '') + "\n" + f"**긍정:** {data.get('positive', '')}"})
-            
-    # 역마살 (인신사해)
-    yeokma_jis = ['인', '신', '사', '해']
-    if any(ji in yeokma_jis for ji in [ganji_map['year_ji'], ganji_map['day_ji']]):
-        data = shinsal_db.get('역마살(Stationary_Horse)', {})
-        if data: reports.append({"type": "🐎 역마살", "title": "넓은 세상으로 뻗어 나가는 이동수", "content": data.get('desc', '') + "\n" + f"**긍정:** {data.get('positive', '')}"})
-            
-    return reports
+    """shinsal_db.json 의 규칙(rules)으로 신살 분석을 수행합니다. (신살 DB 사용)"""
+    shinsal = db.get('shinsal', {})
+    return get_ruleset(shinsal.get('rules', []), 'shinsal').render(ganji_map, shinsal.get('basic_shinsal', {}))
 
-def analyze_timeline(birth_dt: datetime, day_gan: str, db: Dict) -> List[Dict[str, Any]]:
-    """timeline_db.json과 lifecycle_pillar_db.json을 사용하여 현재 운의 흐름을 분석합니다."""
-    reports = []
-    
-    current_year = datetime.now().year
-    current_year_gan = '을' # 2025년 기준
-    current_year_sibseong = SIBSEONG_MAP.get((day_gan, current_year_gan), '운')
-    
-    # 1. 세운 분석
-    if current_year == 2025:
-        timeline_data = db.get('timeline', {}).get("2025_Eul_Sa", {})
-        if timeline_data:
-            reports.append({
-                "type": f"⚡️ **{current_year_sibseong}** 세운 분석",
-                "title": timeline_data.get('year_title', f"{current_year}년의 기운이네."),
-                "content": timeline_data.get('summary', '') 
-                           + "\n\n**상반기 예측:** " + timeline_data.get('first_half', {}).get('prediction', '')
-                           + "\n*신령의 경고:* " + timeline_data.get('first_half', {}).get('shamanic_warning', '')
-            })
-    
-    # 2. 라이프 사이클 분석
-    age = datetime.now().year - birth_dt.year
-    life_stages_db = db.get('timeline', {}).get('life_stages_detailed', {})
-    major_pillar_db = db.get('lifecycle', {}).get('prime_pillar', {}) 
-    
-    # 나이대별 key 찾기
-    life_stage_key = ""
-    if 30 <= age <= 39: life_stage_key = "settlement"
-    # 다른 나이대 로직도 추가 가능...
-    
-    life_data = life_stages_db.get(life_stage_key, {})
-    
-    if life_stage_key == "settlement" and life_data: 
-        # 대운 십성(임시)을 '정관'으로 가정하여 중년운 분석
-        temp_sibseong = '정관' 
-        sibseong_desc = major_pillar_db.get(temp_sibseong, '특별한 중년운 설명이 없네.')
-        
-        reports.append({
-            "type": "⚖️ 중년 시기 운세 분석",
-            "title": f"**'인생의 기반 다지기'** 시기의 흐름",
-            "content": f"자네는 현재 **{life_data.get('desc', '')}**의 흐름에 있네.\n\n"
-                       f"이 시기에 **{temp_sibseong}**의 기운이 들어왔으니, {sibseong_desc}"
-        })
-            
-    return reports
+def analyze_timeline(birth_dt: datetime, ganji_map: Dict[str, str], db: Dict,
+                     gender: Optional[str] = None) -> List[Dict[str, Any]]:
+    """timeline_db.json과 lifecycle_pillar_db.json을 사용하여 현재 대운/세운의 흐름을 분석합니다."""
+    return timeline_reports(LuckTimeline(ganji_map, birth_dt, gender), db)
 
 # ==========================================
 # 4. 메인 처리 함수 (Main Processing)
 # ==========================================
 
-def process_saju_input(user_data: Dict[str, Any], db: Dict) -> Dict[str, Any]:
-    """개인 사주 분석 및 보고서 생성 (모든 DB 활용)"""
-    
-    name = user_data['name']
-    birth_dt = user_data['birth_dt']
-    city_name = user_data.get('city', 'Seoul')
-    
-    location_info = get_location_info(city_name)
-    if location_info:
-        true_solar_dt = get_true_solar_time(birth_dt, location_info['longitude'], location_info['timezone_str'])
-    else:
-        true_solar_dt = birth_dt
-        
-    ganji_map = get_ganji(true_solar_dt)
-    day_gan = ganji_map['day_gan']
-    sibseong_map = calculate_sibseong(day_gan, ganji_map)
-    five_elements_count = calculate_five_elements_count(ganji_map)
-    
-    # 최종 보고서 구조
-    report: Dict[str, Any] = {
-        "user": user_data,
-        "saju": ganji_map,
-        "analytics": []
-    }
-    
-    # 6-1. 일주 기질 분석 (Identity DB)
-    day_ganji = ganji_map['day_gan'] + ganji_map['day_ji']
-    identity_analysis = get_day_pillar_identity(day_ganji, db)
-    report['analytics'].append({
-        "type": "👤 일주(日柱) 기질 분석",
-        "title": identity_analysis['title'],
-        "content": identity_analysis['shamanic_voice']
-    })
-    
-    # 6-2. 콜드 리딩 (Symptom DB)
-    cold_reading_reports = perform_cold_reading(ganji_map, db)
-    report['analytics'].extend(cold_reading_reports)
-    
-    # 6-3. 오행 불균형 & 개운법 (Matrix & Health DB)
-    ohang_imbalance_reports = analyze_ohang_imbalance(five_elements_count, day_gan, db)
-    report['analytics'].extend(ohang_imbalance_reports)
-
-    # 6-4. 직업/적성 분석 (Career DB)
-    sibseong_counts = {} # 십성 카운트 로직은 여기에 유지
+def dominant_sibseong(sibseong_map: Dict[str, str]) -> str:
+    """천간 십성 중 가장 많이 나온 십성 (직업 분석과 대화창 검색 필터가 함께 쓴다)."""
+    sibseong_counts = {}
     for key, sibseong in sibseong_map.items():
         if key.endswith('_gan') and sibseong != '일간': sibseong_counts[sibseong] = sibseong_counts.get(sibseong, 0) + 1
-    
-    main_sibseong = max(sibseong_counts, key=sibseong_counts.get) if sibseong_counts else '비견' 
-    career_db_data = db.get('career', {}).get('modern_jobs', {})
+    return max(sibseong_counts, key=sibseong_counts.get) if sibseong_counts else '비견'
+
+def group_sibseong(group: str, sibseong_map: Dict[str, str]) -> str:
+    """묶음(비겁/식상/재성/관성/인성)의 두 십성 중 원국에 더 많이 드러난 쪽. (같으면 앞쪽)"""
+    pair = SIBSEONG_NAMES[2 * GROUPS.index(group):2 * GROUPS.index(group) + 2]
+    values = [v for k, v in sibseong_map.items() if v != '일간']
+    return max(pair, key=lambda name: (values.count(name), -pair.index(name)))
+
+def analyze_career(sibseong_map: Dict[str, str], db: Dict, strength: Optional[StrengthProfile] = None) -> Dict[str, Any]:
+    """career_db.json을 사용하여 직업/적성을 분석합니다. (Career DB 사용)
+    strength 가 주어지면 용신 묶음의 십성을 천직으로, 신강/신약으로 일하는 방식을 보고, 없으면 가장 많은 천간 십성을 씁니다."""
+    if strength is None:
+        main_sibseong = dominant_sibseong(sibseong_map)
+    else:
+        main_sibseong = group_sibseong(strength.yongsin_group, sibseong_map)
+    career_db = db.get('career', {})
+    career_db_data = career_db.get('modern_jobs', {})
     sibseong_to_db_key = {'비견': '비겁_태과(Self_Strong)', '겁재': '비겁_태과(Self_Strong)', '식신': '식상_발달(Output_Strong)', '상관': '식상_발달(Output_Strong)', '편재': '재성_발달(Wealth_Strong)', '정재': '재성_발달(Wealth_Strong)', '편관': '관살_발달(Power_Strong)', '정관': '관살_발달(Power_Strong)', '편인': '인성_발달(Resource_Strong)', '정인': '인성_발달(Resource_Strong)',}
     db_key_for_career = sibseong_to_db_key.get(main_sibseong, '비겁_태과(Self_Strong)')
     career_data = career_db_data.get(db_key_for_career, {})
     
     career_analysis = {"type": "💼 직업 및 적성 분석", "title": f"가장 발달한 십성: **{main_sibseong}** (천직)", "content": f"그대는 {main_sibseong}의 기운이 가장 강하니, 이것이 곧 사회적 능력이네."}
+    if strength is not None:
+        career_analysis['title'] = f"일간 **{strength.label}**, 용신 **{strength.yongsin}**({main_sibseong}) (천직)"
+        career_analysis['content'] = f"그대에게 가장 필요한 기운이 {main_sibseong}이니, 이것을 쓰는 일이 곧 사회적 능력이네."
+        style = career_db.get('work_style', {}).get(strength.side, {})
+        if style:
+            career_analysis['content'] += f"\n* **일하는 방식:** {style.get('title', '')} - {style.get('desc', '')}"
+            career_analysis['content'] += f"\n* **성공 열쇠:** {style.get('success_key', '')}"
+        field = career_db.get('elements', {}).get(strength.yongsin, {})
+        if field:
+            career_analysis['content'] += f"\n* **용신 분야:** {field.get('field', '')} ({field.get('vibe', '')})"
+        god = career_db.get('ten_gods', {}).get(main_sibseong, {})
+        if god:
+            career_analysis['content'] += f"\n* **타고난 기질:** {god.get('desc', '')}"
+            career_analysis['content'] += f"\n* **어울리는 직업:** {', '.join(god.get('jobs', []))}"
     if career_data:
         career_analysis['content'] += f"\n* **타고난 기질:** {career_data.get('trait', '')}"
         career_analysis['content'] += f"\n* **현대 직업:** {career_data.get('jobs', '')}"
         career_analysis['content'] += f"\n* **신령의 충고:** {career_data.get('shamanic_voice', '자네가 하고 싶은 대로 하게나.')}"
-    report['analytics'].append(career_analysis)
-    
-    # 6-5. 신살 분석 (Shinsal DB)
-    shinsal_reports = analyze_shinsal(ganji_map, db)
-    report['analytics'].extend(shinsal_reports)
+    return career_analysis
+
+def _identity_items(ganji_map, sibseong_map, five_elements_count, true_solar_dt, db, gender) -> List[Dict[str, Any]]:
+    # 6-1. 일주 기질 분석 (Identity DB)
+    identity_analysis = get_day_pillar_identity(ganji_map['day_gan'] + ganji_map['day_ji'], db)
+    return [{
+        "type": "👤 일주(日柱) 기질 분석",
+        "title": identity_analysis['title'],
+        "content": identity_analysis['shamanic_voice']
+    }]
+
+
+# 분석 단계: (이름, 읽는 DB 섹션, 항목 목록을 만드는 함수). 값싼 단계부터, 대운 계산이 필요한 운세 흐름은 맨 마지막.
+# 보고서 캐시는 단계별로 '읽는 섹션들의 해시'를 버전으로 삼으므로, DB 한 섹션이 바뀌면 그 섹션을 읽는 단계만 다시 계산한다.
+ANALYTICS_STAGES = [
+    ("identity", ("identity",), _identity_items),
+    # 6-2. 오행 불균형 & 개운법 (Matrix & Health DB)
+    ("ohang_imbalance", ("five_elements", "health"),
+     lambda g, s, f, dt, db, gender: analyze_ohang_imbalance(f, g['day_gan'], db, calculate_strength(g, dt))),
+    # 6-3. 직업/적성 분석 (Career DB) - 일간 강약과 용신 기준
+    ("career", ("career",), lambda g, s, f, dt, db, gender: [analyze_career(s, db, calculate_strength(g, dt))]),
+    # 6-4. 신살 분석 (Shinsal DB)
+    ("shinsal", ("shinsal",), lambda g, s, f, dt, db, gender: analyze_shinsal(g, db)),
+    # 6-5. 콜드 리딩 (Symptom DB)
+    ("cold_reading", ("symptom",), lambda g, s, f, dt, db, gender: perform_cold_reading(g, db, f)),
+    # 6-6. 운세 흐름 분석 (Timeline/Lifecycle DB) - 절기 테이블로 대운을 세워야 하므로 가장 비싸다
+    ("timeline", ("timeline", "lifecycle"), lambda g, s, f, dt, db, gender: analyze_timeline(dt, g, db, gender)),
+]
+
+# 단계별로 결과를 바꾸는 출생 입력: day=일주, chart=8글자 전체, phase=월지 사령 단계, luck=(대운수, 출생 연도).
+# 출생 시각이 불확실할 때(birth_window) 이 값들이 같은 후보 차트는 그 단계를 다시 계산하지 않는다.
+STAGE_INPUTS = {
+    "identity": ("day",),
+    "ohang_imbalance": ("chart", "phase"),
+    "career": ("chart", "phase"),
+    "shinsal": ("chart",),
+    "cold_reading": ("chart",),
+    "timeline": ("chart", "luck"),
+}
+
+
+def stage_hashes(db: Any) -> Dict[str, str]:
+    """분석 단계별 DB 버전 해시 (섹션 해시가 없는 dict DB 면 빈 dict)."""
+    if not hasattr(db, 'dependency_hash'):
+        return {}
+    return {name: db.dependency_hash(sections) for name, sections, _ in ANALYTICS_STAGES}
+
+
+def invalidate_stages(cache: ReportCache, db: Any, changes: List[Any]) -> int:
+    """핫 리로드로 바뀐 섹션(db_bundle.SectionChange 목록)을 읽는 단계의 예전 캐시 항목만 지웁니다."""
+    changed = {change.name for change in changes}
+    old = {change.name: change.old_hash for change in changes}
+    stale = [db.dependency_hash(sections, overrides=old)
+             for _, sections, _ in ANALYTICS_STAGES if changed.intersection(sections)]
+    return cache.drop(stale)
+
+
+def iter_analytics(ganji_map: Dict[str, str], sibseong_map: Dict[str, str],
+                   five_elements_count: Dict[str, float], true_solar_dt: datetime, db: Dict,
+                   gender: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """분석 항목을 계산되는 대로 하나씩 내보냅니다. (ANALYTICS_STAGES 순서)"""
+    # 각 단계는 span 안에서 계산만 하고, yield 는 span 밖에서 한다 (소비하는 쪽 시간이 섞이지 않게)
+    for name, _, build in ANALYTICS_STAGES:
+        with span(name):
+            items = build(ganji_map, sibseong_map, five_elements_count, true_solar_dt, db, gender)
+        yield from items
+
+def build_analytics(ganji_map: Dict[str, str], sibseong_map: Dict[str, str],
+                    five_elements_count: Dict[str, float], true_solar_dt: datetime, db: Dict,
+                    gender: Optional[str] = None) -> List[Dict[str, Any]]:
+    """간지/십성/오행 계산 결과로 DB 기반 분석 항목 목록을 만듭니다. (단건/배치 공용)"""
+    return list(iter_analytics(ganji_map, sibseong_map, five_elements_count, true_solar_dt, db, gender))
+
+def locate_birth(user_data: Dict[str, Any],
+                 birth_dt: Optional[datetime] = None) -> Tuple[datetime, float, Optional[Dict[str, Any]]]:
+    """(진태양시, 절기 비교용 UTC 차, 지명 정보). birth_dt 를 주면 입력 시각 대신 그 양력 벽시계 시각을 보정한다."""
+    if birth_dt is None:
+        birth_dt = solar_birth_dt(user_data)
+    city_name = user_data.get('city', 'Seoul')
     
-    # 6-6. 운세 흐름 분석 (Timeline/Lifecycle DB)
-    timeline_reports = analyze_timeline(true_solar_dt, day_gan, db)
-    report['analytics'].extend(timeline_reports)
+    with span("location"):
+        location_info = get_location_info(city_name)
+    true_solar_dt, solar_utc_offset = solar_at(birth_dt, location_info)
+    return true_solar_dt, solar_utc_offset, location_info
+
+def solar_at(birth_dt: datetime, location_info: Optional[Dict[str, Any]]) -> Tuple[datetime, float]:
+    """이미 찾은 지명 정보로 (진태양시, 절기 비교용 UTC 차)를 구합니다. 같은 곳의 여러 시각을 볼 때 지명 조회를 한 번만 하도록."""
+    if location_info:
+        with span("true_solar_time"):
+            true_solar_dt = get_true_solar_time(birth_dt, location_info['longitude'], location_info['timezone_str'])
+        # 진태양시는 경도 기준의 지방시이므로 절기 비교 시 경도/15 시간을 UTC 차로 본다
+        return true_solar_dt, location_info['longitude'] / 15.0
+    # 지명을 못 찾으면 보정 없이 입력 시각과 한국 표준시로 계산한다
+    metrics.incr("solar_time_unlocated")
+    return birth_dt, DEFAULT_UTC_OFFSET
+
+def compute_chart(user_data: Dict[str, Any]) -> Tuple[Dict[str, str], datetime]:
+    """출생 정보로 진태양시와 사주 8글자만 계산합니다. (분석 문구 생성 없음)"""
+    true_solar_dt, solar_utc_offset, _ = locate_birth(user_data)
         
+    with span("ganji"):
+        ganji_map = get_ganji(true_solar_dt, utc_offset=solar_utc_offset)
+    return ganji_map, true_solar_dt
+
+class SajuReportStream:
+    """
+    process_saju_input 의 스트리밍 판입니다. 지명 조회·진태양시·만세력 계산은 saju 에 처음 접근할 때,
+    각 분석 항목은 순회하면서 하나씩 계산되므로 화면은 첫 항목부터 바로 그릴 수 있다.
+    cache 는 분석 단계 단위로 읽고 쓰며, report() 는 남은 항목을 마저 계산해 전체 보고서를 돌려준다.
+    계측(metrics)이 켜져 있으면 단계별 소요 시간과 사건 수를 모아 보고서의 "metrics" 에 붙인다.
+    """
+
+    def __init__(self, user_data: Dict[str, Any], db: Dict, cache: Optional[ReportCache] = None):
+        self.user_data = user_data
+        self.db = db
+        self.cache = cache
+        self._chart: Optional[Tuple[Dict[str, str], datetime]] = None
+        self._analytics: List[Dict[str, Any]] = []
+        self.stage_items: Dict[str, List[Dict[str, Any]]] = {}
+        self._source: Optional[Iterator[Dict[str, Any]]] = None
+        self.done = False
+        self._observed = False
+        self.trace = metrics.new_trace()
+
+    @property
+    def saju(self) -> Dict[str, str]:
+        if self._chart is None:
+            with metrics.activate(self.trace):
+                self._chart = compute_chart(self.user_data)
+        return self._chart[0]
+
+    @property
+    def true_solar_dt(self) -> datetime:
+        self.saju
+        return self._chart[1]
+
+    def _generate(self) -> Iterator[Dict[str, Any]]:
+        ganji_map, true_solar_dt = self.saju, self.true_solar_dt
+        gender = self.user_data.get('gender')
+        # 단계별 DB 버전은 보고서를 시작할 때 한 번 읽는다 (도중에 섹션이 바뀌어도 키와 내용이 어긋나지 않게)
+        versions = stage_hashes(self.db) if self.cache is not None else {}
+        if versions:
+            # 같은 8글자라도 절입일과의 거리(대운수)가 다르면 운세 흐름이 달라지므로 키에 넣는다
+            now = datetime.now()
+            timeline = LuckTimeline(ganji_map, true_solar_dt, gender)
+            luck_start = daewoon_number(timeline.start_age)
+            # 절입 후 경과 일수(사령 단계)는 강약·용신을 바꾸므로 직업/건강 분석을 위해 키에 넣는다
+            phase = month_phase(SajuChart.from_ganji(ganji_map).branch(1), month_elapsed_days(ganji_map, true_solar_dt))
+            # 운세 흐름 단계는 지금의 대운을 읽으므로, 해 중간에 대운이 바뀌면 다른 키가 되도록 대운 순번도 넣는다
+            key = chart_key(ganji_map, gender, now.year, true_solar_dt.year, luck_start, phase,
+                            timeline.daewoon_index_at(now))
+        inputs = None
+        for name, _, build in ANALYTICS_STAGES:
+            items = None
+            if versions:
+                with span("report_cache"):
+                    items = self.cache.get(f"{key}|{name}", versions[name])
+            if items is None:
+                if inputs is None:
+                    chart = SajuChart.from_ganji(ganji_map)
+                    with span("sibseong"):
+                        sibseong_map = calculate_sibseong(ganji_map['day_gan'], chart)
+                    with span("five_elements"):
+                        five_elements_count = calculate_five_elements_count(chart)
+                    inputs = (ganji_map, sibseong_map, five_elements_count, true_solar_dt, self.db, gender)
+                with span(name):
+                    items = build(*inputs)
+                if versions:
+                    self.cache.put(f"{key}|{name}", versions[name], items)
+            self.stage_items[name] = items
+            yield from items
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        i = 0
+        while True:
+            if i < len(self._analytics):
+                yield dict(self._analytics[i])
+                i += 1
+                continue
+            if self.done:
+                return
+            if self._source is None:
+                self._source = self._generate()
+            with metrics.activate(self.trace):
+                item = next(self._source, None)
+            if item is None:
+                self.done = True
+                return
+            self._analytics.append(item)
+
+    def report(self) -> Dict[str, Any]:
+        for _ in self:
+            pass
+        report = {
+            "user": self.user_data,
+            "saju": self.saju,
+            "true_solar_dt": self.true_solar_dt,
+            "strength": calculate_strength(self.saju, self.true_solar_dt).as_dict(),
+            "analytics": [dict(item) for item in self._analytics]
+        }
+        if self.trace is not None:
+            report["metrics"] = self.trace.as_metadata()
+        if population_stats.ENABLED and not self._observed:
+            # 앱(스트림)과 API(process_saju_input) 모두 여기를 지난다. 같은 스트림의 report() 재호출은 한 번만 센다
+            self._observed = True
+            population_stats.observe_report(report, self.db)
+        return report
+
+
+def stream_saju_input(user_data: Dict[str, Any], db: Dict, cache: Optional[ReportCache] = None) -> SajuReportStream:
+    """개인 사주 분석을 항목 단위로 흘려보내는 스트림을 만듭니다. (계산은 순회할 때 일어난다)"""
+    return SajuReportStream(user_data, db, cache)
+
+
+def process_saju_input(user_data: Dict[str, Any], db: Dict, cache: Optional[ReportCache] = None,
+                       uncertainty_minutes: Optional[float] = None) -> Dict[str, Any]:
+    """개인 사주 분석 및 보고서 생성 (모든 DB 활용)
+    cache 가 주어지고 db 가 섹션 해시를 가지면(번들 DB), 같은 차트의 분석 단계 결과를 재사용합니다.
+    uncertainty_minutes(없으면 user_data['time_uncertainty'])가 있으면 출생 시각 ±그만큼 안에서 나올 수 있는
+    다른 차트들과, 입력 시각의 보고서와 달라지는 분석 항목만 report['uncertainty'] 에 붙입니다."""
+    stream = stream_saju_input(user_data, db, cache)
+    report = stream.report()
+    if uncertainty_minutes is None:
+        uncertainty_minutes = user_data.get('time_uncertainty')
+    if uncertainty_minutes:
+        from birth_window import uncertainty_report
+
+        report["uncertainty"] = uncertainty_report(stream, float(uncertainty_minutes))
     return report
 
 
+# 궁합의 조후(겨울생·여름생) 판단용 월지, 갈등 원인 판단에서 '무겁다'고 보는 묶음 비중
+WINTER_BRANCHES = ('해', '자', '축')
+SUMMER_BRANCHES = ('사', '오', '미')
+HEAVY_GROUP_SHARE = 0.3
+
 def process_love_compatibility(user_a: Dict[str, Any], user_b: Dict[str, Any], db: Dict) -> Dict[str, Any]:
     """두 사주를 비교하여 궁합을 분석합니다. (Compatibility DB 강화)"""
     
-    res_a = process_saju_input(user_a, db)
-    res_b = process_saju_input(user_b, db)
+    # 궁합에는 두 사람의 사주 8글자만 필요하므로 전체 보고서는 만들지 않는다
+    ganji_a, solar_a = compute_chart(user_a)
+    ganji_b, solar_b = compute_chart(user_b)
+    strength_a = calculate_strength(ganji_a, solar_a)
+    strength_b = calculate_strength(ganji_b, solar_b)
     
-    ganji_a = res_a['saju']
-    ganji_b = res_b['saju']
-    
-    report = {"user_a_saju": ganji_a, "user_b_saju": ganji_b, "analytics": []}
+    report = {"user_a_saju": ganji_a, "user_b_saju": ganji_b, "analytics": [],
+              "user_a_strength": strength_a.as_dict(), "user_b_strength": strength_b.as_dict()}
     
     # 1. 천간합 궁합 분석 (Compatibility DB 사용)
     gan_a = ganji_a['day_gan']
@@ -418,16 +517,34 @@ def process_love_compatibility(user_a: Dict[str, Any], user_b: Dict[str, Any], d
         score = comp_data.get('score', '??')
         comp_analysis['content'] += f"\n\n**신령 궁합 점수:** {score}점 (100점 만점)"
     report['analytics'].append(comp_analysis)
+    if population_stats.ENABLED:
+        population_stats.observe_compatibility(comp_data.get('score'), user_a, user_b)
+
+    # 2. 강약 궁합 (Love DB compatibility_logic 사용) - 겨울생·여름생은 조후, 그 밖에는 신강/신약 짝
+    logic_db = db.get('love', {}).get('compatibility_logic', {})
+    winter = [g['month_ji'] in WINTER_BRANCHES for g in (ganji_a, ganji_b)]
+    summer = [g['month_ji'] in SUMMER_BRANCHES for g in (ganji_a, ganji_b)]
+    if ((winter[0] and summer[1]) or (summer[0] and winter[1])) and logic_db.get('조후_용신'):
+        logic = logic_db['조후_용신']
+    else:
+        sides = (strength_a.side, strength_b.side)
+        logic = logic_db.get(f"{sides[0]}_{sides[1]}", logic_db.get(f"{sides[1]}_{sides[0]}"))
+    if logic:
+        report['analytics'].append({
+            "type": "⚖️ 일간 강약 궁합",
+            "title": f"{user_a['name']}({strength_a.label}) · {user_b['name']}({strength_b.label}): **{logic.get('result', '')}**",
+            "content": logic.get('desc', '')
+        })
     
-    # 2. 갈등 원인 (Love DB 사용)
+    # 3. 갈등 원인 (Love DB 사용)
     conflict_db = db.get('love', {}).get('conflict_triggers', {})
     conflict_data = None
     
-    # 재다신약 (남성) - 3개 이상 가정
-    if ganji_a.get('gender') == '남' and five_elements_count.get('재성', 0) >= 3: 
+    # 재다신약 (남성) - 재성이 무겁고 일간이 약할 때
+    if user_a.get('gender') == '남' and strength_a.weak and strength_a.group_share('재성') >= HEAVY_GROUP_SHARE:
         conflict_data = conflict_db.get('재다신약_남성')
-    # 관살혼잡 (여성) - 3개 이상 가정
-    elif ganji_a.get('gender') == '여' and five_elements_count.get('관성', 0) >= 3: 
+    # 관살혼잡 (여성) - 관성이 무거울 때
+    elif user_a.get('gender') == '여' and strength_a.group_share('관성') >= HEAVY_GROUP_SHARE:
         conflict_data = conflict_db.get('관살혼잡_여성')
     # 간여지동 커플 (일주 동일 오행)
     elif ganji_a['day_gan'] == ganji_b['day_gan'] and OHENG_MAP[ganji_a['day_gan']] == OHENG_MAP[ganji_a['day_ji']]:
@@ -448,3 +565,37 @@ def process_love_compatibility(user_a: Dict[str, Any], user_b: Dict[str, Any], d
         })
         
     return report
+
+
+def find_auspicious_dates(users: List[Dict[str, Any]], start: Any, end: Any, db: Dict,
+                          purpose: str = "wedding", k: int = 10, by_hour: bool = False,
+                          weekdays: Optional[List[int]] = None) -> Dict[str, Any]:
+    """한두 사람의 출생 정보로 start~end(미포함) 중 목적(결혼/이사/계약)에 맞는 좋은 날·시진 상위 k 개를 고릅니다."""
+    from auspicious_days import resolve_profile, search_auspicious
+
+    charts = [compute_chart(user)[0] for user in users]
+    if isinstance(start, str):
+        start = datetime.strptime(start, "%Y-%m-%d").date()
+    if isinstance(end, str):
+        end = datetime.strptime(end, "%Y-%m-%d").date()
+    dates = search_auspicious(charts, start, end, purpose, k=k, by_hour=by_hour, db=db, weekdays=weekdays)
+    return {"purpose": resolve_profile(purpose)["label"], "charts": charts, "dates": dates}
+
+
+# ==========================================
+# 5. 배치 처리 (Batch Processing)
+# ==========================================
+# NumPy/pandas 를 쓰는 벡터 경로는 saju_batch 에 있다. 여기서 가져오면 처음 접근할 때 불러온다 (PEP 562).
+_BATCH_EXPORTS = {
+    "STEM_ELEMENT", "BRANCH_ELEMENT", "BRANCH_MAIN_HIDDEN", "SIBSEONG_TABLE", "STEM_ELEMENT_WEIGHTS",
+    "BRANCH_ELEMENT_WEIGHTS", "encode_pillars", "calculate_sibseong_bulk", "calculate_five_elements_bulk",
+    "_iter_record_frames", "compute_chart_frame", "_frame_reports", "process_saju_batch",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _BATCH_EXPORTS:
+        import saju_batch
+
+        return getattr(saju_batch, name)
+    raise AttributeError(f"module 'saju_engine' has no attribute '{name}'")
@@ -0,0 +1,404 @@
+import os
+import json
+import asyncio
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import metrics
+import population_stats
+
+# ==========================================
+# 1. 설정 (Settings)
+# ==========================================
+# Streamlit 없이 다른 서비스에서 부를 수 있는 HTTP API 입니다. (표준 라이브러리 asyncio 만 사용)
+#   python saju_service.py --port 8080 --workers 4
+#
+#   GET  /health                        상태와 풀 사용량
+#   GET  /metrics                       단계별 소요 시간·사건 수 (Prometheus 텍스트, SHINRYEONG_METRICS=1 일 때)
+#   GET  /population                    회원 분포: 워커별 집계 파일을 합친 일주·오행·신살·궁합 점수 분포
+#                                       (SHINRYEONG_POPSTATS=1 일 때, 워커가 FLUSH_SECONDS 마다 파일을 갱신)
+#   POST /chart          {birth_dt, city, is_lunar, ...}      사주 8글자 + 진태양시 (음력은 lunar_date="1990-02-30" 도 받음)
+#   POST /report         {name, birth_dt, city, gender, ...}  process_saju_input 전체 보고서 (time_uncertainty=±분 이면 후보 차트 차이도)
+#   POST /compatibility  {user_a: {...}, user_b: {...}}       궁합 보고서
+#   POST /auspicious     {users: [{...}, {...}], start: "2026-01-01", end: "2027-01-01", purpose, k, by_hour, weekdays}
+#                                                            택일: 좋은 날(또는 날×시진) 상위 k 개
+#   POST /matches        {user: {...}, candidates: [{id, birth_dt, city, ...} 또는 {id, day_pillar: "갑자"}], k}
+#                                                            중매: 후보 풀에서 일주 궁합 점수 상위 k 명
+#   POST /batch/charts   JSON 배열 또는 NDJSON 본문             차트를 NDJSON 으로 흘려보냄
+#   POST /batch/reports  (위와 같음)                           보고서를 NDJSON 으로 흘려보냄
+#
+# CPU 를 쓰는 엔진 호출은 모두 프로세스 풀에서 돌고, 같은 입력의 요청이 동시에 들어오면 한 번만 계산한다.
+# 풀에 쌓인 일이 max_pending 을 넘으면 503 + Retry-After 로 돌려보낸다(백프레셔).
+DEFAULT_PORT = 8080
+MAX_BODY_BYTES = 16 * 1024 * 1024
+BATCH_CHUNK = 500
+REPORT_CACHE_SIZE = 4096 * 6  # 분석 단계(6개)마다 한 항목
+
+_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "item"):  # NumPy 스칼라
+        return value.item()
+    return str(value)
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+# ==========================================
+# 2. 워커 프로세스 (Worker Process)
+# ==========================================
+# 워커마다 DB 번들(mmap)과 메모리 보고서 캐시를 한 번씩만 연다.
+_worker_db = None
+_worker_cache = None
+
+
+def _init_worker() -> None:
+    global _worker_db, _worker_cache
+    from db_bundle import load_bundle, DBWatcher
+    from report_cache import ReportCache
+
+    from saju_engine import invalidate_stages
+
+    _worker_db = load_bundle()
+    _worker_cache = ReportCache(maxsize=REPORT_CACHE_SIZE)
+    # saju_db 원본이 바뀌면 워커마다 그 섹션만 다시 읽고 해당 분석 단계 캐시만 지운다 (재시작 없음)
+    DBWatcher(_worker_db, on_change=lambda changes: invalidate_stages(_worker_cache, _worker_db, changes)).start()
+
+
+def _user_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(payload, dict) or "birth_dt" not in payload:
+        raise ValueError("birth_dt 가 없네.")
+    user = dict(payload)
+    user["birth_dt"] = datetime.fromisoformat(str(user["birth_dt"]))
+    user.setdefault("name", "")
+    user.setdefault("city", "Seoul")
+    return user
+
+
+def _work_chart(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from saju_engine import compute_chart
+
+    ganji_map, true_solar_dt = compute_chart(_user_data(payload))
+    return {"saju": ganji_map, "true_solar_dt": true_solar_dt}
+
+
+def _work_report(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from saju_engine import process_saju_input
+
+    return process_saju_input(_user_data(payload), _worker_db, cache=_worker_cache)
+
+
+def _work_compatibility(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from saju_engine import process_love_compatibility
+
+    return process_love_compatibility(_user_data(payload.get("user_a")), _user_data(payload.get("user_b")), _worker_db)
+
+
+def _work_auspicious(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from saju_engine import find_auspicious_dates
+
+    users = payload.get("users") or []
+    if not 1 <= len(users) <= 2 or not payload.get("start") or not payload.get("end"):
+        raise ValueError("users(1~2명)와 start/end 가 필요하네.")
+    return find_auspicious_dates([_user_data(user) for user in users], payload["start"], payload["end"], _worker_db,
+                                 purpose=payload.get("purpose", "wedding"), k=int(payload.get("k", 10)),
+                                 by_hour=bool(payload.get("by_hour", False)), weekdays=payload.get("weekdays"))
+
+
+def _work_matches(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """후보 풀의 일주를 코드 배열로 만들고 compat_rank.CompatibilityIndex 로 상위 k 명을 고릅니다.
+    일주(day_pillar)가 저장된 후보는 그대로 쓰고, 나머지는 벡터 배치 경로로 차트를 계산한다. (지명 사전만 사용)"""
+    import numpy as np
+    import pandas as pd
+    from compat_rank import CompatibilityIndex, day_pillar_code
+    from saju_batch import compute_chart_frame
+    from saju_chart import CHEONGAN, JIJI
+    from saju_engine import compute_chart
+
+    candidates = payload.get("candidates") or []
+    if not isinstance(candidates, list) or not candidates:
+        raise ValueError("candidates(후보 목록)가 필요하네.")
+    k = int(payload.get("k", 10))
+    ganji_map, _ = compute_chart(_user_data(payload.get("user")))
+
+    codes = np.full(len(candidates), -1, dtype=np.int64)
+    for i, candidate in enumerate(candidates):
+        pillar = candidate.get("day_pillar") if isinstance(candidate, dict) else None
+        if pillar:
+            if len(pillar) != 2 or pillar[0] not in CHEONGAN or pillar[1] not in JIJI \
+                    or CHEONGAN.index(pillar[0]) % 2 != JIJI.index(pillar[1]) % 2:
+                raise ValueError(f"{i}번째 후보의 일주 '{pillar}' 가 육십갑자가 아니네.")
+            codes[i] = (6 * CHEONGAN.index(pillar[0]) - 5 * JIJI.index(pillar[1])) % 60
+    missing = np.nonzero(codes < 0)[0]
+    if len(missing):
+        frame = compute_chart_frame(pd.DataFrame([_user_data(candidates[i]) for i in missing]), allow_network=False)
+        codes[missing] = (6 * frame['day_gan_code'].to_numpy(dtype=np.int64)
+                          - 5 * frame['day_ji_code'].to_numpy(dtype=np.int64)) % 60
+
+    index = CompatibilityIndex.from_db(codes, _worker_db)
+    top, scores = index.top_k(day_pillar_code(ganji_map), k)
+    return {
+        "day_pillar": ganji_map["day_gan"] + ganji_map["day_ji"],
+        "candidates": len(candidates),
+        "matches": [{"rank": rank + 1, "index": int(i), "id": candidates[i].get("id", candidates[i].get("user_id")),
+                     "day_pillar": CHEONGAN[codes[i] % 10] + JIJI[codes[i] % 12], "score": round(float(score), 1)}
+                    for rank, (i, score) in enumerate(zip(top, scores))],
+    }
+
+
+def _work_batch(records: List[Dict[str, Any]], with_reports: bool) -> bytes:
+    """레코드 한 청크를 벡터 배치 경로로 계산해 NDJSON 바이트로 돌려줍니다. (직렬화도 워커에서)"""
+    from saju_batch import process_saju_batch
+
+    db = _worker_db if with_reports else None
+    lines = [_dumps(report) for report in process_saju_batch(records, db=db, chunk_size=len(records) or 1)]
+    return b"".join(line + b"\n" for line in lines)
+
+
+_ROUTES = {
+    "/chart": _work_chart,
+    "/report": _work_report,
+    "/compatibility": _work_compatibility,
+    "/auspicious": _work_auspicious,
+    "/matches": _work_matches,
+}
+
+
+# ==========================================
+# 3. 서비스 (Coalescing & Backpressure)
+# ==========================================
+
+class SajuService:
+    """프로세스 풀 앞에서 동일 요청 병합과 대기열 상한을 관리합니다."""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 8
+        # 이벤트 루프와 스레드를 가진 부모를 fork 하지 않도록 spawn 으로 워커를 띄운다
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        self.pending = 0
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._inflight: Dict[Tuple[str, str], "asyncio.Future[Any]"] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+
+    async def submit(self, func: Any, *args: Any, wait: bool = False) -> Any:
+        """풀에 일을 맡긴다. 대기열이 차 있으면 wait=False 는 곧바로 503, wait=True(배치 스트림)는 자리가 날 때까지 기다린다."""
+        if not wait and self._slots.locked():
+            self.stats["rejected"] += 1
+            raise HTTPError(503, "신령이 지금 너무 바쁘네. 잠시 뒤에 다시 오게.")
+        async with self._slots:
+            self.pending += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+            finally:
+                self.pending -= 1
+
+    async def call(self, path: str, payload: Any) -> Any:
+        """같은 경로·같은 본문의 요청이 이미 계산 중이면 그 결과를 함께 기다립니다.
+        계산은 요청과 분리된 태스크에서 돌고 모두 shield 너머로 기다리므로, 먼저 온 요청이 끊겨도
+        함께 기다리던 요청들은 결과를 받는다. (끊긴 요청 자신만 CancelledError)"""
+        key = (path, json.dumps(payload, sort_keys=True, ensure_ascii=False))
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = self._inflight[key] = asyncio.ensure_future(self._compute(path, payload))
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def _compute(self, path: str, payload: Any) -> Any:
+        result = await self.submit(_ROUTES[path], payload)
+        if isinstance(result, dict) and "metrics" in result:
+            # 워커에서 잰 단계별 시간을 부모의 /metrics 에 모은다
+            metrics.get_registry().record_trace(result["metrics"])
+        return result
+
+    def _finish(self, key: Tuple[str, str], task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 기다리는 쪽이 모두 끊겼어도 경고가 나지 않게
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ==========================================
+# 4. HTTP 처리 (Minimal HTTP/1.1)
+# ==========================================
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "요청 줄을 읽을 수 없네.")
+    headers: Dict[str, str] = {}
+    while True:
+        raw = await reader.readline()
+        if raw in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = raw.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "본문이 너무 크네.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def _head(status: int, content_type: str, extra: Optional[Dict[str, str]] = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_STATUS.get(status, 'OK')}", f"Content-Type: {content_type}"]
+    for name, value in (extra or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, value: Any, keep_alive: bool) -> None:
+    body = _dumps(value)
+    extra = {"Content-Length": str(len(body)), "Connection": "keep-alive" if keep_alive else "close"}
+    if status == 503:
+        extra["Retry-After"] = "1"
+    writer.write(_head(status, "application/json; charset=utf-8", extra) + body)
+    await writer.drain()
+
+
+def _parse_records(body: bytes) -> List[Dict[str, Any]]:
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def _stream_batch(service: SajuService, writer: asyncio.StreamWriter, records: List[Dict[str, Any]],
+                        with_reports: bool) -> None:
+    """청크마다 워커에 맡기고, 끝나는 대로 chunked 인코딩으로 NDJSON 을 흘려보냅니다.
+    느린 클라이언트 앞에서는 drain() 에서 멈추므로 다음 청크를 미리 쌓아 두지 않는다."""
+    if service._slots.locked():
+        service.stats["rejected"] += 1
+        raise HTTPError(503, "신령이 지금 너무 바쁘네. 잠시 뒤에 다시 오게.")
+    writer.write(_head(200, "application/x-ndjson; charset=utf-8",
+                       {"Transfer-Encoding": "chunked", "Connection": "close"}))
+    chunks = [records[i:i + BATCH_CHUNK] for i in range(0, len(records), BATCH_CHUNK)]
+    # 최대 2 청크를 미리 계산해 두고 순서대로 내보낸다
+    window: List["asyncio.Task[bytes]"] = []
+    try:
+        for chunk in chunks:
+            window.append(asyncio.ensure_future(service.submit(_work_batch, chunk, with_reports, wait=True)))
+            if len(window) >= 2:
+                await _write_chunk(writer, await window.pop(0))
+        while window:
+            await _write_chunk(writer, await window.pop(0))
+    except (ConnectionError, asyncio.CancelledError):
+        raise
+    except Exception as exc:
+        # 헤더를 이미 보냈으므로 오류는 마지막 NDJSON 줄로 알린다
+        service.stats["errors"] += 1
+        await _write_chunk(writer, _dumps({"error": f"{type(exc).__name__}: {exc}"}) + b"\n")
+    finally:
+        for task in window:
+            task.cancel()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+    if data:
+        writer.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        await writer.drain()
+
+
+async def handle_connection(service: SajuService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                service.stats["requests"] += 1
+                if path == "/health":
+                    await _send_json(writer, 200, {"status": "ok", "workers": service.workers,
+                                                   "pending": service.pending, **service.stats}, keep_alive)
+                elif path == "/metrics":
+                    body = metrics.to_prometheus().encode("utf-8")
+                    writer.write(_head(200, "text/plain; version=0.0.4; charset=utf-8",
+                                       {"Content-Length": str(len(body)),
+                                        "Connection": "keep-alive" if keep_alive else "close"}) + body)
+                    await writer.drain()
+                elif path == "/population":
+                    snapshot = population_stats.load_stats(population_stats.shard_paths())
+                    await _send_json(writer, 200, population_stats.distributions(snapshot), keep_alive)
+                elif path not in _ROUTES and path not in ("/batch/charts", "/batch/reports"):
+                    raise HTTPError(404, "그런 길은 없네.")
+                elif method != "POST":
+                    raise HTTPError(405, "POST 로 보내게.")
+                elif path.startswith("/batch/"):
+                    await _stream_batch(service, writer, _parse_records(body), path == "/batch/reports")
+                    break
+                else:
+                    result = await service.call(path, json.loads(body or b"{}"))
+                    await _send_json(writer, 200, result, keep_alive)
+            except HTTPError as exc:
+                await _send_json(writer, exc.status, {"error": exc.message}, keep_alive)
+            except (ValueError, KeyError, TypeError) as exc:
+                await _send_json(writer, 400, {"error": str(exc)}, keep_alive)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as exc:  # 워커 오류도 연결을 끊지 않고 500 으로 알린다
+                service.stats["errors"] += 1
+                await _send_json(writer, 500, {"error": f"{type(exc).__name__}: {exc}"}, keep_alive)
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, workers: Optional[int] = None,
+                max_pending: Optional[int] = None) -> None:
+    if population_stats.ENABLED and not population_stats.STATS_PATH:
+        # 워커(spawn)는 환경 변수로 설정을 받으므로 풀을 띄우기 전에 집계 파일 위치를 정해 둔다
+        population_stats.STATS_PATH = os.environ["SHINRYEONG_POPSTATS_FILE"] = "popstats-{pid}.json"
+    service = SajuService(workers, max_pending)
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"신령 API 서비스 시작: http://{host}:{port} (워커 {service.workers}개, 대기열 {service.max_pending})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="사주 엔진 HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,245 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from saju_chart import (CHEONGAN, JIJI, OHENG, SIBSEONG_NAMES, PILLAR_COLUMNS, STEM_CODE, BRANCH_CODE,
+                        SIBSEONG_LUT, BRANCH_HIDDEN_STEMS, SajuChart)
+
+# ==========================================
+# 1. 규칙 형식 (Rule Format)
+# ==========================================
+# shinsal_db.json / symptom_mapping.json 의 "rules" 목록. 규칙 하나는 다음과 같다.
+#   {"id": ..., "db_key": ..., "type": ..., "title": ..., "template": [[필드, 라벨], ...],
+#    "any": [조건, ...]  또는  "all": [조건, ...]}
+# 조건 종류:
+#   {"branches": [...], "stems": [...], "pillars": [...], "min": 1}  지정 주에서 해당 글자 개수 ≥ min
+#   {"relative_to": "day_gan"|"year_ji"|..., "map": {기준 글자: [지지, ...]}, "pillars": [...]}
+#   {"pairs": [[지지, 지지], ...], "between": [[주, 주], ...]}     두 주의 지지 쌍이 목록에 있을 때
+#   {"element": "수", "min": 3} / {"element": ..., "max": ...}     가중 오행 카운트 임계값
+#   {"sibseong": [...], "min"|"max": n}                           일간 제외 천간 + 대표 지장간 십성 개수
+#
+# 차트 한 장은 88비트 위치 마스크(천간 4주×10 + 지지 4주×12)로 바뀌고, 글자 조건은
+# popcount(마스크 & 조건 마스크) 한 번으로 판정된다.
+
+_PILLAR_INDEX = {column: i for i, column in enumerate(PILLAR_COLUMNS)}
+_BRANCH_BASE = 40
+
+
+def _stem_bit(pillar: int, stem: int) -> int:
+    return 1 << (pillar * 10 + stem)
+
+
+def _branch_bit(pillar: int, branch: int) -> int:
+    return 1 << (_BRANCH_BASE + pillar * 12 + branch)
+
+
+def chart_mask(chart: SajuChart) -> int:
+    """차트의 88비트 위치 마스크."""
+    c = chart.codes
+    mask = 0
+    for p in range(4):
+        mask |= _stem_bit(p, c[2 * p]) | _branch_bit(p, c[2 * p + 1])
+    return mask
+
+
+def _char_mask(cond: Dict[str, Any]) -> int:
+    pillars = [_PILLAR_INDEX[p] for p in cond.get("pillars", PILLAR_COLUMNS)]
+    mask = 0
+    for p in pillars:
+        for g in cond.get("stems", []):
+            mask |= _stem_bit(p, STEM_CODE[g])
+        for j in cond.get("branches", []):
+            mask |= _branch_bit(p, BRANCH_CODE[j])
+    return mask
+
+
+# ==========================================
+# 2. 컴파일러 (Compiler)
+# ==========================================
+
+class _Features:
+    """한 차트에서 규칙 평가에 필요한 값을 한 번씩만 계산해 둔다."""
+
+    __slots__ = ("chart", "mask", "_elements", "_sibseong")
+
+    def __init__(self, chart: SajuChart, elements: Optional[Sequence[float]] = None):
+        self.chart = chart
+        self.mask = chart_mask(chart)
+        self._elements = list(elements) if elements is not None else None
+        self._sibseong: Optional[List[int]] = None
+
+    @property
+    def elements(self) -> List[float]:
+        if self._elements is None:
+            self._elements = self.chart.element_counts()
+        return self._elements
+
+    @property
+    def sibseong_counts(self) -> List[int]:
+        if self._sibseong is None:
+            c = self.chart.codes
+            base = c[4] * 10
+            counts = [0] * 10
+            for p in (0, 1, 3):
+                counts[SIBSEONG_LUT[base + c[2 * p]]] += 1
+            for p in range(4):
+                counts[SIBSEONG_LUT[base + BRANCH_HIDDEN_STEMS[c[2 * p + 1]][0]]] += 1
+            self._sibseong = counts
+        return self._sibseong
+
+
+def _code_of(chart: SajuChart, key: str) -> int:
+    column, part = key.split("_")
+    p = _PILLAR_INDEX[column]
+    return chart.stem(p) if part == "gan" else chart.branch(p)
+
+
+def _compile_condition(cond: Dict[str, Any]) -> Callable[[_Features], bool]:
+    lo, hi = cond.get("min"), cond.get("max")
+
+    def in_range(value: float, default_min: float = 1) -> bool:
+        return (value >= (default_min if lo is None else lo)) and (hi is None or value <= hi)
+
+    if "relative_to" in cond:
+        key = cond["relative_to"]
+        codes = CHEONGAN if key.endswith("_gan") else JIJI
+        table = [0] * len(codes)
+        for ref, branches in cond["map"].items():
+            table[codes.index(ref)] = _char_mask({"branches": branches, "pillars": cond.get("pillars", PILLAR_COLUMNS)})
+        return lambda f: in_range((f.mask & table[_code_of(f.chart, key)]).bit_count())
+
+    if "pairs" in cond:
+        lut = 0
+        for x, y in cond["pairs"]:
+            a, b = BRANCH_CODE[x], BRANCH_CODE[y]
+            lut |= (1 << (a * 12 + b)) | (1 << (b * 12 + a))
+        between = [(_PILLAR_INDEX[p], _PILLAR_INDEX[q]) for p, q in cond["between"]]
+        return lambda f: any((lut >> (f.chart.branch(p) * 12 + f.chart.branch(q))) & 1 for p, q in between)
+
+    if "element" in cond or "elements" in cond:
+        idx = [OHENG.index(e) for e in cond.get("elements", [cond.get("element")])]
+        return lambda f: in_range(sum(f.elements[i] for i in idx), default_min=float("-inf"))
+
+    if "sibseong" in cond:
+        idx = [SIBSEONG_NAMES.index(s) for s in cond["sibseong"]]
+        return lambda f: in_range(sum(f.sibseong_counts[i] for i in idx), default_min=0)
+
+    mask = _char_mask(cond)
+    return lambda f: in_range((f.mask & mask).bit_count())
+
+
+class RuleSet:
+    """DB 에 선언된 규칙 목록을 술어 함수로 컴파일해 둔 것. 차트 한 장을 한 번 훑어 모든 규칙을 평가한다."""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        self._predicates: List[Tuple[bool, List[Callable[[_Features], bool]]]] = []
+        for rule in rules:
+            is_all = "all" in rule
+            conds = rule.get("all") if is_all else rule.get("any", [])
+            self._predicates.append((is_all, [_compile_condition(c) for c in conds]))
+
+    def evaluate(self, chart: Any, elements: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """발동한 규칙 목록. elements(오행 카운트)를 이미 계산했다면 넘겨서 재계산을 피한다."""
+        features = _Features(SajuChart.from_ganji(chart), elements)
+        fired = []
+        for rule, (is_all, preds) in zip(self.rules, self._predicates):
+            hit = all(p(features) for p in preds) if is_all else any(p(features) for p in preds)
+            if hit:
+                fired.append(rule)
+        return fired
+
+    def render(self, chart: Any, source: Dict[str, Any], elements: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """발동한 규칙을 DB 문구(source[db_key])와 템플릿으로 보고서 항목으로 만든다. 문구가 없으면 건너뛴다."""
+        reports = []
+        for rule in self.evaluate(chart, elements):
+            data = source.get(rule.get("db_key", rule["id"]), {})
+            if not data:
+                continue
+            lines = [f"{label}{data[field]}" for field, label in rule.get("template", []) if data.get(field)]
+            reports.append({"type": rule["type"], "title": rule["title"], "content": "\n".join(lines)})
+        return reports
+
+    # --- 벡터 평가 ---
+    def evaluate_bulk(self, stems: Any, branches: Any, elements: Any = None):
+        """(n, 4) 천간/지지 코드 배열에 대해 (n, 규칙 수) bool 배열을 돌려줍니다."""
+        import numpy as np
+
+        stems = np.asarray(stems, dtype=np.int64)
+        branches = np.asarray(branches, dtype=np.int64)
+        n = len(stems)
+        # 64비트를 넘으므로 천간 40비트 / 지지 48비트로 나눠 담는다
+        pillar = np.arange(4)
+        stem_mask = np.bitwise_or.reduce(np.left_shift(np.uint64(1), (pillar * 10 + stems).astype(np.uint64)), axis=1)
+        branch_mask = np.bitwise_or.reduce(np.left_shift(np.uint64(1), (pillar * 12 + branches).astype(np.uint64)), axis=1)
+        if elements is None:
+            from saju_chart import STEM_ELEMENT_WEIGHTS, BRANCH_ELEMENT_WEIGHTS
+            elements = (np.asarray(STEM_ELEMENT_WEIGHTS)[stems].sum(axis=1)
+                        + np.asarray(BRANCH_ELEMENT_WEIGHTS)[branches].sum(axis=1))
+        sibseong = None
+
+        def split(mask: int):
+            return np.uint64(mask & ((1 << 40) - 1)), np.uint64(mask >> _BRANCH_BASE)
+
+        def count(mask_s, mask_b):
+            return np.bitwise_count(stem_mask & mask_s).astype(np.int64) + np.bitwise_count(branch_mask & mask_b)
+
+        def cond_hits(cond: Dict[str, Any]):
+            nonlocal sibseong
+            lo, hi = cond.get("min"), cond.get("max")
+
+            def in_range(value, default_min=1):
+                ok = value >= (default_min if lo is None else lo)
+                return ok & (value <= hi) if hi is not None else ok
+
+            if "relative_to" in cond:
+                column, part = cond["relative_to"].split("_")
+                ref = (stems if part == "gan" else branches)[:, _PILLAR_INDEX[column]]
+                codes = CHEONGAN if part == "gan" else JIJI
+                table_s = np.zeros(len(codes), dtype=np.uint64)
+                table_b = np.zeros(len(codes), dtype=np.uint64)
+                for key, targets in cond["map"].items():
+                    table_s[codes.index(key)], table_b[codes.index(key)] = split(
+                        _char_mask({"branches": targets, "pillars": cond.get("pillars", PILLAR_COLUMNS)}))
+                return in_range(count(table_s[ref], table_b[ref]))
+            if "pairs" in cond:
+                lut = np.zeros(144, dtype=bool)
+                for x, y in cond["pairs"]:
+                    a, b = BRANCH_CODE[x], BRANCH_CODE[y]
+                    lut[a * 12 + b] = lut[b * 12 + a] = True
+                hits = np.zeros(n, dtype=bool)
+                for p, q in cond["between"]:
+                    hits |= lut[branches[:, _PILLAR_INDEX[p]] * 12 + branches[:, _PILLAR_INDEX[q]]]
+                return hits
+            if "element" in cond or "elements" in cond:
+                idx = [OHENG.index(e) for e in cond.get("elements", [cond.get("element")])]
+                return in_range(elements[:, idx].sum(axis=1), default_min=-np.inf)
+            if "sibseong" in cond:
+                if sibseong is None:
+                    lut10 = np.frombuffer(SIBSEONG_LUT, dtype=np.uint8).reshape(10, 10)
+                    main_hidden = np.array([h[0] for h in BRANCH_HIDDEN_STEMS])
+                    day = stems[:, 2:3]
+                    codes = np.concatenate([lut10[day, stems[:, [0, 1, 3]]], lut10[day, main_hidden[branches]]], axis=1)
+                    sibseong = np.stack([(codes == k).sum(axis=1) for k in range(10)], axis=1)
+                idx = [SIBSEONG_NAMES.index(s) for s in cond["sibseong"]]
+                return in_range(sibseong[:, idx].sum(axis=1), default_min=0)
+            mask_s, mask_b = split(_char_mask(cond))
+            return in_range(count(mask_s, mask_b))
+
+        out = np.zeros((n, len(self.rules)), dtype=bool)
+        for r, rule in enumerate(self.rules):
+            is_all = "all" in rule
+            hits = [cond_hits(c) for c in (rule.get("all") if is_all else rule.get("any", []))]
+            if hits:
+                out[:, r] = np.logical_and.reduce(hits) if is_all else np.logical_or.reduce(hits)
+        return out
+
+
+# 섹션 이름 → (규칙 목록 객체, 컴파일 결과). 섹션마다 지금 쓰는 것 하나만 들고 있어 핫 리로드로 쌓이지 않는다.
+_compiled: Dict[str, Tuple[Any, RuleSet]] = {}
+
+
+def get_ruleset(rules: List[Dict[str, Any]], section: str) -> RuleSet:
+    """section("shinsal"/"symptom")의 규칙 목록을 한 번만 컴파일합니다. (DB 섹션이 바뀌면 새 객체이므로 다시 컴파일)"""
+    cached = _compiled.get(section)
+    if cached is None or cached[0] is not rules:
+        cached = (rules, RuleSet(rules))
+        _compiled[section] = cached
+    return cached[1]
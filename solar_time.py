@@ -0,0 +1,190 @@
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+# ==========================================
+# 1. 한국 표준시 변천사 (Korean Clock History)
+# ==========================================
+# (UTC 기준 전환 시각, 전환 후 UTC 오프셋[시간]) - tzdata Asia/Seoul 과 동일
+# 127.5°E(UTC+8:30) ↔ 135°E(UTC+9) 변경과 서머타임(1948~51, 1955~60, 1987~88)을 포함한다.
+KOREA_OFFSET_HISTORY: List[Tuple[datetime, float]] = [
+    (datetime(1908, 3, 31, 15, 32, 8), 8.5),
+    (datetime(1911, 12, 31, 15, 30), 9.0),
+    (datetime(1948, 5, 31, 15, 0), 10.0), (datetime(1948, 9, 12, 14, 0), 9.0),
+    (datetime(1949, 4, 2, 15, 0), 10.0), (datetime(1949, 9, 10, 14, 0), 9.0),
+    (datetime(1950, 3, 31, 15, 0), 10.0), (datetime(1950, 9, 9, 14, 0), 9.0),
+    (datetime(1951, 5, 5, 15, 0), 10.0), (datetime(1951, 9, 8, 14, 0), 9.0),
+    (datetime(1954, 3, 20, 15, 0), 8.5),
+    (datetime(1955, 5, 4, 15, 30), 9.5), (datetime(1955, 9, 8, 14, 30), 8.5),
+    (datetime(1956, 5, 19, 15, 30), 9.5), (datetime(1956, 9, 29, 14, 30), 8.5),
+    (datetime(1957, 5, 4, 15, 30), 9.5), (datetime(1957, 9, 21, 14, 30), 8.5),
+    (datetime(1958, 5, 3, 15, 30), 9.5), (datetime(1958, 9, 20, 14, 30), 8.5),
+    (datetime(1959, 5, 2, 15, 30), 9.5), (datetime(1959, 9, 19, 14, 30), 8.5),
+    (datetime(1960, 4, 30, 15, 30), 9.5), (datetime(1960, 9, 17, 14, 30), 8.5),
+    (datetime(1961, 8, 9, 15, 30), 9.0),
+    (datetime(1987, 5, 9, 17, 0), 10.0), (datetime(1987, 10, 10, 17, 0), 9.0),
+    (datetime(1988, 5, 7, 17, 0), 10.0), (datetime(1988, 10, 8, 17, 0), 9.0),
+]
+KOREA_LMT_OFFSET = 127.0 / 15.0  # 1908년 이전: 서울 지방평균시 (약 UTC+8:28)
+KOREA_TIMEZONES = ("Asia/Seoul",)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _local_boundaries() -> List[datetime]:
+    """UTC 전환 시각을 '전환 직전 오프셋' 기준의 벽시계 시각으로 바꿉니다."""
+    bounds = []
+    prev = KOREA_LMT_OFFSET
+    for utc_dt, offset in KOREA_OFFSET_HISTORY:
+        bounds.append(utc_dt + timedelta(hours=prev))
+        prev = offset
+    return bounds
+
+
+_KOREA_LOCAL_BOUNDS = _local_boundaries()
+_KOREA_OFFSETS = [KOREA_LMT_OFFSET] + [offset for _, offset in KOREA_OFFSET_HISTORY]
+
+
+def korea_utc_offset(dt: datetime) -> float:
+    """한국 벽시계 시각(naive)의 당시 UTC 오프셋(시간)을 돌려줍니다."""
+    return _KOREA_OFFSETS[bisect_right(_KOREA_LOCAL_BOUNDS, dt)]
+
+
+def korea_utc_offsets(datetimes: Any):
+    """korea_utc_offset 의 NumPy 벡터 버전입니다."""
+    import numpy as np
+
+    bounds = np.array(_KOREA_LOCAL_BOUNDS, dtype="datetime64[s]")
+    idx = np.searchsorted(bounds, np.asarray(datetimes, dtype="datetime64[s]"), side="right")
+    return np.asarray(_KOREA_OFFSETS, dtype=np.float64)[idx]
+
+
+def utc_offset_hours(dt: datetime, timezone_str: str) -> float:
+    """벽시계 시각과 시간대 이름으로 당시 UTC 오프셋(시간)을 구합니다."""
+    if timezone_str in KOREA_TIMEZONES:
+        return korea_utc_offset(dt)
+    import pytz
+    local_dt = pytz.timezone(timezone_str).localize(dt, is_dst=False)
+    return local_dt.utcoffset().total_seconds() / 3600.0
+
+
+# ==========================================
+# 2. 균시차 (Equation of Time, closed form)
+# ==========================================
+# Smart(1978) 식: 태양 평균 황경·평균 근점이각·이심률·황도경사를 J2000 기준 율리우스 세기(T)의 다항식으로 두어
+# 근일점 이동까지 따라가므로, 1900~2100 년 전체에서 ephem 시태양 시각과의 차가 ±5초 안팎이다.
+# (고정 계수 NOAA 식은 2000년 근처에서만 ±30초이고 양 끝에서는 1분 가까이 벌어진다)
+EOT_TOLERANCE_SECONDS = 10.0
+_J2000 = datetime(2000, 1, 1, 12)
+_SECONDS_PER_CENTURY = 36525 * 86400.0
+
+
+def _eot_minutes(t: Any, xp: Any = math) -> Any:
+    """율리우스 세기 t 의 균시차(분). xp 는 math 또는 numpy (스칼라/배열 공용)."""
+    mean_longitude = xp.radians(280.46646 + 36000.76983 * t + 0.0003032 * t * t)
+    mean_anomaly = xp.radians(357.52911 + 35999.05029 * t - 0.0001537 * t * t)
+    e = 0.016708634 - 0.000042037 * t - 0.0000001267 * t * t
+    y = xp.tan(xp.radians(23.439291 - 0.0130042 * t) / 2) ** 2
+    eot = (y * xp.sin(2 * mean_longitude) - 2 * e * xp.sin(mean_anomaly)
+           + 4 * e * y * xp.sin(mean_anomaly) * xp.cos(2 * mean_longitude)
+           - 0.5 * y * y * xp.sin(4 * mean_longitude) - 1.25 * e * e * xp.sin(2 * mean_anomaly))
+    return xp.degrees(eot) * 4.0
+
+
+def equation_of_time(utc_dt: datetime) -> float:
+    """UTC 시각의 균시차(분)를 닫힌 식으로 계산합니다. (1900~2100 년 오차 약 ±5초)"""
+    return _eot_minutes((utc_dt - _J2000).total_seconds() / _SECONDS_PER_CENTURY)
+
+
+def _equation_of_time_bulk(utc_sec):
+    import numpy as np
+
+    j2000_sec = (_J2000 - _EPOCH).total_seconds()
+    return _eot_minutes((utc_sec - j2000_sec) / _SECONDS_PER_CENTURY, np)
+
+
+# ==========================================
+# 3. 진태양시 (True Solar Time)
+# ==========================================
+
+def true_solar_time(dt: datetime, longitude: float, timezone_str: str) -> datetime:
+    """벽시계 시각을 진태양시로 보정합니다. (UTC + 경도/15시간 + 균시차)"""
+    utc_dt = dt - timedelta(hours=utc_offset_hours(dt, timezone_str))
+    correction = longitude * 4.0 + equation_of_time(utc_dt)  # 분
+    return utc_dt + timedelta(minutes=correction)
+
+
+def true_solar_time_bulk(datetimes: Any, longitudes: Any, utc_offsets: Any):
+    """진태양시 보정의 벡터 버전입니다. utc_offsets 는 시간 단위 배열(또는 스칼라)이며,
+    한국 출생이면 korea_utc_offsets(datetimes) 결과를 그대로 넘기면 됩니다."""
+    import numpy as np
+
+    local_sec = np.asarray(datetimes, dtype="datetime64[s]").astype(np.int64)
+    utc_sec = local_sec - np.rint(np.asarray(utc_offsets, dtype=np.float64) * 3600).astype(np.int64)
+    correction_min = np.asarray(longitudes, dtype=np.float64) * 4.0 + _equation_of_time_bulk(utc_sec)
+    return (utc_sec + np.rint(correction_min * 60).astype(np.int64)).astype("datetime64[s]")
+
+
+def true_solar_time_ephem(dt: datetime, longitude: float, timezone_str: str) -> datetime:
+    """ephem 으로 구한 기준 구현입니다. 닫힌 식의 허용오차 검증에만 씁니다.
+    그 순간 관측지에서 본 태양의 시간각(지방 시태양시 - 12시)을 직접 구하므로, 하루 중 균시차 변화도 반영된다."""
+    import ephem
+
+    utc_dt = dt - timedelta(hours=utc_offset_hours(dt, timezone_str))
+    observer = ephem.Observer()
+    observer.lon = str(longitude)
+    observer.pressure = 0
+    observer.date = ephem.Date(utc_dt)
+    hour_angle = math.degrees(observer.sidereal_time() - ephem.Sun(observer).ra) / 15.0
+    local_mean = utc_dt + timedelta(hours=longitude / 15.0)
+    clock = local_mean.hour + local_mean.minute / 60.0 + local_mean.second / 3600.0
+    # 평균시와 시태양시의 차(균시차)를 ±12시간 안으로 접는다
+    eot_hours = (12.0 + hour_angle - clock) % 24.0
+    if eot_hours > 12.0:
+        eot_hours -= 24.0
+    return local_mean + timedelta(hours=eot_hours)
+
+
+# ==========================================
+# 4. 검증 (Tolerance Check)
+# ==========================================
+# (경도, 시간대): 한국 표준시 변천·서머타임과 남반구·서반구 시간대를 함께 본다
+VALIDATION_PLACES = [(126.978, "Asia/Seoul"), (129.0756, "Asia/Seoul"), (139.6503, "Asia/Tokyo"),
+                     (-0.1278, "Europe/London"), (-74.006, "America/New_York"), (151.2093, "Australia/Sydney")]
+
+
+def validate_against_ephem(samples: int = 2000, first_year: int = 1900, last_year: int = 2100, seed: int = 42,
+                           tolerance_seconds: float = EOT_TOLERANCE_SECONDS) -> Dict[str, Any]:
+    """1900~2100 년의 무작위 시각·장소에서 true_solar_time(닫힌 식)을 ephem 기준 구현과 비교하고,
+    벡터 버전(true_solar_time_bulk)이 스칼라 버전과 1초 안에서 같은지도 확인합니다."""
+    import random
+    import numpy as np
+
+    rng = random.Random(seed)
+    span = (datetime(last_year + 1, 1, 1) - datetime(first_year, 1, 1)).total_seconds()
+    worst, worst_case, bulk_worst = 0.0, None, 0.0
+    for _ in range(samples):
+        dt = datetime(first_year, 1, 1) + timedelta(seconds=rng.randrange(int(span)))
+        longitude, timezone_str = rng.choice(VALIDATION_PLACES)
+        closed = true_solar_time(dt, longitude, timezone_str)
+        diff = abs((closed - true_solar_time_ephem(dt, longitude, timezone_str)).total_seconds())
+        if diff > worst:
+            worst, worst_case = diff, f"{dt:%Y-%m-%d %H:%M} {timezone_str}"
+        bulk = true_solar_time_bulk(np.array([dt], dtype="datetime64[s]"), longitude,
+                                    utc_offset_hours(dt, timezone_str))[0].astype(datetime)
+        bulk_worst = max(bulk_worst, abs((bulk - closed.replace(microsecond=0)).total_seconds()))
+    return {"samples": samples, "years": [first_year, last_year], "tolerance_seconds": tolerance_seconds,
+            "max_error_seconds": round(worst, 2), "worst_case": worst_case, "bulk_max_diff_seconds": bulk_worst,
+            "ok": worst <= tolerance_seconds and bulk_worst <= 1.0}
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+
+    if sys.argv[1:] != ["--validate"]:
+        sys.exit("사용법: python solar_time.py --validate")
+    result = validate_against_ephem()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(0 if result["ok"] else 1)